@@ -0,0 +1,232 @@
+"""End-to-end latency of /buy, DCA ticks and /createtoken through the real bot.
+
+Starts two local stubs, one standing in for pumpportal, pump.fun IPFS, Solana
+RPC and Jito and one for the Telegram Bot API. It then points bot.py at them
+through its endpoint environment variables and feeds synthetic updates to the
+real dispatcher. Buy mints get a stub bonding curve, so ``--local-builder``
+compares the local pump.fun builder against trade-local. Every scenario reports p50/p95/p99 latency, throughput and
+errors, and ``--output`` writes the results as JSON so runs can be compared.
+
+    python benchmarks/bench_bot.py --users 50 --buys 500 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from cryptography.fernet import Fernet
+from solders.keypair import Keypair
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stubs import StubServer  # noqa: E402
+
+BOT_TOKEN = "123456:BENCHMARKabcdefghijklmnopqrstuvwxyz"
+
+
+def configure(api: StubServer, telegram: StubServer, workdir: str) -> None:
+    """Point every outbound endpoint of the bot at the stubs; must run before importing bot"""
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "WEBHOOK_HOST": "localhost",
+        "TELEGRAM_API_URL": telegram.base_url,
+        "PUMPPORTAL_API_URL": f"{api.base_url}/api",
+        "TRADE_LOCAL_URL": f"{api.base_url}/api/trade-local",
+        "IPFS_URL": f"{api.base_url}/api/ipfs",
+        "JITO_ENGINES": api.base_url,
+        "JITO_STATUS_INTERVAL": "0.2",
+        "RPC_ENDPOINTS": f"{api.base_url}/rpc",
+        "STORE_PATH": os.path.join(workdir, "bench.db"),
+        "WALLET_ENCRYPTION_KEY": Fernet.generate_key().decode(),
+    })
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+
+    def percentile(q: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 2) if latencies else 0.0
+
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def run_scenario(
+    name: str,
+    count: int,
+    concurrency: int,
+    job: Callable[[int], Awaitable[bool]]
+) -> Dict[str, Any]:
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await job(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    result = summarize(latencies, errors, time.perf_counter() - started)
+    print(
+        f"{name:<14} n={result['count']:<5} {result['throughput_per_s']:8.1f}/s "
+        f"p50={result['p50_ms']:7.1f}ms p95={result['p95_ms']:7.1f}ms "
+        f"p99={result['p99_ms']:7.1f}ms errors={result['errors']}"
+    )
+    return result
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Holds the bot's SQLite database and WAL files for this run only
+    with tempfile.TemporaryDirectory(prefix="bench_bot_") as workdir:
+        return await _run(args, workdir)
+
+
+async def _run(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    api = StubServer(latency=args.latency, error_rate=args.error_rate).start_in_thread()
+    telegram = StubServer(latency=args.tg_latency).start_in_thread()
+    configure(api, telegram, workdir)
+
+    if args.local_builder:
+        os.environ["LOCAL_TX_BUILDER"] = "1"
+    import bot as B
+    from aiogram.types import Update
+    from scheduler import Schedule
+
+    services = [B.update_queue, B.outbox, B.rpc_pool, B.tracker, B.fee_estimator]
+    if args.local_builder:
+        services.append(B.pump_builder)
+        B.pool_resolver.add_listener(B.pump_builder.observe_curve)
+    for task in services:
+        task.start()
+
+    users = list(range(1, args.users + 1))
+    for user_id in users:
+        keypair = Keypair()
+        B.user_wallets[user_id] = str(keypair)
+        # Funded, so the balance check still passes once fills refresh the cache
+        api.add_wallet(str(keypair.pubkey()), 1000)
+
+    update_ids = iter(range(1, 10 ** 9))
+
+    def message(user_id: int, text: str = None, photo: bool = False) -> Update:
+        payload = {
+            "message_id": next(update_ids), "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+        }
+        if photo:
+            payload["photo"] = [{"file_id": f"photo{user_id}", "file_unique_id": f"u{user_id}", "width": 1, "height": 1}]
+        else:
+            payload["text"] = text
+        return Update.model_validate({"update_id": payload["message_id"], "message": payload}, context={"bot": B.bot})
+
+    def replied_ok(update: Update, since: int) -> bool:
+        message_id = update.message.message_id
+        return not any(
+            reply_to == message_id and text.startswith("❌") for _, reply_to, text in telegram.sent[since:]
+        )
+
+    async def buy(i: int) -> bool:
+        user_id = users[i % len(users)]
+        since = len(telegram.sent)
+        # A fresh mint per buy so the trade dedup window never merges requests
+        mint = str(Keypair().pubkey())
+        api.add_bonding_curve(mint)
+        update = message(user_id, f"/buy {mint} 0.01")
+        await B.dp.feed_update(B.bot, update)
+        return replied_ok(update, since)
+
+    async def dca_tick(i: int) -> bool:
+        user_id = users[i % len(users)]
+        mint = str(Keypair().pubkey())
+        api.add_bonding_curve(mint)
+        schedule = Schedule(user_id, user_id, mint, 0.01, "pump", next_run=time.time())
+        return await B.run_scheduled_buy(schedule)
+
+    wizard_locks = {user_id: asyncio.Lock() for user_id in users}
+
+    async def create_token(i: int) -> bool:
+        # A user can only be in one wizard at a time
+        user_id = users[i % len(users)]
+        async with wizard_locks[user_id]:
+            since = len(telegram.sent)
+            for text in ("/createtoken", f"Bench {i}", f"B{i}", "benchmark token", "none", "none", "none"):
+                await B.dp.feed_update(B.bot, message(user_id, text))
+            update = message(user_id, photo=True)
+            await B.dp.feed_update(B.bot, update)
+            return replied_ok(update, since)
+
+    results = {
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "latency_s": args.latency,
+            "tg_latency_s": args.tg_latency,
+            "error_rate": args.error_rate,
+            "local_builder": args.local_builder,
+            "python": platform.python_version(),
+        },
+        "scenarios": {},
+    }
+    scenarios = [
+        ("buy", args.buys, args.concurrency, buy),
+        ("dca_tick", args.ticks, args.concurrency, dca_tick),
+        ("createtoken", args.launches, min(args.concurrency, args.users), create_token),
+    ]
+    for name, count, concurrency, job in scenarios:
+        if count:
+            results["scenarios"][name] = await run_scenario(name, count, concurrency, job)
+
+    for task in services:
+        await task.stop()
+    await B.transport.close()
+    await B.bot.session.close()
+    B.store.close()
+    api.stop_thread()
+    telegram.stop_thread()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--buys", type=int, default=200)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--launches", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="pumpportal/RPC/Jito stub latency in seconds")
+    parser.add_argument("--tg-latency", type=float, default=0.01, help="Telegram Bot API stub latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream requests failing with 503")
+    parser.add_argument("--local-builder", action="store_true", help="build pump.fun trades locally (LOCAL_TX_BUILDER)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
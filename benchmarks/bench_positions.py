@@ -0,0 +1,84 @@
+"""Cost of one take-profit/stop-loss evaluation pass as positions and mints grow.
+
+Fills a PositionBook with ``--positions`` positions spread over ``--mints``
+mints whose bonding curves live on a local RPC stub. It then times full
+``evaluate`` passes (batched price fetch plus the vectorized rule check)
+and reports how many RPC requests each pass made.
+
+    python benchmarks/bench_positions.py --positions 100000 --mints 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict
+
+from solders.keypair import Keypair
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stubs import StubServer  # noqa: E402
+from positions import PositionBook  # noqa: E402
+from rpc_pool import RpcPool  # noqa: E402
+
+
+async def never_sold(position, reason) -> bool:
+    return False
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    api = StubServer(latency=args.latency).start_in_thread()
+    rpc_pool = RpcPool([f"{api.base_url}/rpc"])
+    book = PositionBook(never_sold, rpc_pool=rpc_pool, retry_delay=3600)
+
+    mints = [str(Keypair().pubkey()) for _ in range(args.mints)]
+    for mint in mints:
+        api.add_bonding_curve(mint)
+    for index in range(args.positions):
+        book.record_fill(index, index, mints[index % len(mints)], 0.1)
+        # Rules that never fire, so every pass checks every position
+        book.set_rules(index, mints[index % len(mints)], take_profit=10.0, stop_loss=0.99, trailing_stop=0.99)
+
+    # The first pass prices the fills
+    await book.evaluate()
+    passes = []
+    requests = api.requests
+    for _ in range(args.passes):
+        started = time.perf_counter()
+        await book.evaluate()
+        passes.append(time.perf_counter() - started)
+    requests = (api.requests - requests) / args.passes
+
+    await rpc_pool.stop()
+    api.stop_thread()
+    passes.sort()
+    return {
+        "positions": args.positions,
+        "mints": args.mints,
+        "rpc_requests_per_pass": requests,
+        "pass_p50_ms": round(passes[len(passes) // 2] * 1000, 2),
+        "pass_max_ms": round(passes[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--positions", type=int, default=10000)
+    parser.add_argument("--mints", type=int, default=200)
+    parser.add_argument("--passes", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="RPC stub latency in seconds")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    for key, value in result.items():
+        print(f"{key:<22} {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
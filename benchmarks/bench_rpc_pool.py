@@ -0,0 +1,94 @@
+"""sendTransaction latency and failures for RpcPool routing modes.
+
+Starts three local RPC stubs: a fast node, a slow node and a node that fails
+every request. Each scenario sends ``--sends`` transactions and reports
+p50/p95 latency, failures and the final per-node stats.
+
+    python benchmarks/bench_rpc_pool.py --sends 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from solders.keypair import Keypair
+from solders.rpc.requests import SendVersionedTransaction
+from solders.transaction import VersionedTransaction
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stubs import StubServer, unsigned_transaction  # noqa: E402
+from http_client import HttpTransport  # noqa: E402
+from rpc_pool import RpcPool  # noqa: E402
+
+
+def send_payload() -> str:
+    keypair = Keypair()
+    unsigned = VersionedTransaction.from_bytes(unsigned_transaction(str(keypair.pubkey())))
+    return SendVersionedTransaction(VersionedTransaction(unsigned.message, [keypair])).to_json()
+
+
+async def scenario(name: str, pool: RpcPool, sends: int, concurrency: int) -> None:
+    await pool.probe()
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await pool.send_transaction(send_payload())
+                if "result" not in response:
+                    failures += 1
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(sends)))
+    await asyncio.sleep(2)  # let fanned-out stragglers queued on the slow node finish
+    latencies.sort()
+    print(
+        f"{name:<28} p50={statistics.median(latencies) * 1000:7.1f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95)] * 1000:7.1f}ms failures={failures}"
+    )
+    for stats in pool.stats():
+        print(f"    {stats}")
+
+
+async def run(sends: int, concurrency: int) -> None:
+    fast = StubServer(latency=0.02).start_in_thread()
+    slow = StubServer(latency=0.15).start_in_thread()
+    broken = StubServer(latency=0.01, error_rate=1.0).start_in_thread()
+    urls = {name: f"{stub.base_url}/rpc" for name, stub in (("fast", fast), ("slow", slow), ("broken", broken))}
+    transport = HttpTransport()
+
+    await scenario("single slow node", RpcPool([urls["slow"]], transport=transport), sends, concurrency)
+    await scenario(
+        "pool, fanout=1 (routing)",
+        RpcPool([urls["broken"], urls["slow"], urls["fast"]], transport=transport, fanout=1),
+        sends, concurrency
+    )
+    await scenario(
+        "pool, fanout=3 (race)",
+        RpcPool([urls["broken"], urls["slow"], urls["fast"]], transport=transport, fanout=3),
+        sends, concurrency
+    )
+
+    await transport.close()
+    for stub in (fast, slow, broken):
+        stub.stop_thread()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sends", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.sends, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Stress test for DcaScheduler with many concurrent schedules.
+
+Registers ``--schedules`` schedules with a short interval and a no-op run
+callback, then prints one row per sampling window with runs completed,
+traced Python memory and CPU time. Memory and CPU per run should stay flat
+as the run progresses.
+
+    python benchmarks/bench_scheduler.py --schedules 20000 --interval 2 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scheduler import DcaScheduler, Schedule  # noqa: E402
+
+
+async def run(schedules: int, interval: float, jitter: float, duration: float, window: float, workers: int):
+    runs = 0
+    lateness = []
+
+    async def noop(schedule: Schedule) -> bool:
+        nonlocal runs
+        runs += 1
+        lateness.append(time.time() - schedule.next_run)
+        return True
+
+    tracemalloc.start()
+    scheduler = DcaScheduler(noop, workers=workers)
+    now = time.time()
+    for i in range(schedules):
+        scheduler.add(Schedule(
+            user_id=i, chat_id=i, token_address="Mint", amount=0.01, pool="pump",
+            interval=interval, jitter=jitter, next_run=now + (i % 1000) * interval / 1000
+        ))
+    scheduler.start()
+
+    print(f"{'t_s':>6} {'runs':>8} {'runs/s':>8} {'mem_kb':>8} {'cpu_ms':>8} {'late_p99_ms':>12}")
+    started = time.perf_counter()
+    last_runs, last_cpu = 0, time.process_time()
+    while time.perf_counter() - started < duration:
+        await asyncio.sleep(window)
+        cpu = time.process_time()
+        current, _ = tracemalloc.get_traced_memory()
+        late = sorted(lateness)
+        p99 = late[int(len(late) * 0.99)] * 1000 if late else 0.0
+        print(
+            f"{time.perf_counter() - started:6.1f} {runs:8d} {(runs - last_runs) / window:8.0f} "
+            f"{current // 1024:8d} {(cpu - last_cpu) * 1000:8.0f} {p99:12.1f}"
+        )
+        last_runs, last_cpu = runs, cpu
+        lateness.clear()
+
+    await scheduler.stop()
+    tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schedules", type=int, default=10000)
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between runs of each schedule")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--window", type=float, default=1.0, help="sampling window (s)")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args.schedules, args.interval, args.jitter, args.duration, args.window, args.workers))
+
+
+if __name__ == "__main__":
+    main()
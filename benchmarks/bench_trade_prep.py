@@ -0,0 +1,60 @@
+"""Micro-benchmark of the trade-prep path before and after TraderCache.
+
+"before" rebuilds TradeConfig/SolanaTrader (base58 key decode) and
+stringifies the pubkey for every trade, as /buy and DCA ticks used to.
+"after" takes the user's trader from the cache and reuses its pubkey string.
+
+    python benchmarks/bench_trade_prep.py --users 1000 --number 20000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+from solders.keypair import Keypair
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from trader import SolanaTrader, TradeConfig, TraderCache  # noqa: E402
+
+MINT = "So11111111111111111111111111111111111111112"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20000, help="trade preps per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    wallets = {user_id: str(Keypair()) for user_id in range(args.users)}
+    cache = TraderCache(wallets)
+    user_ids = [random.randrange(args.users) for _ in range(args.number)]
+
+    def before():
+        for user_id in user_ids:
+            trader = SolanaTrader(TradeConfig(wallets[user_id]))
+            {
+                "publicKey": str(trader.config.keypair.pubkey()),
+                "action": "buy",
+                "mint": MINT,
+                "amount": 0.01,
+                "denominatedInSol": str(True).lower(),
+                "slippage": 10,
+                "priorityFee": 0.00001,
+                "pool": "pump"
+            }
+
+    def after():
+        for user_id in user_ids:
+            cache.get(user_id).trade_payload("buy", MINT, 0.01, True, 10, 0.00001, "pump")
+
+    after()  # warm the cache
+    for name, fn in (("before", before), ("after", after)):
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print(f"{name:>6}: {best / args.number * 1e6:8.2f} us/trade")
+
+
+if __name__ == "__main__":
+    main()
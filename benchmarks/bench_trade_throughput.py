@@ -0,0 +1,115 @@
+"""Trade throughput with N concurrent users against local stub servers.
+
+Runs ``SolanaTrader.execute_trade`` for every user concurrently and reports
+trades/s and the worst event-loop stall observed while trades are in flight.
+``--blocking`` swaps in a transport that calls ``requests.post`` directly, the
+way ``execute_trade`` used to, for a before/after comparison.
+
+    python benchmarks/bench_trade_throughput.py --users 1 10 50 --trades 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import requests
+from solders.keypair import Keypair
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stubs import StubServer  # noqa: E402
+from http_client import HttpTransport  # noqa: E402
+from portfolio import BalanceCache  # noqa: E402
+from rpc_pool import RpcPool  # noqa: E402
+from trader import SolanaTrader, TradeConfig  # noqa: E402
+
+
+class BlockingTransport:
+    """Old behaviour: synchronous requests.post inside the event loop"""
+
+    async def post_bytes(self, url, json=None, data=None, headers=None, timeout=None):
+        response = requests.post(url, json=json, data=data, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+
+    async def post_json(self, url, json=None, data=None, headers=None, timeout=None):
+        response = requests.post(url, json=json, data=data, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def close(self):
+        pass
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(users: int, trades: int, latency: float, blocking: bool) -> dict:
+    stub = StubServer(latency=latency).start_in_thread()
+    transport = BlockingTransport() if blocking else HttpTransport()
+    rpc_pool = RpcPool([f"{stub.base_url}/rpc"], transport=transport)
+    balances = BalanceCache(rpc_pool)
+    keypairs = [Keypair() for _ in range(users)]
+    for keypair in keypairs:
+        stub.add_wallet(str(keypair.pubkey()), 1000)
+    traders = [
+        SolanaTrader(
+            TradeConfig(
+                str(keypair),
+                api_endpoint=f"{stub.base_url}/api/trade-local",
+                rpc_pool=rpc_pool
+            ),
+            transport=transport,
+            balances=balances
+        )
+        for keypair in keypairs
+    ]
+
+    async def user_loop(trader: SolanaTrader) -> int:
+        ok = 0
+        for _ in range(trades):
+            result = await trader.execute_trade("buy", "So11111111111111111111111111111111111111112", pool="pump")
+            ok += result["success"]
+        return ok
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started = time.perf_counter()
+    successes = sum(await asyncio.gather(*(user_loop(t) for t in traders)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_lag = await lag_task
+
+    await transport.close()
+    stub.stop_thread()
+    return {
+        "users": users,
+        "trades": users * trades,
+        "successes": successes,
+        "elapsed_s": round(elapsed, 3),
+        "trades_per_s": round(users * trades / elapsed, 1),
+        "max_loop_lag_ms": round(worst_lag * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--trades", type=int, default=5, help="trades per user")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per request (s)")
+    parser.add_argument("--blocking", action="store_true", help="use the old blocking requests transport")
+    args = parser.parse_args()
+
+    for users in args.users:
+        print(asyncio.run(run(users, args.trades, args.latency, args.blocking)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Replay recorded webhook updates against the bot to find where it falls over.
+
+Reads a recording made with ``UPDATE_RECORD_PATH`` (see recorder.py) and
+pushes every update through bot.py's webhook handler, so dedup, the update
+queue and the real dispatcher all take part. All external calls go to local
+stubs. ``--speed`` 1 keeps the recorded pacing, 10 plays ten times faster
+and 0 plays as fast as possible. ``--multiply`` clones every update onto that
+many distinct users to raise concurrency. The report covers sustained
+updates/s, shed updates, event-loop lag and memory growth.
+
+    python benchmarks/replay_updates.py updates.jsonl --speed 10 --multiply 20
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from solders.keypair import Keypair
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.bench_bot import configure  # noqa: E402
+from benchmarks.stubs import StubServer  # noqa: E402
+from recorder import SCRUBBED, read_recording  # noqa: E402
+
+# Clones of a user get ids this far apart, well clear of real Telegram ids
+USER_ID_STRIDE = 10 ** 12
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, but still shows growth
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _event(update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return next((value for key, value in update.items() if key != "update_id" and isinstance(value, dict)), None)
+
+
+def clone_for_user(update: Dict[str, Any], offset: int) -> Dict[str, Any]:
+    """Copy of ``update`` sent by a distinct synthetic user ``offset`` ids away"""
+    update = copy.deepcopy(update)
+    event = _event(update)
+    if event is not None:
+        sender = event.get("from")
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if sender is not None:
+            if chat is not None and chat.get("id") == sender["id"]:
+                chat["id"] += offset
+            sender["id"] += offset
+    return update
+
+
+def load(path: str, multiply: int, loops: int) -> List[Tuple[float, Dict[str, Any]]]:
+    recording = list(read_recording(path))
+    if not recording:
+        raise SystemExit(f"{path} holds no updates")
+    duration = recording[-1][0] + 1.0
+    timeline = []
+    for loop in range(loops):
+        for offset, update in recording:
+            for copy_index in range(multiply):
+                timeline.append((loop * duration + offset, clone_for_user(update, copy_index * USER_ID_STRIDE)))
+    return timeline
+
+
+async def sample_lag(lags: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+class _Request:
+    """Just enough of ``aiohttp.web.Request`` for ``webhook_handler``"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self._payload = payload
+
+    async def json(self) -> Dict[str, Any]:
+        return self._payload
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Holds the bot's SQLite database and WAL files for this run only
+    with tempfile.TemporaryDirectory(prefix="replay_") as workdir:
+        return await _run(args, workdir)
+
+
+async def _run(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    timeline = load(args.recording, args.multiply, args.loops)
+
+    api = StubServer(latency=args.latency, error_rate=args.error_rate).start_in_thread()
+    telegram = StubServer(latency=args.tg_latency).start_in_thread()
+    configure(api, telegram, workdir)
+
+    import bot as B
+
+    for service in (B.update_queue, B.outbox, B.rpc_pool, B.tracker, B.fee_estimator):
+        service.start()
+
+    # Keys are scrubbed from recordings, so every sender gets a fresh wallet
+    keys: Dict[int, str] = {}
+    for _, update in timeline:
+        sender = (_event(update) or {}).get("from")
+        if sender is not None and sender["id"] not in keys:
+            keypair = Keypair()
+            keys[sender["id"]] = str(keypair)
+            B.user_wallets[sender["id"]] = keys[sender["id"]]
+            api.add_wallet(str(keypair.pubkey()), 1000)
+        message = update.get("message") or {}
+        if sender is not None and SCRUBBED in message.get("text", ""):
+            message["text"] = message["text"].replace(SCRUBBED, keys[sender["id"]])
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(sample_lag(lags, stop))
+    rss_start = rss_bytes()
+    rss_peak = rss_start
+    shed = 0
+
+    started = time.monotonic()
+    for update_id, (offset, update) in enumerate(timeline, start=1):
+        if args.speed > 0:
+            delay = started + offset / args.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            # A real server yields between requests; let the workers run
+            await asyncio.sleep(0)
+        update["update_id"] = update_id
+        response = await B.webhook_handler(_Request(update))
+        shed += response.status != 200
+        if update_id % 500 == 0:
+            rss_peak = max(rss_peak, rss_bytes())
+
+    await B.update_queue.join()
+    elapsed = time.monotonic() - started
+    rss_end = rss_bytes()
+    rss_peak = max(rss_peak, rss_end)
+    stop.set()
+    await lag_task
+
+    queue = B.update_queue.stats()
+    lags.sort()
+    result = {
+        "recording": args.recording,
+        "speed": args.speed,
+        "multiply": args.multiply,
+        "updates": len(timeline),
+        "processed": queue["processed"],
+        "shed": shed,
+        "failed": queue["failed"],
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(queue["processed"] / elapsed, 2),
+        "queue_wait_avg_ms": queue["avg_wait_ms"],
+        "queue_wait_max_ms": queue["max_wait_ms"],
+        "loop_lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2) if lags else 0.0,
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 2) if lags else 0.0,
+        "loop_lag_max_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+        "rss_start_mb": round(rss_start / 2 ** 20, 1),
+        "rss_peak_mb": round(rss_peak / 2 ** 20, 1),
+        "rss_growth_mb": round((rss_end - rss_start) / 2 ** 20, 1),
+    }
+
+    for service in (B.update_queue, B.outbox, B.tracker, B.fee_estimator, B.rpc_pool):
+        await service.stop()
+    await B.transport.close()
+    await B.bot.session.close()
+    B.store.close()
+    api.stop_thread()
+    telegram.stop_thread()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="line-delimited update recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = recorded pace, 10 = ten times faster, 0 = max")
+    parser.add_argument("--multiply", type=int, default=1, help="replay every update as this many distinct users")
+    parser.add_argument("--loops", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="pumpportal/RPC/Jito stub latency in seconds")
+    parser.add_argument("--tg-latency", type=float, default=0.01, help="Telegram Bot API stub latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+    args.recording = os.path.abspath(args.recording)
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    result = asyncio.run(run(args))
+    for key, value in result.items():
+        print(f"{key:<18} {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Run the TWAP engine against a simulated pump.fun bonding curve.
+
+The curve is an in-memory constant-product market with other traders
+buying and selling at random every ``--tick`` seconds, optionally with a
+``--drift`` of net buying. A one-shot buy of ``--total`` SOL is compared
+with TWAP executions over ``--duration`` seconds for each slice count in
+``--slices``. The report shows the fill, the child count and the average
+price paid relative to the arrival price.
+
+Our own buys move the curve for good, since nothing here reverts, so
+slicing does not lower the average price: with ``--flow 0`` every mode
+pays the same, and with flow the TWAP runs pay the one-shot price plus
+whatever other buyers added meanwhile. What slicing buys is a cap on each
+child's impact and an order that can stop or be cancelled part way.
+
+    python benchmarks/sim_twap.py --total 20 --duration 5 --slices 5 10 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, List, Sequence
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pools import BondingCurveState  # noqa: E402
+from twap import LAMPORTS_PER_SOL, ParentOrder, TwapEngine  # noqa: E402
+
+MINT = "SimMint1111111111111111111111111111111111111"
+
+
+class SimulatedCurve:
+    """Constant-product bonding curve at pump.fun launch reserves, fees ignored"""
+
+    def __init__(self, sol_reserves: float = 30.0, token_reserves: float = 1_073_000_000.0):
+        self.sol = sol_reserves
+        self.tokens = token_reserves
+
+    def state(self) -> BondingCurveState:
+        return BondingCurveState(
+            int(self.tokens * 10 ** 6), int(self.sol * LAMPORTS_PER_SOL),
+            int(self.tokens * 10 ** 6), 0, 10 ** 15, False
+        )
+
+    def price(self) -> float:
+        return self.sol / self.tokens
+
+    def buy(self, sol: float) -> float:
+        """Tokens out for ``sol`` in"""
+        tokens = self.tokens * sol / (self.sol + sol)
+        self.sol += sol
+        self.tokens -= tokens
+        return tokens
+
+    def sell(self, tokens: float) -> float:
+        sol = self.sol * tokens / (self.tokens + tokens)
+        self.tokens += tokens
+        self.sol -= sol
+        return sol
+
+
+async def other_traders(curve: SimulatedCurve, tick: float, flow: float, drift: float) -> None:
+    while True:
+        await asyncio.sleep(tick)
+        size = random.gauss(drift, flow)
+        if size > 0:
+            curve.buy(size)
+        elif size < 0:
+            curve.sell(min(-size / curve.price(), curve.tokens * 0.01))
+
+
+async def run_twap(args: argparse.Namespace, slices: int) -> Dict[str, Any]:
+    curve = SimulatedCurve()
+    spent = {"sol": 0.0, "tokens": 0.0}
+
+    async def execute(order: ParentOrder, sol: float) -> Dict[str, Any]:
+        spent["tokens"] += curve.buy(sol)
+        spent["sol"] += sol
+        return {"success": True, "signature": "sim"}
+
+    async def curves(mints: Sequence[str]) -> List[BondingCurveState]:
+        return [curve.state() for _ in mints]
+
+    arrival = curve.price()
+    engine = TwapEngine(execute, curves=curves)
+    engine.start()
+    noise = asyncio.create_task(other_traders(curve, args.tick, args.flow, args.drift))
+    order = ParentOrder(
+        1, 1, MINT, args.total, args.duration, slices, max_slippage=args.max_slippage / 100, min_interval=0
+    )
+    engine.add(order)
+    await engine.join()
+    noise.cancel()
+    await engine.stop()
+    average = spent["sol"] / spent["tokens"] if spent["tokens"] else None
+    return {
+        "mode": f"twap/{slices}",
+        "status": order.status,
+        "filled_sol": round(spent["sol"], 4),
+        "children": order.children,
+        "impact_scale": round(order.impact_scale, 2),
+        "avg_vs_arrival_pct": round((average / arrival - 1) * 100, 3) if average else None,
+    }
+
+
+def run_one_shot(args: argparse.Namespace) -> Dict[str, Any]:
+    curve = SimulatedCurve()
+    arrival = curve.price()
+    tokens = curve.buy(args.total)
+    return {
+        "mode": "one-shot",
+        "status": "done",
+        "filled_sol": args.total,
+        "children": 1,
+        "impact_scale": None,
+        "avg_vs_arrival_pct": round((args.total / tokens / arrival - 1) * 100, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    random.seed(args.seed)
+    results = [run_one_shot(args)]
+    for slices in args.slices:
+        results.append(await run_twap(args, slices))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--total", type=float, default=10.0, help="SOL to buy")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds")
+    parser.add_argument("--slices", type=int, nargs="+", default=[5, 10, 40])
+    parser.add_argument("--max-slippage", type=float, default=3.0, help="percent over the arrival price")
+    parser.add_argument("--tick", type=float, default=0.05, help="seconds between other traders' orders")
+    parser.add_argument("--flow", type=float, default=0.2, help="std dev of other traders' orders in SOL")
+    parser.add_argument("--drift", type=float, default=0.0, help="mean of other traders' orders in SOL")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for result in results:
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
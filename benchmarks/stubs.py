@@ -0,0 +1,299 @@
+"""Local stand-ins for pumpportal, pump.fun IPFS, Solana JSON-RPC, Jito and the Telegram Bot API used by the benchmarks"""
+import asyncio
+import base64
+import json
+import random
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import base58
+from aiohttp import web
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.system_program import TransferParams, transfer
+from solders.transaction import VersionedTransaction
+
+
+def unsigned_transaction(public_key: str, co_signer: Optional[str] = None) -> bytes:
+    """Build an unsigned v0 transaction paid by ``public_key``.
+
+    ``co_signer`` adds a zero-lamport transfer so the transaction also needs
+    that key's signature, like the mint keypair on a pump.fun ``create``.
+    """
+    payer = Pubkey.from_string(public_key)
+    instructions = []
+    if co_signer:
+        instructions.append(transfer(TransferParams(
+            from_pubkey=Pubkey.from_string(co_signer), to_pubkey=payer, lamports=0
+        )))
+    message = MessageV0.try_compile(payer, instructions, [], Hash.default())
+    signatures = [Signature.default()] * message.header.num_required_signatures
+    return bytes(VersionedTransaction.populate(message, signatures))
+
+
+def bonding_curve_data(complete: bool = False, creator: Optional[str] = None) -> bytes:
+    """Raw pump.fun bonding curve account at its launch reserves"""
+    data = struct.pack(
+        "<8sQQQQQ?", bytes(8),
+        1_073_000_000_000_000, 30_000_000_000, 793_100_000_000_000, 0, 1_000_000_000_000_000, complete
+    )
+    return data + bytes(Pubkey.from_string(creator) if creator else Keypair().pubkey())
+
+
+# Smallest valid PNG (1x1 transparent pixel), served as every downloaded photo
+PNG_1X1 = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+class StubServer:
+    """aiohttp app serving pumpportal ``trade-local``/``create-wallet``, pump.fun IPFS, RPC,
+    Jito ``sendBundle`` and enough of the Telegram Bot API for the bot's handlers.
+
+    Every request waits ``latency`` seconds and then fails with a 503 with
+    probability ``error_rate``. Accepted Jito bundles land, or are dropped
+    with probability ``drop_rate``. Messages the bot sends are kept in ``sent``
+    as ``(chat_id, reply_to_message_id, text)``.
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, drop_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.requests = 0
+        self.landed = set()
+        self.accounts: Dict[str, bytes] = {}
+        self.lamports: Dict[str, int] = {}
+        self.owners: Dict[str, str] = {}
+        self.token_balances: Dict[str, Dict[str, float]] = {}
+        self.sent: List[Tuple[int, Optional[int], str]] = []
+        self.submitted_bundles: List[List[str]] = []
+        self.bundle_states: Dict[str, str] = {}
+        self.runner: Optional[web.AppRunner] = None
+        self.port = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/api/trade-local", self.trade_local)
+        self.app.router.add_post("/rpc", self.rpc)
+        self.app.router.add_post("/api/ipfs", self.ipfs)
+        self.app.router.add_post("/api/v1/bundles", self.bundles)
+        self.app.router.add_post("/api/v1/getInflightBundleStatuses", self.bundles)
+        self.app.router.add_post("/api/create-wallet", self.create_wallet)
+        self.app.router.add_post("/bot{token}/{method}", self.telegram)
+        self.app.router.add_get("/file/bot{token}/{path:.+}", self.telegram_file)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise web.HTTPServiceUnavailable()
+
+    async def trade_local(self, request: web.Request) -> web.Response:
+        await self._delay()
+        payload = await request.json()
+        if isinstance(payload, list):
+            return web.json_response([
+                base58.b58encode(unsigned_transaction(
+                    args["publicKey"], args["mint"] if args.get("action") == "create" else None
+                )).decode()
+                for args in payload
+            ])
+        if payload.get("pool") == "pump" and payload.get("action") in ("buy", "sell"):
+            body = self._pump_trade(payload)
+            if body is not None:
+                return web.Response(body=body)
+        return web.Response(body=unsigned_transaction(payload["publicKey"]))
+
+    def _pump_trade(self, payload: dict) -> Optional[bytes]:
+        """Unsigned pump.fun curve trade with the account layout of the local builder"""
+        from pools import bonding_curve_address, bonding_curve_creator
+        from pump_builder import PumpTransactionBuilder, Quote
+        data = self.accounts.get(bonding_curve_address(payload["mint"]))
+        if data is None:
+            return None
+        payer = Pubkey.from_string(payload["publicKey"])
+        instructions = PumpTransactionBuilder()._instructions(
+            payer, payload["action"], payload["mint"], bonding_curve_creator(data), Quote(1, 1, 1), 0.0
+        )
+        message = MessageV0.try_compile(payer, instructions, [], Hash.default())
+        return bytes(VersionedTransaction.populate(message, [Signature.default()]))
+
+    async def rpc(self, request: web.Request) -> web.Response:
+        await self._delay()
+        payload = await request.json()
+        if payload.get("method") == "sendTransaction":
+            tx = VersionedTransaction.from_bytes(base64.b64decode(payload["params"][0]))
+            result = str(tx.signatures[0])
+            self.landed.add(result)
+        elif payload.get("method") == "getSignatureStatuses":
+            result = {"context": {"slot": 1}, "value": [
+                {"slot": 1, "confirmations": None, "err": None, "confirmationStatus": "confirmed"}
+                if signature in self.landed else None
+                for signature in payload["params"][0]
+            ]}
+        elif payload.get("method") == "getRecentPrioritizationFees":
+            result = [{"slot": slot, "prioritizationFee": random.randint(0, 50000)} for slot in range(150)]
+        elif payload.get("method") == "getMultipleAccounts":
+            result = {"context": {"slot": 1}, "value": [
+                self._account(address) for address in payload["params"][0]
+            ]}
+        elif payload.get("method") == "getTokenAccountsByOwner":
+            from portfolio import TOKEN_PROGRAMS
+            result = {"context": {"slot": 1}, "value": [
+                {"pubkey": str(Keypair().pubkey()), "account": {"data": {"parsed": {"info": {
+                    "mint": mint, "tokenAmount": {"uiAmount": amount, "decimals": 6},
+                }}}}}
+                for mint, amount in self.token_balances.get(payload["params"][0], {}).items()
+                # Holdings are all classic SPL tokens; Token-2022 accounts come back empty
+                if payload["params"][1].get("programId") == TOKEN_PROGRAMS[0]
+            ]}
+        elif payload.get("method") == "getAccountInfo":
+            result = {"context": {"slot": 1}, "value": self._account(payload["params"][0])}
+        elif payload.get("method") == "getLatestBlockhash":
+            result = {"context": {"slot": 1}, "value": {"blockhash": str(Hash.default()), "lastValidBlockHeight": 1}}
+        elif payload.get("method") == "getHealth":
+            result = "ok"
+        else:
+            result = None
+        return web.json_response({"jsonrpc": "2.0", "id": payload.get("id"), "result": result})
+
+    def add_bonding_curve(
+        self, mint: str, complete: bool = False, token_program: str = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+    ) -> None:
+        """Make ``mint`` look like a live pump.fun token, owned by ``token_program``"""
+        from pools import bonding_curve_address
+        self.accounts[bonding_curve_address(mint)] = bonding_curve_data(complete)
+        self.accounts[mint] = bytes(82)
+        self.owners[mint] = token_program
+
+    def add_wallet(self, owner: str, sol: float, tokens: Optional[Dict[str, float]] = None) -> None:
+        """Give ``owner`` a SOL balance and token holdings"""
+        self.lamports[owner] = int(sol * 1_000_000_000)
+        self.token_balances[owner] = dict(tokens or {})
+
+    def _account(self, address: str) -> Optional[dict]:
+        data = self.accounts.get(address)
+        if data is None and address not in self.lamports:
+            return None
+        return {
+            "data": [base64.b64encode(data or b"").decode(), "base64"],
+            "executable": False, "lamports": self.lamports.get(address, 1), "owner": self.owners.get(address, "11111111111111111111111111111111"), "rentEpoch": 0
+        }
+
+    async def ipfs(self, request: web.Request) -> web.Response:
+        await self._delay()
+        form = await request.post()
+        return web.json_response({"metadataUri": f"https://ipfs.example/{form['symbol']}"})
+
+    async def bundles(self, request: web.Request) -> web.Response:
+        await self._delay()
+        payload = await request.json()
+        method = payload.get("method")
+        if method == "sendBundle":
+            transactions = payload["params"][0]
+            if len(transactions) > 5:
+                return web.json_response({
+                    "jsonrpc": "2.0", "id": payload.get("id"),
+                    "error": {"code": -32602, "message": "bundle contains too many transactions"}
+                })
+            self.submitted_bundles.append(transactions)
+            result = f"stub-bundle-{len(self.submitted_bundles)}"
+            dropped = self.drop_rate and random.random() < self.drop_rate
+            self.bundle_states[result] = "Failed" if dropped else "Landed"
+            if not dropped:
+                for encoded in transactions:
+                    tx = VersionedTransaction.from_bytes(base64.b64decode(encoded))
+                    self.landed.add(str(tx.signatures[0]))
+        elif method == "getInflightBundleStatuses":
+            result = {"context": {"slot": 1}, "value": [
+                {"bundle_id": bundle_id, "status": self.bundle_states.get(bundle_id, "Invalid"), "landed_slot": 1}
+                for bundle_id in payload["params"][0]
+            ]}
+        elif method == "getBundleStatuses":
+            result = {"context": {"slot": 1}, "value": [
+                {"bundle_id": bundle_id, "transactions": [], "slot": 1,
+                 "confirmation_status": "confirmed", "err": {"Ok": None}}
+                for bundle_id in payload["params"][0] if self.bundle_states.get(bundle_id) == "Landed"
+            ]}
+        else:
+            result = None
+        return web.json_response({"jsonrpc": "2.0", "id": payload.get("id"), "result": result})
+
+    async def create_wallet(self, request: web.Request) -> web.Response:
+        await self._delay()
+        keypair = Keypair()
+        return web.json_response({
+            "walletPublicKey": str(keypair.pubkey()),
+            "privateKey": str(keypair),
+            "apiKey": "stub-api-key"
+        })
+
+    async def telegram(self, request: web.Request) -> web.Response:
+        await self._delay()
+        method = request.match_info["method"]
+        data = await request.post()
+        if method in ("sendMessage", "sendPhoto"):
+            chat_id = int(data["chat_id"])
+            text = data.get("text", data.get("caption", ""))
+            reply_to = data.get("reply_to_message_id")
+            if "reply_parameters" in data:
+                reply_to = json.loads(data["reply_parameters"])["message_id"]
+            self.sent.append((chat_id, int(reply_to) if reply_to else None, text))
+            result = {
+                "message_id": len(self.sent), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": text
+            }
+        elif method == "getFile":
+            result = {
+                "file_id": data["file_id"], "file_unique_id": data["file_id"],
+                "file_size": len(PNG_1X1), "file_path": f"photos/{data['file_id']}.png"
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def telegram_file(self, request: web.Request) -> web.Response:
+        await self._delay()
+        return web.Response(body=PNG_1X1, content_type="image/png")
+
+    async def start(self) -> "StubServer":
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def start_in_thread(self) -> "StubServer":
+        """Serve from a private event loop so the caller's loop only sees client load"""
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=serve, daemon=True).start()
+        ready.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
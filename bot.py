@@ -1,27 +1,51 @@
 import logging
 import asyncio
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from aiogram import Bot, Dispatcher, types
 import aiogram
 from aiogram.enums import ParseMode
-from aiogram.filters import Command
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram import F
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
 from datetime import datetime
 import random
+import math
 import os
 from pathlib import Path
+import io
 import json
 from datetime import datetime, timedelta
 import sys
-import requests
-from solders.transaction import VersionedTransaction
+import time
 from solders.keypair import Keypair
-from solders.commitment_config import CommitmentLevel
-from solders.rpc.requests import SendVersionedTransaction
-from solders.rpc.config import RpcSendTransactionConfig
 from creation import create_token_bundle
+from http_client import transport
+from rpc_pool import rpc_pool
+from confirmations import tracker
+from fees import fee_estimator, FEE_TIER
+from pools import pool_resolver
+from pump_builder import LOCAL_TX_BUILDER, pump_builder
+from trader import BatchTrader, TraderCache
+from scheduler import DcaScheduler, Schedule
+from positions import EXIT_REASONS, Position, PositionBook
+from portfolio import balance_cache
+from resilience import api_guard
+from twap import (
+    TWAP_DEFAULT_SLICES, TWAP_MAX_DURATION, TWAP_MAX_SLIPPAGE, TWAP_MIN_DURATION, ParentOrder, TwapEngine
+)
+from store import FanoutWallets, Store, PersistentWallets
+from conversation import TokenCreation, TOKEN_CREATION_STEPS, TOKEN_CREATION_INDEX, TTLMemoryStorage
+from update_queue import UpdateQueue
+from dedup import seen_updates, trade_guard
+from outbox import Outbox
+from metrics import Gauge, Histogram, default_registry
+from recorder import open_recorder
+from images import pick_photo_size
 from aiohttp import web
 from dotenv import load_dotenv
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import setup_application
 
 
 load_dotenv()
@@ -42,9 +66,16 @@ HOST = '0.0.0.0'  # Important for Render
 
 # Bot Configuration
 CHAT_ID = '-1002396701760'  # Your chat ID
-API_URL = "https://pumpportal.fun/api"
-# Store user private keys (in memory - consider using a secure database in production)
-user_wallets = {}
+API_URL = os.getenv('PUMPPORTAL_API_URL', "https://pumpportal.fun/api")
+# Optional Bot API server, e.g. a self-hosted telegram-bot-api or a local stand-in
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+# Wallets and schedules are persisted in SQLite; private keys are encrypted at rest
+store = Store()
+user_wallets = PersistentWallets(store)
+traders = TraderCache(user_wallets)
+fanout_wallets = FanoutWallets(store)
+# Extra wallets a user can spread one /buy across
+FANOUT_MAX_WALLETS = int(os.getenv('FANOUT_MAX_WALLETS', 20))
 
 
 # After load_dotenv()
@@ -63,9 +94,229 @@ BUY_MESSAGES = [
 ]
 
 # Initialize bot
-bot = Bot(token=TELEGRAM_BOT_TOKEN)
-dp = Dispatcher()
-active_schedules = {}
+bot = Bot(
+    token=TELEGRAM_BOT_TOKEN,
+    session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+)
+dp = Dispatcher(storage=TTLMemoryStorage())
+# Fill and confirmation notifications go out paced and coalesced per chat
+outbox = Outbox(bot)
+
+HANDLER_SECONDS = Histogram("handler_seconds", "Message handler latency by command", ["command"])
+
+@dp.message.middleware()
+async def handler_timing(handler, event: types.Message, data: Dict[str, Any]):
+    """Time every matched message handler, labelled by command or wizard step"""
+    command = data.get("command")
+    label = command.command if command is not None else data["handler"].callback.__name__
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        HANDLER_SECONDS.labels(label).observe(time.perf_counter() - started)
+
+def confirmation_notifier(chat_id: int, label: str):
+    """Build a tracker callback that tells the user how a transaction ended"""
+    async def notify(result: Dict[str, Any]) -> None:
+        tx_url = f"https://solscan.io/tx/{result['signature']}"
+        if result["status"] == "confirmed":
+            text = f"✅ {label} confirmed on-chain\nTX: {tx_url}"
+        elif result["status"] == "failed":
+            text = f"❌ {label} failed on-chain: {result['error']}\nTX: {tx_url}"
+        else:
+            text = f"⚠️ {label} not confirmed after {int(tracker.timeout)}s\nTX: {tx_url}"
+        outbox.send(chat_id, text)
+    return notify
+
+async def run_scheduled_buy(schedule: Schedule) -> bool:
+    """Execute one DCA buy; called by the scheduler's worker pool"""
+    if schedule.user_id not in user_wallets:
+        logger.error(f"Schedule error for {schedule.key}: no private key set")
+        return False
+
+    # Follows the token onto Raydium once its bonding curve completes
+    schedule.pool = await pool_resolver.resolve(schedule.token_address)
+
+    trader = traders.get(schedule.user_id)
+    result = await trader.execute_trade(
+        action="buy",
+        mint_address=schedule.token_address,
+        amount=schedule.amount,
+        denominated_in_sol=True,
+        pool=schedule.pool,
+        fee_tier=FEE_TIER,
+        # One trade per schedule slot, even if the tick is delivered twice
+        idempotency_key=f"dca:{schedule.key}:{int(schedule.anchor)}"
+    )
+
+    if result.get("duplicate"):
+        return result["success"]
+    if result["success"]:
+        tracker.track(result["signature"], confirmation_notifier(schedule.chat_id, "Scheduled buy"))
+        success_msg = (
+            f"✅ Scheduled buy executed on {schedule.pool.upper()}!\n"
+            f"Amount: {schedule.amount} SOL\n"
+            f"Token: {schedule.token_address}\n"
+            f"TX: {result['solscan_url']}"
+        )
+        outbox.send(schedule.chat_id, success_msg)
+        position_book.record_fill(schedule.user_id, schedule.chat_id, schedule.token_address, schedule.amount)
+    else:
+        pool_resolver.invalidate(schedule.token_address)
+    return result["success"]
+
+scheduler = DcaScheduler(run_scheduled_buy, on_reschedule=store.update_next_run)
+Gauge("dca_active_schedules", "DCA schedules currently held by the scheduler", lambda: len(scheduler))
+Gauge("pending_confirmations", "Sent signatures awaiting confirmation", lambda: tracker.pending)
+Gauge("api_breakers_open", "pumpportal/pump.fun endpoints with an open circuit breaker", api_guard.open_breakers)
+
+EXIT_LABELS = dict(zip(EXIT_REASONS, ("Take profit", "Stop loss", "Trailing stop")))
+
+def message_trade_key(message: types.Message) -> str:
+    """Idempotency key of a trade command: a redelivered message repeats it, a new one does not"""
+    return f"msg:{message.chat.id}:{message.message_id}"
+
+async def sell_position(
+    user_id: int, chat_id: int, mint: str, percent: float, label: str, idempotency_key: str,
+    report_failure: bool = True
+) -> Dict[str, Any]:
+    """Sell ``percent`` of the user's tokens in ``mint`` and report it to the chat"""
+    pool = await pool_resolver.resolve(mint)
+    result = await traders.get(user_id).execute_trade(
+        action="sell",
+        mint_address=mint,
+        amount=f"{percent:g}%",
+        denominated_in_sol=False,
+        pool=pool,
+        fee_tier=FEE_TIER,
+        idempotency_key=idempotency_key
+    )
+    if result.get("duplicate"):
+        return result
+    if result["success"]:
+        tracker.track(result["signature"], confirmation_notifier(chat_id, label))
+        outbox.send(chat_id, f"✅ {label}: sold {percent:g}% of {mint} on {pool.upper()}\nTX: {result['solscan_url']}")
+    else:
+        pool_resolver.invalidate(mint)
+        if report_failure:
+            outbox.send(chat_id, f"❌ {label} of {mint} failed: {result.get('error', 'Unknown error')}")
+    return result
+
+async def exit_position(position: Position, reason: str) -> bool:
+    """Position book exit handler: sell everything once a rule fires"""
+    if position.user_id not in user_wallets:
+        logger.error(f"Exit error for {position.key}: no private key set")
+        return False
+    label = EXIT_LABELS[reason]
+    if position.entry_price and position.last_price:
+        label += f" ({(position.last_price / position.entry_price - 1) * 100:+.1f}%)"
+    # Failures are retried quietly; the user hears once if the book gives up
+    result = await sell_position(
+        position.user_id, position.chat_id, position.mint, 100, label,
+        idempotency_key=f"exit:{position.key}:{position.opened_at:.6f}:{reason}",
+        report_failure=False
+    )
+    if result.get("error_class") == "NothingToSell":
+        position_book.close(position.user_id, position.mint)
+        outbox.send(
+            position.chat_id,
+            f"ℹ️ {label}: no {position.mint} tokens left in your wallet, position closed"
+        )
+    elif not result["success"]:
+        logger.warning(f"Exit of {position.key} failed: {result.get('error')}")
+    return result["success"]
+
+async def abandon_position(position: Position, reason: str) -> None:
+    """Position book hook: every exit attempt failed and the position was closed"""
+    outbox.send(
+        position.chat_id,
+        f"❌ {EXIT_LABELS[reason]} of {position.mint} failed {position_book.max_attempts} times, "
+        f"stopped watching it. Sell by hand with /sell {position.mint}"
+    )
+
+position_book = PositionBook(
+    exit_position, on_save=store.save_position, on_delete=store.delete_position, on_abandon=abandon_position
+)
+Gauge("open_positions", "Positions watched by the take-profit/stop-loss engine", lambda: len(position_book))
+
+async def restore_positions() -> None:
+    restored = 0
+    for batch in store.iter_positions():
+        restored += position_book.restore(batch)
+        await asyncio.sleep(0)
+    logger.info(f"Restored {restored} positions")
+
+async def run_twap_child(order: ParentOrder, sol: float) -> Dict[str, Any]:
+    """Buy one TWAP slice; called by the TWAP engine"""
+    if order.user_id not in user_wallets:
+        return {"success": False, "error": "no private key set"}
+    pool = await pool_resolver.resolve(order.mint)
+    result = await traders.get(order.user_id).execute_trade(
+        action="buy",
+        mint_address=order.mint,
+        amount=round(sol, 9),
+        denominated_in_sol=True,
+        # Room for other traders between pricing the slice and landing it
+        slippage=max(1, math.ceil(order.max_slippage * 200)),
+        pool=pool,
+        fee_tier=FEE_TIER,
+        idempotency_key=f"twap:{order.key}:{int(order.started_at)}:{order.children}",
+        # A slice is stale once the next one is due
+        deadline=time.monotonic() + order.interval
+    )
+    if result["success"] and not result.get("duplicate"):
+        position_book.record_fill(order.user_id, order.chat_id, order.mint, sol)
+    elif not result["success"]:
+        pool_resolver.invalidate(order.mint)
+    return result
+
+def twap_summary(order: ParentOrder) -> str:
+    progress = order.progress()
+    text = (
+        f"{order.mint}: {progress['filled']:g}/{order.total:g} SOL in {order.children} slice(s), "
+        f"{order.failures} failed"
+    )
+    if progress["slippage"] is not None:
+        text += f", avg {progress['slippage'] * 100:+.2f}% vs arrival"
+    return text
+
+async def twap_done(order: ParentOrder) -> None:
+    icon = "✅" if order.status == "done" else "⚠️"
+    note = "\nThe token left its pump.fun curve, buy the rest with /buy" if order.status == "migrated" else ""
+    outbox.send(order.chat_id, f"{icon} TWAP {order.status}\n{twap_summary(order)}{note}")
+
+twap_engine = TwapEngine(run_twap_child, on_save=store.save_twap_order, on_done=twap_done)
+Gauge("twap_active_orders", "TWAP parent orders still executing", lambda: len(twap_engine))
+
+async def restore_twap_orders() -> None:
+    restored = skipped = 0
+    for batch in store.iter_twap_orders():
+        for order in batch:
+            # Saved while the key could still be decrypted
+            if order.user_id not in user_wallets:
+                skipped += 1
+            elif twap_engine.get(order.key) is None:
+                twap_engine.add(order)
+                restored += 1
+        await asyncio.sleep(0)
+    logger.info(f"Restored {restored} TWAP orders, skipped {skipped} without a private key")
+
+async def restore_schedules() -> None:
+    """Stream persisted schedules into the scheduler without holding up startup"""
+    restored = skipped = 0
+    now = time.time()
+    for batch in store.iter_schedules():
+        for schedule in batch:
+            if schedule.key in scheduler:
+                continue
+            if schedule.user_id not in user_wallets:
+                skipped += 1
+                continue
+            schedule.catch_up(now)
+            scheduler.add(schedule)
+            restored += 1
+        await asyncio.sleep(0)
+    logger.info(f"Restored {restored} schedules, skipped {skipped} without a private key")
 
 async def on_startup(bot: Bot) -> None:
     webhook_info = await bot.get_webhook_info()
@@ -74,94 +325,6 @@ async def on_startup(bot: Bot) -> None:
     logger.info(f"Webhook set to {WEBHOOK_URL}")
 
 
-class TradeConfig:
-    def __init__(
-        self,
-        private_key: str,
-        rpc_endpoint: str = "https://api.mainnet-beta.solana.com",
-        api_endpoint: str = "https://pumpportal.fun/api/trade-local"
-    ):
-        self.private_key = private_key
-        self.rpc_endpoint = rpc_endpoint
-        self.api_endpoint = api_endpoint
-        self.keypair = Keypair.from_base58_string(private_key)
-
-class SolanaTrader:
-    def __init__(self, config: TradeConfig):
-        self.config = config
-        
-    async def execute_trade(
-        self,
-        action: str,
-        mint_address: str,
-        amount: int = 0.001,
-        denominated_in_sol: bool = True,
-        slippage: int = 10,
-        priority_fee: float = 0.00001,
-        skip_pre_flight: bool = True,
-        pool: str = "raydium"
-    ) -> Dict[str, Any]:
-        """Execute a trade with the given parameters"""
-        try:
-            trade_payload = {
-                "publicKey": str(self.config.keypair.pubkey()),
-                "action": action,
-                "mint": mint_address,
-                "amount": amount,
-                "denominatedInSol": str(denominated_in_sol).lower(),
-                "slippage": slippage,
-                "priorityFee": priority_fee,
-                "pool": pool
-            }
-            
-            logger.info(f"Sending trade request: {trade_payload}")
-            
-            response = requests.post(
-                url=self.config.api_endpoint,
-                json=trade_payload,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            
-            if not response.content:
-                raise Exception("Empty response from API")
-            
-            tx = VersionedTransaction(
-                VersionedTransaction.from_bytes(response.content).message,
-                [self.config.keypair]
-            )
-            
-            commitment = CommitmentLevel.Confirmed
-            config = RpcSendTransactionConfig(preflight_commitment=commitment)
-            tx_payload = SendVersionedTransaction(tx, config)
-            
-            rpc_response = requests.post(
-                url=self.config.rpc_endpoint,
-                headers={"Content-Type": "application/json"},
-                data=tx_payload.to_json()
-            )
-            rpc_response.raise_for_status()
-            
-            response_data = rpc_response.json()
-            if 'result' not in response_data:
-                raise Exception(f"Invalid RPC response: {response_data}")
-                
-            tx_signature = response_data['result']
-            logger.info(f"Transaction sent: https://solscan.io/tx/{tx_signature}")
-            
-            return {
-                "success": True,
-                "signature": tx_signature,
-                "solscan_url": f"https://solscan.io/tx/{tx_signature}"
-            }
-            
-        except Exception as e:
-            logger.error(f"Trade execution failed: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
-
 @dp.message(Command(commands=['start']))
 async def start_command(message: types.Message):
     """Handle start command"""
@@ -172,9 +335,22 @@ async def start_command(message: types.Message):
         "/setkey <private_key> - Set your private key\n"
         "/createtoken - Create a new token on Pump.fun\n"
         "/buy <token_address> <amount> - Buy tokens\n"
+        "/buy <token_address> <amount> all [bundle] - Split a buy across all your wallets\n"
+        "/addwallet <private_key> - Add a wallet for split buys\n"
+        "/wallets - List your wallets\n"
+        "/clearwallets - Remove the wallets added with /addwallet\n"
+        "/portfolio - SOL and token balances of your wallets\n"
+        "/sell <token_address> [percent] - Sell tokens (default 100%)\n"
+        "/positions - Open positions and their exit rules\n"
+        "/exit <token_address> tp=<%> sl=<%> trail=<%> - Set take-profit/stop-loss/trailing stop\n"
+        "/twap <token_address> <total> <duration> [slices] - Buy in slices over time (e.g. 30m); "
+        "spreads a pump.fun buy out, it does not lower its slippage\n"
+        "/twapstatus - Progress of your TWAP orders\n"
+        "/canceltwap <token_address> - Stop a TWAP order\n"
         "/startschedule <token_address> <amount> - Start hourly DCA\n"
         "/stopschedule <token_address> - Stop DCA\n"
-        "/removekey - Remove your private key\n\n"
+        "/removekey - Remove your private key\n"
+        "/cancel - Cancel the current step-by-step flow\n\n"
         "⚠️ Never share your private key with anyone else!"
     )
     await message.reply(welcome_text)
@@ -195,6 +371,8 @@ async def set_private_key(message: types.Message):
         try:
             keypair = Keypair.from_base58_string(private_key)
             user_wallets[user_id] = private_key
+            traders.invalidate(user_id)
+            balance_cache.warm([str(keypair.pubkey())])
             # Delete message containing private key for security
             await message.delete()
             await message.answer("✅ Private key set successfully! You can now use /buy and /startschedule commands.")
@@ -210,6 +388,7 @@ async def remove_private_key(message: types.Message):
     user_id = message.from_user.id
     if user_id in user_wallets:
         del user_wallets[user_id]
+        traders.invalidate(user_id)
         await message.reply("✅ Private key removed successfully")
     else:
         await message.reply("❌ No private key found")
@@ -224,66 +403,374 @@ async def handle_buy(message: types.Message):
             return
             
         parts = message.text.split()
-        if len(parts) != 3:
-            await message.reply("Usage: /buy <token_address> <amount>")
+        options = [part.lower() for part in parts[3:]]
+        if len(parts) < 3 or options not in ([], ["all"], ["all", "bundle"]):
+            await message.reply(
+                "Usage: /buy <token_address> <amount>\n"
+                "or /buy <token_address> <amount> all [bundle] to split it across your wallets"
+            )
             return
             
-        _, token_address, amount = parts
-        amount = float(amount)
-        
-        # Ask user about pool selection
-        pool_msg = await message.reply(
-            "Is this token on Pump.fun? (not graduated yet?)\n"
-            "Reply with 'yes' or 'no'"
+        token_address, amount = parts[1], float(parts[2])
+    except ValueError:
+        await message.reply("Invalid amount format")
+        return
+
+    if options:
+        await handle_fanout_buy(message, token_address, amount, bundle="bundle" in options)
+        return
+
+    try:
+        pool = await pool_resolver.resolve(token_address)
+
+        trader = traders.get(user_id)
+        result = await trader.execute_trade(
+            action="buy",
+            mint_address=token_address,
+            amount=amount,
+            denominated_in_sol=True,
+            pool=pool,
+            fee_tier=FEE_TIER,
+            idempotency_key=message_trade_key(message)
         )
         
-        # Wait for user response
-        @dp.message()
-        async def pool_response(response: types.Message):
-            if response.from_user.id != user_id:
-                return
-                
-            pool = "pump" if response.text.lower() == "yes" else "raydium"
-            
-            # Remove the handler after getting response
-            dp.message.handlers.pop()
-            
-            trader = SolanaTrader(TradeConfig(user_wallets[user_id]))
-            result = await trader.execute_trade(
-                action="buy",
-                mint_address=token_address,
-                amount=amount,
-                denominated_in_sol=True,
-                pool=pool
+        if result.get("duplicate"):
+            await message.reply(f"ℹ️ Same buy was already sent a moment ago.\nTX: {result.get('solscan_url', 'pending')}")
+        elif result["success"]:
+            tracker.track(result["signature"], confirmation_notifier(message.chat.id, "Buy"))
+            position_book.record_fill(user_id, message.chat.id, token_address, amount)
+            success_msg = (
+                f"✅ Buy order executed on {pool.upper()}!\n"
+                f"Amount: {amount} SOL\n"
+                f"Token: {token_address}\n"
+                f"TX: {result['solscan_url']}"
             )
-            
-            if result["success"]:
-                success_msg = (
-                    f"✅ Buy order executed on {pool.upper()}!\n"
-                    f"Amount: {amount} SOL\n"
-                    f"Token: {token_address}\n"
-                    f"TX: {result['solscan_url']}"
-                )
-                await message.reply(success_msg)
+            await message.reply(success_msg)
+        else:
+            pool_resolver.invalidate(token_address)
+            await message.reply(f"❌ Trade failed: {result.get('error', 'Unknown error')}")
+    except Exception as e:
+        await message.reply(f"❌ Error: {str(e)}")
+
+async def handle_fanout_buy(message: types.Message, token_address: str, total: float, bundle: bool):
+    """Split ``total`` SOL evenly across the user's main and fan-out wallets"""
+    user_id = message.from_user.id
+    try:
+        private_keys = [user_wallets[user_id]] + fanout_wallets.get(user_id)
+        if len(private_keys) < 2:
+            await message.reply("❌ Add more wallets with /addwallet to split a buy")
+            return
+        keypairs = await asyncio.to_thread(lambda: [Keypair.from_base58_string(key) for key in private_keys])
+        amount = round(total / len(keypairs), 9)
+        pool = await pool_resolver.resolve(token_address)
+
+        result = await BatchTrader(keypairs).execute_batch(
+            action="buy",
+            mint_address=token_address,
+            amounts=[amount] * len(keypairs),
+            denominated_in_sol=True,
+            pool=pool,
+            fee_tier=FEE_TIER,
+            bundle=bundle,
+            idempotency_key=message_trade_key(message)
+        )
+        if result.get("duplicate"):
+            await message.reply("ℹ️ Same split buy was already sent a moment ago.")
+            return
+
+        lines = []
+        for wallet in result["results"]:
+            short = f"{wallet['wallet'][:4]}…{wallet['wallet'][-4:]}"
+            if wallet["success"]:
+                if not bundle:
+                    tracker.track(wallet["signature"], confirmation_notifier(message.chat.id, f"Buy from {short}"))
+                lines.append(f"✅ {short}: {wallet['solscan_url']}")
             else:
-                await message.reply(f"❌ Trade failed: {result.get('error', 'Unknown error')}")
-        dp.message.register(pool_response)   
+                lines.append(f"❌ {short}: {wallet['error']}")
+        landed = sum(wallet["success"] for wallet in result["results"])
+        if not landed:
+            pool_resolver.invalidate(token_address)
+        via = "Jito bundle" if bundle else "RPC"
+        await message.reply(
+            f"{'✅' if landed else '❌'} Split buy on {pool.upper()} via {via}: "
+            f"{landed}/{len(keypairs)} wallets, {amount} SOL each\n"
+            f"Token: {token_address}\n\n" + "\n".join(lines)
+        )
+    except Exception as e:
+        await message.reply(f"❌ Error: {str(e)}")
+
+@dp.message(Command(commands=['addwallet']))
+async def add_fanout_wallet(message: types.Message):
+    """Add a wallet that split buys also use"""
+    user_id = message.from_user.id
+    parts = message.text.split(maxsplit=1)
+    if len(parts) != 2:
+        await message.reply("Usage: /addwallet <private_key>")
+        return
+    try:
+        keypair = Keypair.from_base58_string(parts[1].strip())
+    except Exception:
+        await message.reply("❌ Invalid private key format")
+        return
+    # Delete message containing private key for security
+    try:
+        await message.delete()
+    except Exception:
+        pass
+
+    private_key = parts[1].strip()
+    if user_wallets.get(user_id) == private_key:
+        await message.answer("ℹ️ That is already your main wallet.")
+    elif len(fanout_wallets.get(user_id)) >= FANOUT_MAX_WALLETS:
+        await message.answer(f"❌ You can add at most {FANOUT_MAX_WALLETS} wallets.")
+    elif fanout_wallets.add(user_id, str(keypair.pubkey()), private_key):
+        balance_cache.warm([str(keypair.pubkey())])
+        count = len(fanout_wallets.get(user_id))
+        await message.answer(f"✅ Wallet {keypair.pubkey()} added ({count} extra wallet(s)).")
+    else:
+        await message.answer("ℹ️ That wallet was already added.")
+
+@dp.message(Command(commands=['wallets']))
+async def list_wallets(message: types.Message):
+    """List the user's main and fan-out wallets"""
+    user_id = message.from_user.id
+    main_key = user_wallets.get(user_id)
+    extra_keys = fanout_wallets.get(user_id)
+    if main_key is None and not extra_keys:
+        await message.reply("❌ No wallets set. Use /setkey or /addwallet")
+        return
+    public_keys = await asyncio.to_thread(
+        lambda: [str(Keypair.from_base58_string(key).pubkey()) for key in extra_keys]
+    )
+    lines = [f"{index}: {key}" for index, key in enumerate(public_keys, start=1)]
+    if main_key is not None:
+        lines.insert(0, f"Main: {traders.get(user_id).config.public_key}")
+    await message.reply("👛 Your wallets:\n" + "\n".join(lines))
+
+@dp.message(Command(commands=['portfolio']))
+async def show_portfolio(message: types.Message):
+    """Show SOL and token balances of the user's wallets, valued on the bonding curve"""
+    user_id = message.from_user.id
+    main_key = user_wallets.get(user_id)
+    extra_keys = fanout_wallets.get(user_id)
+    if main_key is None and not extra_keys:
+        await message.reply("❌ No wallets set. Use /setkey or /addwallet")
+        return
+    labels = await asyncio.to_thread(
+        lambda: {str(Keypair.from_base58_string(key).pubkey()): f"Wallet {index}"
+                 for index, key in enumerate(extra_keys, start=1)}
+    )
+    if main_key is not None:
+        labels = {traders.get(user_id).config.public_key: "Main", **labels}
+
+    try:
+        wallets = await balance_cache.balances(list(labels))
+        prices = await balance_cache.prices([mint for wallet in wallets for mint in wallet.tokens])
+    except Exception as e:
+        logger.error(f"Portfolio fetch failed for {user_id}: {e}")
+        await message.reply(f"❌ Could not fetch balances: {e}")
+        return
+
+    total = 0.0
+    lines = []
+    for wallet in wallets:
+        total += wallet.sol
+        lines.append(f"{labels[wallet.owner]} {wallet.owner}: {wallet.sol:.4f} SOL")
+        for mint, amount in sorted(wallet.tokens.items()):
+            line = f"  {mint}: {amount:,.2f}"
+            if not math.isnan(prices[mint]):
+                value = amount * prices[mint]
+                total += value
+                line += f" ≈ {value:.4f} SOL"
+            if mint in wallet.pending:
+                line += " (updating)"
+            lines.append(line)
+    lines.append(f"Total ≈ {total:.4f} SOL")
+    await message.reply("💼 Portfolio:\n" + "\n".join(lines))
+
+@dp.message(Command(commands=['clearwallets']))
+async def clear_fanout_wallets(message: types.Message):
+    """Remove every wallet added with /addwallet"""
+    removed = fanout_wallets.clear(message.from_user.id)
+    await message.reply(f"✅ Removed {removed} extra wallet(s)" if removed else "❌ No extra wallets found")
+
+@dp.message(Command(commands=['sell']))
+async def handle_sell(message: types.Message):
+    """Sell a percentage of the user's tokens"""
+    user_id = message.from_user.id
+    if user_id not in user_wallets:
+        await message.reply("❌ Please set your private key first using /setkey")
+        return
+    parts = message.text.split()
+    try:
+        if len(parts) not in (2, 3):
+            raise ValueError
+        token_address = parts[1]
+        percent = float(parts[2].rstrip('%')) if len(parts) == 3 else 100.0
+        if not 0 < percent <= 100:
+            raise ValueError
     except ValueError:
-        await message.reply("Invalid amount format")
+        await message.reply("Usage: /sell <token_address> [percent]")
+        return
+
+    try:
+        result = await sell_position(
+            user_id, message.chat.id, token_address, percent, "Sell",
+            idempotency_key=message_trade_key(message)
+        )
+        if result.get("duplicate"):
+            await message.reply("ℹ️ Same sell was already sent a moment ago.")
+        elif result["success"]:
+            position_book.record_sale(user_id, token_address, percent)
+    except Exception as e:
+        await message.reply(f"❌ Error: {str(e)}")
+
+@dp.message(Command(commands=['positions']))
+async def list_positions(message: types.Message):
+    """Show open positions with their price change and exit rules"""
+    positions = position_book.for_user(message.from_user.id)
+    if not positions:
+        await message.reply("No open positions")
+        return
+
+    def rule(value: Optional[float]) -> str:
+        return f"{value * 100:g}%" if value is not None else "off"
+
+    lines = []
+    for position in positions:
+        change = ""
+        if position.entry_price and position.last_price:
+            change = f" {(position.last_price / position.entry_price - 1) * 100:+.1f}%"
+        lines.append(
+            f"{position.mint}{change}\n"
+            f"  cost {position.cost:g} SOL, tp {rule(position.take_profit)}, "
+            f"sl {rule(position.stop_loss)}, trail {rule(position.trailing_stop)}"
+        )
+    await message.reply("📊 Open positions:\n" + "\n".join(lines))
+
+@dp.message(Command(commands=['exit']))
+async def set_exit_rules(message: types.Message):
+    """Set take-profit, stop-loss and trailing-stop percentages for a position"""
+    parts = message.text.split()
+    rules: Dict[str, float] = {}
+    try:
+        if len(parts) < 3:
+            raise ValueError
+        for option in parts[2:]:
+            name, value = option.lower().split("=", 1)
+            if name not in ("tp", "sl", "trail"):
+                raise ValueError
+            rules[name] = float(value.rstrip('%')) / 100
+            if rules[name] < 0 or (name != "tp" and rules[name] >= 1):
+                raise ValueError
+    except ValueError:
+        await message.reply(
+            "Usage: /exit <token_address> tp=<%> sl=<%> trail=<%>\n"
+            "Any subset works; 0 turns a rule off."
+        )
+        return
+
+    position = position_book.set_rules(
+        message.from_user.id, parts[1],
+        take_profit=rules.get("tp"), stop_loss=rules.get("sl"), trailing_stop=rules.get("trail")
+    )
+    if position is None:
+        await message.reply("❌ No open position in that token. Buy it first.")
+        return
+    await message.reply(f"✅ Exit rules updated for {position.mint}")
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+def parse_duration(text: str) -> float:
+    """Seconds in ``90``, ``90s``, ``15m`` or ``2h``"""
+    unit = DURATION_UNITS.get(text[-1:].lower())
+    seconds = float(text[:-1]) * unit if unit else float(text)
+    if not TWAP_MIN_DURATION <= seconds <= TWAP_MAX_DURATION:
+        raise ValueError(f"Invalid duration {text!r}")
+    return seconds
+
+@dp.message(Command(commands=['twap']))
+async def start_twap(message: types.Message):
+    """Split a large buy into slices over time"""
+    user_id = message.from_user.id
+    if user_id not in user_wallets:
+        await message.reply("❌ Please set your private key first using /setkey")
+        return
+    parts = message.text.split()
+    try:
+        if len(parts) not in (4, 5):
+            raise ValueError
+        token_address, total, duration = parts[1], float(parts[2]), parse_duration(parts[3])
+        slices = int(parts[4]) if len(parts) == 5 else TWAP_DEFAULT_SLICES
+        if total <= 0 or slices < 1:
+            raise ValueError
+    except ValueError:
+        await message.reply(
+            "Usage: /twap <token_address> <total_sol> <duration> [slices]\n"
+            f"Duration like 90s, 15m or 2h, between {TWAP_MIN_DURATION:g}s and {TWAP_MAX_DURATION / 3600:g}h"
+        )
+        return
+
+    # Slices are priced off the bonding curve, so only pump.fun mints can run
+    try:
+        pool = await pool_resolver.resolve(token_address)
     except Exception as e:
         await message.reply(f"❌ Error: {str(e)}")
+        return
+    if pool != "pump":
+        await message.reply(
+            "❌ TWAP only works on tokens still on their pump.fun bonding curve. "
+            "This one has graduated or is not a pump.fun token, use /buy instead"
+        )
+        return
+
+    order = ParentOrder(user_id, message.chat.id, token_address, total, duration, slices)
+    replaced = twap_engine.get(order.key) is not None
+    twap_engine.add(order)
+    await message.reply(
+        f"✅ TWAP {'restarted' if replaced else 'started'}: {total:g} SOL of {token_address}\n"
+        f"{order.slices} slices over {parts[3]}, each slice within {TWAP_MAX_SLIPPAGE:g}% of the price at the time\n"
+        "Each slice moves the curve for the next, so the average price ends up no better than one buy; "
+        "TWAP spreads the buy out and lets you cancel it, it does not reduce slippage"
+    )
+
+@dp.message(Command(commands=['twapstatus']))
+async def twap_status(message: types.Message):
+    """Show the user's running TWAP orders"""
+    orders = [order for order in twap_engine.orders() if order.user_id == message.from_user.id]
+    if not orders:
+        await message.reply("No running TWAP orders")
+        return
+    await message.reply("⏱ Running TWAP orders:\n" + "\n".join(twap_summary(order) for order in orders))
+
+@dp.message(Command(commands=['canceltwap']))
+async def cancel_twap(message: types.Message):
+    """Stop a running TWAP order"""
+    parts = message.text.split()
+    if len(parts) != 2:
+        await message.reply("Usage: /canceltwap <token_address>")
+        return
+    order = twap_engine.cancel(f"{message.from_user.id}_{parts[1]}")
+    if order is None:
+        await message.reply("❌ No running TWAP order for that token")
+    else:
+        await message.reply(f"✅ TWAP cancelled\n{twap_summary(order)}")
 
 @dp.message(Command(commands=['createwallet']))
 async def create_wallet_command(message: types.Message):
     """Handle wallet creation command"""
     try:
         # Create wallet request
-        response = requests.post(
+        wallet_data = await api_guard.call(
             f"{API_URL}/create-wallet",
-            headers={"Content-Type": "application/json"}
+            lambda timeout: transport.post_json(
+                f"{API_URL}/create-wallet",
+                headers={"Content-Type": "application/json"},
+                timeout=timeout
+            ),
+            # A retry after a lost response would mint a second wallet
+            idempotent=False
         )
-        response.raise_for_status()
-        wallet_data = response.json()
         
         # Format wallet info message
         wallet_info = (
@@ -325,67 +812,31 @@ async def start_schedule(message: types.Message):
             
         _, token_address, amount = parts
         amount = float(amount)
+    except ValueError:
+        await message.reply("Invalid amount format")
+        return
 
-        # Ask user about pool selection
-        pool_msg = await message.reply(
-            "Is this token on Pump.fun? (not graduated yet?)\n"
-            "Reply with 'yes' or 'no'"
+    try:
+        pool = await pool_resolver.resolve(token_address)
+
+        schedule = Schedule(
+            user_id=user_id,
+            chat_id=message.chat.id,
+            token_address=token_address,
+            amount=amount,
+            pool=pool
         )
-        
-        # Wait for user response
-        @dp.message()
-        async def pool_response(response: types.Message):
-            if response.from_user.id != user_id:
-                return
-                
-            pool = "pump" if response.text.lower() == "yes" else "raydium"
-            
-            # Remove the handler after getting response
-            dp.message.handlers.pop()
-
-            schedule_key = f"{user_id}_{token_address}"
-            if schedule_key in active_schedules:
-                active_schedules[schedule_key].cancel()
-
-            async def scheduled_task():
-                while True:
-                    try:
-                        trader = SolanaTrader(TradeConfig(user_wallets[user_id]))
-                        result = await trader.execute_trade(
-                            action="buy",
-                            mint_address=token_address,
-                            amount=amount,
-                            denominated_in_sol=True,
-                            pool=pool
-                        )
-                        
-                        if result["success"]:
-                            success_msg = (
-                                f"✅ Scheduled buy executed on {pool.upper()}!\n"
-                                f"Amount: {amount} SOL\n"
-                                f"Token: {token_address}\n"
-                                f"TX: {result['solscan_url']}"
-                            )
-                            await bot.send_message(chat_id=message.chat.id, text=success_msg)
-                        
-                        await asyncio.sleep(3600)  # Sleep for 1 hour
-                    except Exception as e:
-                        logger.error(f"Schedule error: {e}")
-                        await asyncio.sleep(60)  # Sleep for 1 minute on error
-
-            task = asyncio.create_task(scheduled_task())
-            active_schedules[schedule_key] = task
+        scheduler.add(schedule)
+        store.save_schedule(schedule)
 
-            await message.reply(
-                f"✅ Scheduled hourly buys started on {pool.upper()}\n"
-                f"Amount: {amount} SOL\n"
-                f"Token: {token_address}"
-            )
-        dp.message.register(pool_response)
-    except ValueError:
-        await message.reply("Invalid amount format")
+        await message.reply(
+            f"✅ Scheduled hourly buys started on {pool.upper()}\n"
+            f"Amount: {amount} SOL\n"
+            f"Token: {token_address}"
+        )
     except Exception as e:
         await message.reply(f"❌ Error: {str(e)}")
+
 @dp.message(Command(commands=['stopschedule']))
 async def stop_schedule(message: types.Message):
     """Stop scheduled buying"""
@@ -399,9 +850,8 @@ async def stop_schedule(message: types.Message):
         _, token_address = parts
         schedule_key = f"{user_id}_{token_address}"
 
-        if schedule_key in active_schedules:
-            active_schedules[schedule_key].cancel()
-            del active_schedules[schedule_key]
+        removed = scheduler.remove(schedule_key)
+        if store.delete_schedule(schedule_key) or removed:
             await message.reply(f"✅ Scheduled buys stopped for {token_address}")
         else:
             await message.reply(f"❌ No active schedule found for {token_address}")
@@ -410,7 +860,7 @@ async def stop_schedule(message: types.Message):
         await message.reply(f"❌ Error: {str(e)}")
 
 @dp.message(Command(commands=['createtoken']))
-async def start_token_creation(message: types.Message):
+async def start_token_creation(message: types.Message, state: FSMContext):
     """Start token creation process"""
     try:
         user_id = message.from_user.id
@@ -419,120 +869,151 @@ async def start_token_creation(message: types.Message):
             return
             
         # Start collecting token information
-        await message.reply(
-            "Let's create your token! Please provide the following information:\n"
-            "1. Token Name (e.g., 'My Cool Token')\n"
-            "Send your response now:"
-        )
+        first_step = TOKEN_CREATION_STEPS[0]
+        await state.set_state(first_step.state)
+        await state.set_data({})
+        await message.reply(first_step.prompt)
         
-        # Store user state
-        user_data = {
-            "step": 1,
-            "token_name": "",
-            "token_symbol": "",
-            "description": "",
-            "twitter_url": "",
-            "telegram_url": "",
-            "website_url": "",
-            "image_url": ""
-        }
+    except Exception as e:
+        await message.reply(f"❌ Error: {str(e)}")
+
+@dp.message(Command(commands=['cancel']))
+async def cancel_conversation(message: types.Message, state: FSMContext):
+    """Abandon the current multi-step flow"""
+    if await state.get_state() is None:
+        await message.reply("❌ Nothing to cancel")
+        return
+    await state.clear()
+    await message.reply("✅ Cancelled")
+
+# /createtoken wizard steps. These are registered after every command handler
+# so a command typed mid-flow still reaches its own handler.
+
+@dp.message(StateFilter(*(step.state for step in TOKEN_CREATION_STEPS[:-1])), F.text)
+async def collect_token_info(response: types.Message, state: FSMContext):
+    """Store one text answer of the /createtoken wizard and prompt for the next"""
+    try:
+        index = TOKEN_CREATION_INDEX[await state.get_state()]
+        step = TOKEN_CREATION_STEPS[index]
+        value = response.text
+        if step.optional and value.lower() == "none":
+            value = ""
+        await state.update_data({step.field: value})
+
+        next_step = TOKEN_CREATION_STEPS[index + 1]
+        await state.set_state(next_step.state)
+        await response.reply(next_step.prompt)
+    except Exception as e:
+        await response.reply(f"❌ Error: {str(e)}")
+
+@dp.message(TokenCreation.image, F.photo)
+async def collect_token_image(response: types.Message, state: FSMContext):
+    """Final /createtoken step: download the image and launch the token"""
+    user_data = await state.get_data()
+    await state.clear()
+    user_id = response.from_user.id
+
+    try:
+        # Largest version Telegram lets us download, streamed into memory
+        photo = pick_photo_size(response.photo)
+        if photo is None:
+            await response.reply("❌ That image is too large, please send a smaller one.")
+            return
+        image = (await bot.download(photo, destination=io.BytesIO())).getvalue()
+
+        # Create the token
+        wallet_keys = [user_wallets[user_id]]  # Using the user's wallet
+        initial_buys = [1785356]  # Default initial buy amount
         
-        # Create handler for collecting token information
-        @dp.message()
-        async def collect_token_info(response: types.Message):
-            if response.from_user.id != user_id:
-                return
-                
-            nonlocal user_data
-            
-            try:
-                if user_data["step"] == 1:
-                    user_data["token_name"] = response.text
-                    user_data["step"] = 2
-                    await message.reply("2. Token Symbol (e.g., 'COOL'):")
-                    
-                elif user_data["step"] == 2:
-                    user_data["token_symbol"] = response.text
-                    user_data["step"] = 3
-                    await message.reply("3. Token Description:")
-                    
-                elif user_data["step"] == 3:
-                    user_data["description"] = response.text
-                    user_data["step"] = 4
-                    await message.reply("4. Twitter URL (or 'none'):")
-                    
-                elif user_data["step"] == 4:
-                    user_data["twitter_url"] = "" if response.text.lower() == "none" else response.text
-                    user_data["step"] = 5
-                    await message.reply("5. Telegram URL (or 'none'):")
-                    
-                elif user_data["step"] == 5:
-                    user_data["telegram_url"] = "" if response.text.lower() == "none" else response.text
-                    user_data["step"] = 6
-                    await message.reply("6. Website URL (or 'none'):")
-                    
-                elif user_data["step"] == 6:
-                    user_data["website_url"] = "" if response.text.lower() == "none" else response.text
-                    user_data["step"] = 7
-                    await message.reply("7. Please send your token image as a photo:")
-                    
-                elif user_data["step"] == 7 and response.photo:
-                    # Get the largest photo version
-                    photo = response.photo[-1]
-                    file = await bot.get_file(photo.file_id)
-                    file_path = file.file_path
-                    
-                    # Download the image
-                    temp_image_path = f"temp_{user_id}.png"
-                    await bot.download_file(file_path, destination=temp_image_path)
-                    
-                    # Create the token
-                    try:
-                        wallet_keys = [user_wallets[user_id]]  # Using the user's wallet
-                        initial_buys = [1785356]  # Default initial buy amount
-                        
-                        await message.reply("Creating your token... Please wait.")
-                        
-                        result = await create_token_bundle(
-                            token_name=user_data["token_name"],
-                            token_symbol=user_data["token_symbol"],
-                            description=user_data["description"],
-                            twitter_url=user_data["twitter_url"],
-                            telegram_url=user_data["telegram_url"],
-                            website_url=user_data["website_url"],
-                            image_path=temp_image_path,
-                            wallet_keys=wallet_keys,  # Pass single wallet key
-                            initial_buys=initial_buys # Set reasonable initial buy amount in SOL
-                        )
-
-                        if result.get("success"):
-                            await message.reply(
-                                "✅ Token created successfully!\n"
-                                f"Name: {user_data['token_name']}\n"
-                                f"Symbol: {user_data['token_symbol']}\n"
-                                f"Token Address: {result.get('token_address')}\n"
-                                f"Transaction: {result.get('transaction_url')}"
-                            )
-                        else:
-                            await message.reply(f"❌ Error creating token: {result.get('error', 'Unknown error')}")
-                                                
-                    except Exception as e:
-                        await message.reply(f"❌ Error creating token: {str(e)}")
-                    
-                    # Remove the handler
-                    dp.message.handlers.pop()
-                    
-            except Exception as e:
-                await message.reply(f"❌ Error: {str(e)}")
-                
-        dp.message.register(collect_token_info)
+        await response.reply("Creating your token... Please wait.")
         
+        result = await create_token_bundle(
+            token_name=user_data["token_name"],
+            token_symbol=user_data["token_symbol"],
+            description=user_data["description"],
+            twitter_url=user_data["twitter_url"],
+            telegram_url=user_data["telegram_url"],
+            website_url=user_data["website_url"],
+            image=image,
+            wallet_keys=wallet_keys,  # Pass single wallet key
+            initial_buys=initial_buys # Set reasonable initial buy amount in SOL
+        )
+
+        if result.get("success"):
+            tracker.track(result["signatures"][0], confirmation_notifier(response.chat.id, "Token launch"))
+            # The launch buy is sized in tokens; the first observed price becomes the entry
+            position_book.record_fill(user_id, response.chat.id, result["token_address"])
+            await response.reply(
+                "✅ Token created successfully!\n"
+                f"Name: {user_data['token_name']}\n"
+                f"Symbol: {user_data['token_symbol']}\n"
+                f"Token Address: {result.get('token_address')}\n"
+                f"Transaction: {result.get('transaction_url')}"
+            )
+        else:
+            await response.reply(f"❌ Error creating token: {result.get('error', 'Unknown error')}")
+                                
     except Exception as e:
-        await message.reply(f"❌ Error: {str(e)}")
+        await response.reply(f"❌ Error creating token: {str(e)}")
 
 async def health_check(request):
     return web.Response(text="Bot is running!")
 
+async def stats_handler(request):
+    """Cached runtime stats for monitoring"""
+    return web.json_response({
+        "priority_fees": fee_estimator.stats(),
+        "rpc_endpoints": rpc_pool.stats(),
+        "pending_confirmations": tracker.pending,
+        "active_schedules": len(scheduler),
+        "positions": position_book.stats(),
+        "balances": balance_cache.stats(),
+        "api": api_guard.stats(),
+        "twap": twap_engine.stats(),
+        "update_queue": update_queue.stats(),
+        "outbox": outbox.stats(),
+        "duplicate_updates": seen_updates.duplicates,
+        "duplicate_trades": trade_guard.duplicates,
+        "local_builder": pump_builder.stats() if LOCAL_TX_BUILDER else None,
+    })
+
+def update_key(update: types.Update) -> Any:
+    """Ordering key for an update: the sender, falling back to the update itself"""
+    try:
+        user = getattr(update.event, "from_user", None)
+    except Exception:
+        user = None
+    return user.id if user is not None else update.update_id
+
+async def metrics_handler(request):
+    """Prometheus text exposition of the process-wide metrics registry"""
+    return web.Response(text=default_registry.render(), content_type="text/plain", charset="utf-8")
+
+async def process_update(update: types.Update):
+    await dp.feed_update(bot, update)
+
+update_queue = UpdateQueue(process_update)
+Gauge("update_queue_depth", "Webhook updates waiting for a worker", lambda: update_queue.depth)
+
+# Captures scrubbed updates for replay when UPDATE_RECORD_PATH is set
+recorder = open_recorder()
+
+async def webhook_handler(request):
+    """Acknowledge the webhook at once and process the update in the background"""
+    payload = await request.json()
+    if recorder is not None:
+        recorder.record(payload)
+    update = types.Update.model_validate(payload, context={"bot": bot})
+    if not seen_updates.add(update.update_id):
+        # Redelivery of an update that is already queued or handled
+        return web.Response()
+    if not update_queue.submit(update_key(update), update):
+        seen_updates.discard(update.update_id)
+        # Telegram redelivers updates answered with an error, so refusing is safe
+        logger.warning(f"Update queue full, shedding update {update.update_id}")
+        return web.Response(status=503, text="Overloaded")
+    return web.Response()
+
 async def webhook_debug(request):
     """Handler for GET requests to webhook endpoint - for debugging only"""
     return web.Response(text="Telegram webhook endpoint is working. Please use POST method for actual webhook requests.")
@@ -544,11 +1025,22 @@ async def main():
             types.BotCommand(command="start", description="Start the bot"),
             types.BotCommand(command="setkey", description="Set your private key"),
             types.BotCommand(command="createwallet", description="Create a new trading wallet"),
-            types.BotCommand(command="buy", description="Buy tokens: /buy <address> <amount>"),
+            types.BotCommand(command="buy", description="Buy tokens: /buy <address> <amount> [all [bundle]]"),
+            types.BotCommand(command="addwallet", description="Add a wallet for split buys"),
+            types.BotCommand(command="wallets", description="List your wallets"),
+            types.BotCommand(command="clearwallets", description="Remove wallets added with /addwallet"),
+            types.BotCommand(command="sell", description="Sell tokens: /sell <address> [percent]"),
+            types.BotCommand(command="portfolio", description="SOL and token balances of your wallets"),
+            types.BotCommand(command="positions", description="Open positions and exit rules"),
+            types.BotCommand(command="exit", description="Exit rules: /exit <address> tp=50 sl=20 trail=15"),
+            types.BotCommand(command="twap", description="Sliced buy: /twap <address> <total> <duration> [slices]"),
+            types.BotCommand(command="twapstatus", description="Progress of your TWAP orders"),
+            types.BotCommand(command="canceltwap", description="Stop a TWAP order: /canceltwap <address>"),
             types.BotCommand(command="startschedule", description="Start hourly buys: /startschedule <address> <amount>"),
             types.BotCommand(command="stopschedule", description="Stop hourly buys: /stopschedule <address>"),
             types.BotCommand(command="removekey", description="Remove your private key"),
             types.BotCommand(command="createtoken", description="Create a new token: /createtoken"),
+            types.BotCommand(command="cancel", description="Cancel the current step-by-step flow"),
             types.BotCommand(command="webhookinfo", description="Get webhook status information"),
         ])
 
@@ -557,19 +1049,33 @@ async def main():
 
         # Setup routes
         app.router.add_get("/health", lambda r: web.Response(text="OK"))
-        
-        # Create webhook handler
-        webhook_handler = SimpleRequestHandler(
-            dispatcher=dp,
-            bot=bot,
-        )
+        app.router.add_get("/stats", stats_handler)
+        app.router.add_get("/metrics", metrics_handler)
         
         # Register webhook handler
-        webhook_handler.register(app, path=WEBHOOK_PATH)
+        app.router.add_post(WEBHOOK_PATH, webhook_handler)
         
         # Setup application
         setup_application(app, dp, bot=bot)
         
+        update_queue.start()
+        outbox.start()
+
+        # Start the DCA scheduler and restore persisted schedules in the background
+        scheduler.start()
+        asyncio.create_task(restore_schedules())
+        asyncio.create_task(restore_positions())
+        position_book.start()
+        twap_engine.start()
+        asyncio.create_task(restore_twap_orders())
+        rpc_pool.start()
+        tracker.start()
+        fee_estimator.start()
+        pool_resolver.add_listener(balance_cache.observe_curve)
+        if LOCAL_TX_BUILDER:
+            pool_resolver.add_listener(pump_builder.observe_curve)
+            pump_builder.start()
+
         # Set webhook
         await bot.delete_webhook()  # Clear any existing webhook
         await bot.set_webhook(
@@ -598,6 +1104,20 @@ async def main():
     except Exception as e:
         logger.error(f"Main loop error: {str(e)}")
         raise
+    finally:
+        await update_queue.stop()
+        await outbox.stop()
+        await scheduler.stop()
+        await position_book.stop()
+        await twap_engine.stop()
+        await fee_estimator.stop()
+        await pump_builder.stop()
+        await tracker.stop()
+        await rpc_pool.stop()
+        await transport.close()
+        if recorder is not None:
+            recorder.close()
+        store.close()
     
 
 if __name__ == '__main__':
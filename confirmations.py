@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+
+logger = logging.getLogger(__name__)
+
+CONFIRM_POLL_INTERVAL = float(os.getenv('CONFIRM_POLL_INTERVAL', 2))
+# Give up on a signature that has not landed after this many seconds
+CONFIRM_TIMEOUT = float(os.getenv('CONFIRM_TIMEOUT', 90))
+# "confirmed" or "finalized"
+CONFIRM_COMMITMENT = os.getenv('CONFIRM_COMMITMENT', 'confirmed')
+# getSignatureStatuses accepts at most 256 signatures per call
+MAX_SIGNATURES_PER_REQUEST = 256
+
+_COMMITMENT_RANK = {"processed": 0, "confirmed": 1, "finalized": 2}
+
+OnFinal = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class _Pending:
+    __slots__ = ("future", "callbacks", "deadline")
+
+    def __init__(self, future: asyncio.Future, deadline: float):
+        self.future = future
+        self.callbacks: List[OnFinal] = []
+        self.deadline = deadline
+
+
+class ConfirmationTracker:
+    """Resolves sent transaction signatures with batched status polling.
+
+    One poller task serves every pending signature: each tick it splits the
+    pending set into chunks of 256 and issues one ``getSignatureStatuses``
+    call per chunk. ``track`` returns a future and optionally schedules a
+    callback; both receive ``{"signature", "status", "error"}`` where status
+    is ``confirmed``, ``failed`` or ``expired``.
+    """
+
+    def __init__(
+        self,
+        rpc_pool: Optional[RpcPool] = None,
+        poll_interval: float = CONFIRM_POLL_INTERVAL,
+        timeout: float = CONFIRM_TIMEOUT,
+        commitment: str = CONFIRM_COMMITMENT
+    ):
+        self.rpc_pool = rpc_pool or default_rpc_pool
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.target_rank = _COMMITMENT_RANK[commitment]
+        self._pending: Dict[str, _Pending] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._callback_tasks = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def track(self, signature: str, on_final: Optional[OnFinal] = None) -> asyncio.Future:
+        """Start watching ``signature``; tracking it twice shares one entry"""
+        entry = self._pending.get(signature)
+        if entry is None:
+            future = asyncio.get_running_loop().create_future()
+            entry = self._pending[signature] = _Pending(future, time.monotonic() + self.timeout)
+            if self._wakeup is not None:
+                self._wakeup.set()
+        if on_final is not None:
+            entry.callbacks.append(on_final)
+        return entry.future
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _resolve(self, signature: str, status: str, error: Any = None) -> None:
+        entry = self._pending.pop(signature, None)
+        if entry is None:
+            return
+        result = {"signature": signature, "status": status, "error": error}
+        if not entry.future.done():
+            entry.future.set_result(result)
+        for callback in entry.callbacks:
+            task = asyncio.ensure_future(self._run_callback(callback, result))
+            self._callback_tasks.add(task)
+            task.add_done_callback(self._callback_tasks.discard)
+
+    async def _run_callback(self, callback: OnFinal, result: Dict[str, Any]) -> None:
+        try:
+            await callback(result)
+        except Exception as e:
+            logger.error(f"Confirmation callback failed for {result['signature']}: {e}")
+
+    async def _fetch_statuses(self, signatures: List[str]) -> None:
+        payload = json.dumps({
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getSignatureStatuses",
+            "params": [signatures, {"searchTransactionHistory": False}]
+        })
+        try:
+            response = await self.rpc_pool.call(payload)
+            statuses = response["result"]["value"]
+        except Exception as e:
+            logger.warning(f"getSignatureStatuses failed for {len(signatures)} signatures: {e}")
+            return
+
+        for signature, status in zip(signatures, statuses):
+            if status is None:
+                continue
+            if status.get("err") is not None:
+                self._resolve(signature, "failed", status["err"])
+            elif _COMMITMENT_RANK.get(status.get("confirmationStatus"), -1) >= self.target_rank:
+                self._resolve(signature, "confirmed")
+
+    async def poll(self) -> None:
+        """Run one polling round over every pending signature"""
+        now = time.monotonic()
+        for signature in [s for s, entry in self._pending.items() if entry.deadline <= now]:
+            self._resolve(signature, "expired")
+
+        signatures = list(self._pending)
+        await asyncio.gather(*(
+            self._fetch_statuses(signatures[i:i + MAX_SIGNATURES_PER_REQUEST])
+            for i in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST)
+        ))
+
+    async def _poll_loop(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await asyncio.sleep(self.poll_interval)
+            await self.poll()
+
+
+# Process-wide tracker for trades, schedules and launch bundles
+tracker = ConfirmationTracker()
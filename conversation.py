@@ -0,0 +1,123 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+# Abandoned conversations are dropped after this many seconds of inactivity
+CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', 900))
+
+
+class _Record:
+    __slots__ = ("state", "data", "expires_at")
+
+    def __init__(self):
+        self.state: Optional[str] = None
+        self.data: Dict[str, Any] = {}
+        self.expires_at = 0.0
+
+
+class TTLMemoryStorage(BaseStorage):
+    """In-memory FSM storage keyed by (chat, user) with idle expiry.
+
+    Records are kept in touch order, so expired conversations are always at
+    the front and get swept in amortised O(1) on every write. Reads of an
+    expired record behave as if the user had no state.
+    """
+
+    def __init__(self, ttl: float = CONVERSATION_TTL):
+        self.ttl = ttl
+        self._records: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+
+    @property
+    def active_conversations(self) -> int:
+        return len(self._records)
+
+    def _get(self, key: StorageKey) -> Optional[_Record]:
+        record = self._records.get(key)
+        if record is not None and record.expires_at <= time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+    def _touch(self, key: StorageKey) -> _Record:
+        now = time.monotonic()
+        self._sweep(now)
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = _Record()
+        else:
+            self._records.move_to_end(key)
+        record.expires_at = now + self.ttl
+        return record
+
+    def _sweep(self, now: float) -> None:
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if record.expires_at > now:
+                break
+            del self._records[key]
+
+    def _drop_if_empty(self, key: StorageKey, record: _Record) -> None:
+        if record.state is None and not record.data:
+            del self._records[key]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._touch(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._drop_if_empty(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = self._touch(key)
+        record.data = dict(data)
+        self._drop_if_empty(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return dict(record.data) if record else {}
+
+    async def close(self) -> None:
+        self._records.clear()
+
+
+class TokenCreation(StatesGroup):
+    token_name = State()
+    token_symbol = State()
+    description = State()
+    twitter_url = State()
+    telegram_url = State()
+    website_url = State()
+    image = State()
+
+
+class WizardStep(NamedTuple):
+    state: State
+    field: str
+    prompt: str
+    optional: bool = False
+
+
+# /createtoken wizard, in order. Each step stores the reply under ``field``
+# and then prompts for the next one.
+TOKEN_CREATION_STEPS: List[WizardStep] = [
+    WizardStep(
+        TokenCreation.token_name, "token_name",
+        "Let's create your token! Please provide the following information:\n"
+        "1. Token Name (e.g., 'My Cool Token')\n"
+        "Send your response now:"
+    ),
+    WizardStep(TokenCreation.token_symbol, "token_symbol", "2. Token Symbol (e.g., 'COOL'):"),
+    WizardStep(TokenCreation.description, "description", "3. Token Description:"),
+    WizardStep(TokenCreation.twitter_url, "twitter_url", "4. Twitter URL (or 'none'):", optional=True),
+    WizardStep(TokenCreation.telegram_url, "telegram_url", "5. Telegram URL (or 'none'):", optional=True),
+    WizardStep(TokenCreation.website_url, "website_url", "6. Website URL (or 'none'):", optional=True),
+    WizardStep(TokenCreation.image, "image", "7. Please send your token image as a photo:"),
+]
+
+# state name -> index into TOKEN_CREATION_STEPS
+TOKEN_CREATION_INDEX = {step.state.state: i for i, step in enumerate(TOKEN_CREATION_STEPS)}
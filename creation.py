@@ -1,9 +1,25 @@
-import requests
+import asyncio
 import base58
+import base64
+import hashlib
+import json
 import logging
+import os
+import time
+from contextlib import contextmanager
+import aiohttp
 from solders.transaction import VersionedTransaction
 from solders.keypair import Keypair
-from typing import List, Dict
+from solders.hash import Hash
+from collections import OrderedDict
+from typing import Any, List, Dict, Tuple, Union
+from http_client import transport
+from resilience import api_guard
+from rpc_pool import rpc_pool
+from jito import JITO_TIP_SOL, LAMPORTS_PER_SOL, SignedBundle, bundle_chunks, jito, tip_transaction
+from fees import fee_estimator
+from metrics import Counter, Histogram
+from images import NormalizedImage, normalize_image
 
 # Set up loggingo
 logging.basicConfig(
@@ -25,28 +41,179 @@ WALLETS = {
   
 }
 
-def create_token_bundle(
+IPFS_URL = os.getenv('IPFS_URL', "https://pump.fun/api/ipfs")
+TRADE_LOCAL_URL = os.getenv('TRADE_LOCAL_URL', "https://pumpportal.fun/api/trade-local")
+# metadataUri of recent uploads, keyed by image hash and metadata, so retries skip IPFS
+METADATA_CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', 256))
+_metadata_uris: "OrderedDict[str, str]" = OrderedDict()
+
+LAUNCH_STAGE_SECONDS = Histogram(
+    "token_launch_stage_seconds", "Time spent in each create_token_bundle stage", ["stage"]
+)
+TOKEN_LAUNCHES_TOTAL = Counter(
+    "token_launches_total", "Token launch bundles by outcome and error class", ["outcome", "error"]
+)
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str):
+    """Record wall time spent in a pipeline stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[name] = round(elapsed, 4)
+        LAUNCH_STAGE_SECONDS.labels(name).observe(elapsed)
+
+def _read_image(image_path: str) -> bytes:
+    with open(image_path, 'rb') as f:
+        return f.read()
+
+def _prepare_signers(wallet_keys: List[str]) -> Tuple[List[Keypair], Keypair]:
+    """Decode signer keys and generate the mint keypair"""
+    signer_keypairs = [
+        Keypair.from_base58_string(key) for key in wallet_keys
+    ]
+    return signer_keypairs, Keypair()
+
+def _metadata_key(form_data: Dict[str, str], image: NormalizedImage) -> str:
+    metadata = json.dumps(form_data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{image.sha256}:{metadata}".encode()).hexdigest()
+
+async def _upload_metadata(form_data: Dict[str, str], image: Union[str, bytes], timings: Dict[str, float]) -> str:
+    if isinstance(image, str):
+        with _stage(timings, 'read_image'):
+            image = await asyncio.to_thread(_read_image, image)
+    with _stage(timings, 'normalize_image'):
+        normalized = await asyncio.to_thread(normalize_image, image)
+
+    cache_key = _metadata_key(form_data, normalized)
+    metadata_uri = _metadata_uris.get(cache_key)
+    if metadata_uri is not None:
+        _metadata_uris.move_to_end(cache_key)
+        logger.info(f"Reusing uploaded metadata {metadata_uri}")
+        return metadata_uri
+
+    def build_form() -> aiohttp.FormData:
+        # A FormData body can only be sent once, so every attempt gets its own
+        form = aiohttp.FormData()
+        for key, value in form_data.items():
+            form.add_field(key, value)
+        form.add_field('file', normalized.data, filename=normalized.filename, content_type=normalized.mime)
+        return form
+
+    logger.info("Uploading metadata to IPFS...")
+    with _stage(timings, 'ipfs_upload'):
+        metadata = await api_guard.call(
+            IPFS_URL, lambda timeout: transport.post_json(IPFS_URL, data=build_form(), timeout=timeout),
+            idempotent=False
+        )
+    metadata_uri = metadata['metadataUri']
+
+    _metadata_uris[cache_key] = metadata_uri
+    if len(_metadata_uris) > METADATA_CACHE_SIZE:
+        _metadata_uris.popitem(last=False)
+    return metadata_uri
+
+def _validate_launch(wallet_keys: List[str], initial_buys: List[float]) -> None:
+    """Reject a launch whose wallets and amounts do not line up, before any network call"""
+    if not wallet_keys:
+        raise ValueError("At least one wallet is required")
+    if len(initial_buys) != len(wallet_keys):
+        raise ValueError(f"Got {len(initial_buys)} initial buys for {len(wallet_keys)} wallets")
+    if len(set(wallet_keys)) != len(wallet_keys):
+        raise ValueError("Each wallet can only be used once per launch")
+    for index, amount in enumerate(initial_buys):
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not amount > 0:
+            raise ValueError(f"Initial buy for wallet {index} must be a positive number, got {amount!r}")
+
+def _sign_bundle(
+    encoded_transactions: List[str],
+    tx_args: List[Dict[str, Any]],
+    signer_keypairs: List[Keypair],
+    mint_keypair: Keypair,
+    blockhash: Hash,
+    tip_lamports: int
+) -> SignedBundle:
+    """Sign one bundle's transactions and append its tip; ``signer_keypairs`` lines up with ``tx_args``"""
+    signed_transactions = []
+    tx_signatures = []
+
+    for args, keypair, encoded_tx in zip(tx_args, signer_keypairs, encoded_transactions):
+        signers = [mint_keypair, keypair] if args["action"] == "create" else [keypair]
+        signed_tx = VersionedTransaction(
+            VersionedTransaction.from_bytes(base58.b58decode(encoded_tx)).message,
+            signers
+        )
+        signed_transactions.append(base64.b64encode(bytes(signed_tx)).decode())
+        tx_signatures.append(str(signed_tx.signatures[0]))
+
+    # Tip last so it is only paid if the whole bundle lands
+    tip = tip_transaction(signer_keypairs[0], blockhash, tip_lamports)
+    signed_transactions.append(base64.b64encode(bytes(tip)).decode())
+    return SignedBundle(signed_transactions, tx_signatures)
+
+async def _build_bundle(tx_args: List[Dict[str, Any]]) -> List[str]:
+    encoded_transactions = await api_guard.call(
+        TRADE_LOCAL_URL,
+        lambda timeout: transport.post_json(
+            TRADE_LOCAL_URL,
+            headers={"Content-Type": "application/json"},
+            json=tx_args,
+            timeout=timeout
+        )
+    )
+    if len(encoded_transactions) != len(tx_args):
+        raise Exception(f"Expected {len(tx_args)} transactions, got {len(encoded_transactions)}")
+    return encoded_transactions
+
+async def _prepare_bundle(
+    tx_args: List[Dict[str, Any]],
+    signer_keypairs: List[Keypair],
+    mint_keypair: Keypair
+) -> SignedBundle:
+    """Build and sign a fresh copy of one bundle, for resubmitting a dropped one"""
+    blockhash, encoded_transactions = await asyncio.gather(rpc_pool.latest_blockhash(), _build_bundle(tx_args))
+    return await asyncio.to_thread(
+        _sign_bundle, encoded_transactions, tx_args, signer_keypairs, mint_keypair,
+        blockhash, int(JITO_TIP_SOL * LAMPORTS_PER_SOL)
+    )
+
+async def create_token_bundle(
     token_name: str,
     token_symbol: str,
     description: str,
     twitter_url: str,
     telegram_url: str,
     website_url: str,
-    image_path: str,
+    image: Union[str, bytes],
     wallet_keys: List[str],
-    initial_buys: List[int]
-) -> None:
+    initial_buys: List[float]
+) -> Dict[str, Any]:
     """
-    Creates a token and sends a bundle of transactions to buy it
+    Creates a token and buys it from every wallet through Jito bundles.
+
+    ``image`` is a file path or the raw image bytes; it is resized and
+    re-encoded before upload, and the ``metadataUri`` is reused when the same
+    image and metadata were uploaded before. The upload runs concurrently
+    with signer key decoding and mint keypair generation.
+
+    ``initial_buys[i]`` is the token amount bought by ``wallet_keys[i]``;
+    the first wallet creates the token. Transactions are split into bundles
+    of ``JITO_MAX_BUNDLE_SIZE`` including a ``JITO_TIP_SOL`` tip each. Every
+    bundle is raced across the Jito block engines and followed until it
+    lands, being rebuilt and resubmitted if dropped. The bundle holding the
+    create goes first and the rest go concurrently once it has landed.
+
+    Returns a dict with ``success``, the mint ``token_address``, landed
+    transaction ``signatures`` (create first), ``bundle_ids``,
+    ``failed_bundles`` and per-stage ``timings`` in seconds (or ``error`` on
+    failure).
     """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
     try:
-        # Initialize signers from provided wallet keys
-        signerKeypairs = [
-            Keypair.from_base58_string(key) for key in wallet_keys
-        ]
-
-        # Generate random keypair for token
-        mint_keypair = Keypair()
+        _validate_launch(wallet_keys, initial_buys)
 
         # Prepare token metadata
         form_data = {
@@ -59,23 +226,12 @@ def create_token_bundle(
             'showName': 'true'
         }
 
-        # Read and prepare image file
-        with open(image_path, 'rb') as f:
-            file_content = f.read()
-
-        files = {
-            'file': (image_path.split('/')[-1], file_content, 'image/png')
-        }
-
-        # Upload to IPFS
-        logger.info("Uploading metadata to IPFS...")
-        metadata_response = requests.post(
-            "https://pump.fun/api/ipfs",
-            data=form_data,
-            files=files
-        )
-        metadata_response.raise_for_status()
-        metadata_uri = metadata_response.json()['metadataUri']
+        # Upload to IPFS while keys are decoded off the event loop
+        with _stage(timings, 'upload_and_keys'):
+            metadata_uri, (signerKeypairs, mint_keypair) = await asyncio.gather(
+                _upload_metadata(form_data, image, timings),
+                asyncio.to_thread(_prepare_signers, wallet_keys)
+            )
 
         # Prepare token metadata
         token_metadata = {
@@ -86,7 +242,7 @@ def create_token_bundle(
 
         # Prepare transaction bundle
         bundled_tx_args = []
-        
+
         # Add create transaction
         bundled_tx_args.append({
             'publicKey': str(signerKeypairs[0].pubkey()),
@@ -96,11 +252,12 @@ def create_token_bundle(
             'denominatedInSol': 'false',
             'amount': initial_buys[0],
             'slippage': 10,
-            'priorityFee': 0.0005,
+            'priorityFee': fee_estimator.fee('p95', fallback=0.0005),
             'pool': 'pump'
         })
 
         # Add buy transactions for additional wallets
+        buy_fee = fee_estimator.fee('p75', fallback=0.0001)
         for i in range(1, len(signerKeypairs)):
             bundled_tx_args.append({
                 'publicKey': str(signerKeypairs[i].pubkey()),
@@ -109,84 +266,111 @@ def create_token_bundle(
                 'denominatedInSol': 'false',
                 'amount': initial_buys[i],
                 'slippage': 50,
-                'priorityFee': 0.0001,
+                'priorityFee': buy_fee,
                 'pool': 'pump'
             })
+        chunks = bundle_chunks(len(bundled_tx_args))
 
-        # Generate transactions
-        logger.info("Generating transaction bundle...")
-        response = requests.post(
-            "https://pumpportal.fun/api/trade-local",
-            headers={"Content-Type": "application/json"},
-            json=bundled_tx_args
-        )
-        response.raise_for_status()
-
-        # Sign transactions
-        encoded_transactions = response.json()
-        encoded_signed_transactions = []
-        tx_signatures = []
-
-        for index, encoded_tx in enumerate(encoded_transactions):
-            if bundled_tx_args[index]["action"] == "create":
-                signed_tx = VersionedTransaction(
-                    VersionedTransaction.from_bytes(base58.b58decode(encoded_tx)).message,
-                    [mint_keypair, signerKeypairs[index]]
+        # Generate every bundle's transactions and fetch a blockhash for the tips
+        logger.info(f"Generating {len(chunks)} transaction bundle(s)...")
+        with _stage(timings, 'bundle_build'):
+            blockhash, *encoded_bundles = await asyncio.gather(
+                rpc_pool.latest_blockhash(),
+                *(_build_bundle(bundled_tx_args[chunk.start:chunk.stop]) for chunk in chunks)
+            )
+
+        # Sign off the event loop; dozens of wallets take a noticeable while
+        bundle_args = [bundled_tx_args[chunk.start:chunk.stop] for chunk in chunks]
+        bundle_keypairs = [signerKeypairs[chunk.start:chunk.stop] for chunk in chunks]
+        with _stage(timings, 'sign'):
+            signed_bundles = await asyncio.gather(*(
+                asyncio.to_thread(
+                    _sign_bundle, encoded, args, keypairs, mint_keypair,
+                    blockhash, int(JITO_TIP_SOL * LAMPORTS_PER_SOL)
                 )
+                for encoded, args, keypairs in zip(encoded_bundles, bundle_args, bundle_keypairs)
+            ))
+
+        def rebuild(index: int):
+            return lambda: _prepare_bundle(bundle_args[index], bundle_keypairs[index], mint_keypair)
+
+        # The create bundle has to land before the buys that depend on it go out
+        logger.info("Sending bundles to Jito MEV...")
+        with _stage(timings, 'jito_land'):
+            create = await jito.land(rebuild(0), first=signed_bundles[0])
+        if create["status"] != "landed":
+            raise Exception(f"Create bundle did not land: {create['error']}")
+        with _stage(timings, 'jito_follow_ups'):
+            follow_ups = await asyncio.gather(*(
+                jito.land(rebuild(index), first=signed_bundles[index])
+                for index in range(1, len(signed_bundles))
+            ))
+
+        tx_signatures = list(create["bundle"].signatures)
+        bundle_ids = [create["bundle_id"]]
+        failed_bundles = []
+        for index, outcome in enumerate(follow_ups, start=1):
+            if outcome["status"] == "landed":
+                tx_signatures.extend(outcome["bundle"].signatures)
+                bundle_ids.append(outcome["bundle_id"])
             else:
-                signed_tx = VersionedTransaction(
-                    VersionedTransaction.from_bytes(base58.b58decode(encoded_tx)).message,
-                    [signerKeypairs[index]]
-                )
-            
-            encoded_signed_transactions.append(base58.b58encode(bytes(signed_tx)).decode())
-            tx_signatures.append(str(signed_tx.signatures[0]))
-
-        # Send to Jito MEV
-        logger.info("Sending bundle to Jito MEV...")
-        jito_response = requests.post(
-            "https://mainnet.block-engine.jito.wtf/api/v1/bundles",
-            headers={"Content-Type": "application/json"},
-            json={
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "sendBundle",
-                "params": [encoded_signed_transactions]
-            }
-        )
-        jito_response.raise_for_status()
+                logger.error(f"Bundle {index} did not land: {outcome['error']}")
+                failed_bundles.append({"bundle": index, "error": outcome["error"]})
+        timings['total'] = round(time.perf_counter() - started, 4)
 
         # Log results
-        logger.info(f"Token mint address: {str(mint_keypair.pubkey())}")
+        token_address = str(mint_keypair.pubkey())
+        logger.info(f"Token mint address: {token_address}")
         for i, signature in enumerate(tx_signatures):
             logger.info(f'Transaction {i}: https://solscan.io/tx/{signature}')
+        logger.info(f"Token creation timings: {timings}")
+        TOKEN_LAUNCHES_TOTAL.labels("success", "").inc()
+
+        return {
+            "success": True,
+            "token_address": token_address,
+            "signatures": tx_signatures,
+            "bundle_id": bundle_ids[0],
+            "bundle_ids": bundle_ids,
+            "failed_bundles": failed_bundles,
+            "transaction_url": f"https://solscan.io/tx/{tx_signatures[0]}",
+            "timings": timings
+        }
 
     except Exception as e:
+        timings['total'] = round(time.perf_counter() - started, 4)
         logger.error(f"Token creation failed: {str(e)}")
-        raise
+        TOKEN_LAUNCHES_TOTAL.labels("failure", type(e).__name__).inc()
+        return {
+            "success": False,
+            "error": str(e),
+            "timings": timings
+        }
 
-def main():
+async def main():
     # Example usage
     wallet_keys = [
         WALLETS["WALLET_A"]["PRIVATE_KEY"],
         WALLETS["WALLET_B"]["PRIVATE_KEY"]
     ]
     
-    initial_buys = [1785356, 1785356,3564780]  # Amount of tokens to buy for each wallet
+    initial_buys = [1785356, 1785356]  # Amount of tokens to buy for each wallet
     
-    create_token_bundle(
+    result = await create_token_bundle(
         token_name="token",
         token_symbol="$TICK",
         description="",
         twitter_url="",
         telegram_url="",
         website_url="",
-        image_path="./folder/image.jpeg",
+        image="./folder/image.jpeg",
         wallet_keys=wallet_keys,
         initial_buys=initial_buys
     )
+    logger.info(f"Result: {result}")
+    await transport.close()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
 
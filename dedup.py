@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Telegram retries an unacknowledged update for a while; remember ids this long
+UPDATE_DEDUP_TTL = float(os.getenv('UPDATE_DEDUP_TTL', 600))
+UPDATE_DEDUP_SIZE = int(os.getenv('UPDATE_DEDUP_SIZE', 50000))
+# Identical trades from the same wallet within this many seconds are sent once
+TRADE_DEDUP_WINDOW = float(os.getenv('TRADE_DEDUP_WINDOW', 15))
+TRADE_DEDUP_SIZE = int(os.getenv('TRADE_DEDUP_SIZE', 10000))
+
+
+class SeenCache:
+    """Bounded LRU of recently seen keys that forgets them after ``ttl``"""
+
+    def __init__(self, ttl: float = UPDATE_DEDUP_TTL, max_size: int = UPDATE_DEDUP_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._seen: "OrderedDict[Hashable, float]" = OrderedDict()  # key -> expires_at
+        self.duplicates = 0
+
+    def add(self, key: Hashable) -> bool:
+        """Record ``key``; False if it was already seen and has not expired"""
+        now = time.monotonic()
+        expires_at = self._seen.get(key)
+        if expires_at is not None and expires_at > now:
+            self.duplicates += 1
+            return False
+
+        self._seen[key] = now + self.ttl
+        self._seen.move_to_end(key)
+        # Entries are in insertion order, so expired ones sit at the front
+        while self._seen and (len(self._seen) > self.max_size or next(iter(self._seen.values())) <= now):
+            self._seen.popitem(last=False)
+        return True
+
+    def discard(self, key: Hashable) -> None:
+        self._seen.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self._seen.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+
+
+class IdempotencyCache:
+    """Runs each logical operation once per ``window`` seconds.
+
+    A call whose key is already in flight waits for the original instead of
+    starting a second one, and a key that succeeded within the window gets
+    the earlier result back. Failed results are forgotten straight away so
+    the user can retry.
+    """
+
+    def __init__(self, window: float = TRADE_DEDUP_WINDOW, max_size: int = TRADE_DEDUP_SIZE):
+        self.window = window
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[asyncio.Future, float]]" = OrderedDict()
+        self.duplicates = 0
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, (future, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_size:
+                break
+            self._entries.popitem(last=False)
+
+    def _forget_failure(self, key: Hashable, future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is not None or not future.result().get("success"):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is future:
+                del self._entries[key]
+
+    async def run(
+        self,
+        key: Hashable,
+        operation: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Result of ``operation()``, or of the earlier run with the same key.
+
+        Results served from an earlier run carry ``"duplicate": True``.
+        """
+        now = time.monotonic()
+        self._evict(now)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            self.duplicates += 1
+            logger.info(f"Duplicate operation {key}, reusing the earlier result")
+            result = await asyncio.shield(entry[0])
+            return dict(result, duplicate=True)
+
+        future = asyncio.ensure_future(operation())
+        self._entries[key] = (future, now + self.window)
+        future.add_done_callback(lambda f: self._forget_failure(key, f))
+        return await asyncio.shield(future)
+
+
+# Process-wide guards: webhook update ids and trades sent by any SolanaTrader
+seen_updates = SeenCache()
+trade_guard = IdempotencyCache()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+
+logger = logging.getLogger(__name__)
+
+PUMP_PROGRAM = "6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ14M5uBEwF6P"
+
+# Accounts whose recent prioritization fees are sampled (comma-separated)
+FEE_ACCOUNTS = [a.strip() for a in os.getenv('FEE_ACCOUNTS', PUMP_PROGRAM).split(',') if a.strip()]
+FEE_SAMPLE_INTERVAL = float(os.getenv('FEE_SAMPLE_INTERVAL', 10))
+# Number of most recent slots kept in the rolling window
+FEE_WINDOW_SLOTS = int(os.getenv('FEE_WINDOW_SLOTS', 300))
+# Compute units assumed per trade when converting micro-lamports/CU to SOL
+FEE_COMPUTE_UNITS = int(os.getenv('FEE_COMPUTE_UNITS', 200000))
+FEE_MIN_SOL = float(os.getenv('FEE_MIN_SOL', 0.00001))
+FEE_MAX_SOL = float(os.getenv('FEE_MAX_SOL', 0.005))
+# Default tier for user trades
+FEE_TIER = os.getenv('FEE_TIER', 'p75')
+
+TIERS = {"p50": 0.50, "p75": 0.75, "p95": 0.95}
+
+
+class PriorityFeeEstimator:
+    """Rolling percentiles of recent prioritization fees, refreshed in the background.
+
+    A sampler task calls ``getRecentPrioritizationFees`` every
+    ``FEE_SAMPLE_INTERVAL`` seconds and keeps the last ``FEE_WINDOW_SLOTS``
+    per-slot fees. Percentiles are recomputed once per sample, so ``fee`` is a
+    dict lookup with no RPC on the trade path.
+    """
+
+    def __init__(
+        self,
+        rpc_pool: Optional[RpcPool] = None,
+        accounts: Sequence[str] = FEE_ACCOUNTS,
+        interval: float = FEE_SAMPLE_INTERVAL,
+        window_slots: int = FEE_WINDOW_SLOTS,
+        compute_units: int = FEE_COMPUTE_UNITS,
+        min_fee: float = FEE_MIN_SOL,
+        max_fee: float = FEE_MAX_SOL
+    ):
+        self.rpc_pool = rpc_pool or default_rpc_pool
+        self.accounts = list(accounts)
+        self.interval = interval
+        self.window_slots = window_slots
+        self.compute_units = compute_units
+        self.min_fee = min_fee
+        self.max_fee = max_fee
+        self._fees: "OrderedDict[int, int]" = OrderedDict()  # slot -> micro-lamports/CU
+        self._percentiles: Dict[str, float] = {}
+        self.updated_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _to_sol(self, micro_lamports_per_cu: float) -> float:
+        lamports = micro_lamports_per_cu * self.compute_units / 1_000_000
+        return min(self.max_fee, max(self.min_fee, lamports / 1_000_000_000))
+
+    def fee(self, tier: str = FEE_TIER, fallback: Optional[float] = None) -> float:
+        """Priority fee in SOL for ``tier``; ``fallback`` until the first sample"""
+        if tier not in TIERS:
+            raise ValueError(f"Unknown fee tier {tier!r}, expected one of {', '.join(TIERS)}")
+        if tier not in self._percentiles:
+            return fallback if fallback is not None else self.min_fee
+        return self._to_sol(self._percentiles[tier])
+
+    def add_samples(self, samples: List[Dict[str, int]]) -> None:
+        for sample in samples:
+            self._fees[sample["slot"]] = sample["prioritizationFee"]
+        while len(self._fees) > self.window_slots:
+            self._fees.popitem(last=False)
+
+        values = sorted(self._fees.values())
+        if values:
+            self._percentiles = {
+                tier: values[min(len(values) - 1, int(len(values) * q))]
+                for tier, q in TIERS.items()
+            }
+            self.updated_at = time.time()
+
+    async def sample(self) -> None:
+        payload = json.dumps({
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getRecentPrioritizationFees",
+            "params": [self.accounts]
+        })
+        try:
+            response = await self.rpc_pool.call(payload)
+            samples = sorted(response["result"], key=lambda s: s["slot"])
+        except Exception as e:
+            logger.warning(f"Priority fee sampling failed: {e}")
+            return
+        self.add_samples(samples)
+
+    async def _sample_loop(self) -> None:
+        while True:
+            await self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": len(self._fees),
+            "updated_at": self.updated_at,
+            "micro_lamports_per_cu": dict(self._percentiles),
+            "sol": {tier: self.fee(tier) for tier in TIERS},
+        }
+
+
+# Process-wide estimator sampling FEE_ACCOUNTS
+fee_estimator = PriorityFeeEstimator()
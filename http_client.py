@@ -0,0 +1,97 @@
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Transport configuration (override via environment)
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))
+HTTP_PER_HOST_LIMIT = int(os.getenv('HTTP_PER_HOST_LIMIT', 20))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 15))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_KEEPALIVE = float(os.getenv('HTTP_KEEPALIVE', 30))
+
+
+class HttpTransport:
+    """Shared aiohttp session with keep-alive connection pooling.
+
+    All outbound calls to pumpportal, pump.fun, RPC nodes and Jito go through
+    one connector, so TLS connections are reused across trades and each host
+    gets at most ``per_host_limit`` concurrent connections. The session is
+    created lazily inside the running event loop.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        per_host_limit: int = HTTP_PER_HOST_LIMIT,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        keepalive_timeout: float = HTTP_KEEPALIVE
+    ):
+        self.pool_size = pool_size
+        self.per_host_limit = per_host_limit
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host_limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                raise_for_status=True
+            )
+        return self._session
+
+    def _timeout(self, timeout: Optional[float]) -> aiohttp.ClientTimeout:
+        # aiohttp reads timeout=None as "no deadline", not "use the session's"
+        if timeout is None:
+            return self.timeout
+        return aiohttp.ClientTimeout(total=timeout, connect=self.timeout.connect)
+
+    async def post_bytes(
+        self,
+        url: str,
+        json: Any = None,
+        data: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> bytes:
+        """POST and return the raw response body"""
+        async with self.session.post(
+            url, json=json, data=data, headers=headers, timeout=self._timeout(timeout)
+        ) as response:
+            return await response.read()
+
+    async def post_json(
+        self,
+        url: str,
+        json: Any = None,
+        data: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """POST and decode the JSON response body"""
+        async with self.session.post(
+            url, json=json, data=data, headers=headers, timeout=self._timeout(timeout)
+        ) as response:
+            return await response.json(content_type=None)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Process-wide transport shared by the bot, trader and token creation
+transport = HttpTransport()
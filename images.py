@@ -0,0 +1,65 @@
+import hashlib
+import logging
+import os
+from io import BytesIO
+from typing import NamedTuple, Optional, Sequence
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Largest image accepted before decoding (Telegram bots can download up to 20 MB)
+MAX_IMAGE_INPUT_BYTES = int(os.getenv('MAX_IMAGE_INPUT_BYTES', 20 * 1024 * 1024))
+# Upload cap after re-encoding
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_BYTES', 4 * 1024 * 1024))
+# Longest side in pixels after resizing
+MAX_IMAGE_SIDE = int(os.getenv('MAX_IMAGE_SIDE', 1000))
+JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', 90))
+
+
+class NormalizedImage(NamedTuple):
+    data: bytes
+    mime: str
+    filename: str
+    sha256: str
+
+
+def _normalized(data: bytes, mime: str, extension: str) -> NormalizedImage:
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"Image is {len(data) // 1024} KB after re-encoding, limit is {MAX_IMAGE_BYTES // 1024} KB")
+    digest = hashlib.sha256(data).hexdigest()
+    return NormalizedImage(data, mime, f"{digest[:16]}.{extension}", digest)
+
+
+def normalize_image(data: bytes) -> NormalizedImage:
+    """Resize to ``MAX_IMAGE_SIDE`` and re-encode, dropping EXIF and other metadata.
+
+    Animated GIFs are passed through unchanged, images with transparency
+    become PNG and everything else becomes JPEG. CPU-bound; call it off the
+    event loop.
+    """
+    if len(data) > MAX_IMAGE_INPUT_BYTES:
+        raise ValueError(f"Image is too large ({len(data) // 1024} KB)")
+    try:
+        image = Image.open(BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Unsupported image: {e}") from e
+
+    with image:
+        if image.format == "GIF" and getattr(image, "is_animated", False):
+            return _normalized(data, "image/gif", "gif")
+
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+        output = BytesIO()
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image.save(output, "PNG", optimize=True)
+            return _normalized(output.getvalue(), "image/png", "png")
+        image.convert("RGB").save(output, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        return _normalized(output.getvalue(), "image/jpeg", "jpg")
+
+
+def pick_photo_size(sizes: Sequence, max_bytes: int = MAX_IMAGE_INPUT_BYTES) -> Optional[object]:
+    """Largest Telegram ``PhotoSize`` whose size is known to fit ``max_bytes``"""
+    fitting = [size for size in sizes if size.file_size is None or size.file_size <= max_bytes]
+    return max(fitting, key=lambda size: size.width * size.height, default=None)
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.system_program import TransferParams, transfer
+from solders.transaction import VersionedTransaction
+from http_client import HttpTransport, transport as default_transport
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+JITO_REGIONS = (
+    "https://mainnet.block-engine.jito.wtf",
+    "https://amsterdam.mainnet.block-engine.jito.wtf",
+    "https://frankfurt.mainnet.block-engine.jito.wtf",
+    "https://ny.mainnet.block-engine.jito.wtf",
+    "https://tokyo.mainnet.block-engine.jito.wtf",
+    "https://slc.mainnet.block-engine.jito.wtf",
+)
+# Block engines raced on every sendBundle (comma-separated base URLs)
+JITO_ENGINES = [
+    url.strip().rstrip('/')
+    for url in os.getenv('JITO_ENGINES', ','.join(JITO_REGIONS)).split(',')
+    if url.strip()
+]
+JITO_STATUS_INTERVAL = float(os.getenv('JITO_STATUS_INTERVAL', 1))
+# Give up resubmitting a bundle this many seconds after the first attempt
+JITO_LAND_DEADLINE = float(os.getenv('JITO_LAND_DEADLINE', 60))
+# An engine may not know a just-accepted bundle yet; "Invalid" only counts as dropped after this
+JITO_INVALID_GRACE = float(os.getenv('JITO_INVALID_GRACE', 5))
+
+# Jito accepts at most 5 transactions per bundle; one slot goes to the tip
+JITO_MAX_BUNDLE_SIZE = 5
+JITO_TIP_SOL = float(os.getenv('JITO_TIP_SOL', 0.0001))
+JITO_TIP_ACCOUNTS = [Pubkey.from_string(account) for account in (
+    "96gYZGLnJYVFmbjzopPSU6QiEV5fGqZNyN9nmNhvrZU5",
+    "HFqU5x63VTqvQss8hp11i4wVV8bD44PvwucfZ2bU7gRe",
+    "Cw8CFyM9FkoMi7K7Crf6HNQqf4uEMzpKw6QNghXLvLkY",
+    "ADaUMid9yfUytqMBgopwjb2DTLSokTSzL1zt6iGPaS49",
+    "DfXygSm4jCyNCybVYYK6DwvWqjKee8pbDmJGcLWNDXjh",
+    "ADuUkR4vqLUMWXxW9gh6D6L8pMSawimctcNZ5pGwDcEt",
+    "DttWaMuVvTiduZRnguLF7jNxTgiMBZ1hyAumKUiL2KRL",
+    "3AVi9Tg9Uo68tJfuvoKvqKNWKkC5wPdSSdeBnizKZ6jT",
+)]
+LAMPORTS_PER_SOL = 1_000_000_000
+
+BUNDLES_PATH = "/api/v1/bundles"
+INFLIGHT_PATH = "/api/v1/getInflightBundleStatuses"
+
+BUNDLE_LANDING_SECONDS = Histogram(
+    "jito_bundle_landing_seconds", "Time from first sendBundle to a landed bundle",
+    buckets=(0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+)
+BUNDLE_SUBMISSIONS_TOTAL = Counter(
+    "jito_bundle_submissions_total", "sendBundle races by winning engine", ["engine"]
+)
+BUNDLE_OUTCOMES_TOTAL = Counter(
+    "jito_bundle_outcomes_total", "Tracked bundles by final status", ["status"]
+)
+
+
+class SignedBundle(NamedTuple):
+    transactions: List[str]  # base64 signed transactions, tip last
+    signatures: List[str]    # first signature of every non-tip transaction
+
+
+BundleBuilder = Callable[[], Awaitable[SignedBundle]]
+
+
+def bundle_chunks(count: int) -> List[range]:
+    """Split ``count`` transactions into bundles, leaving room for a tip in each"""
+    size = JITO_MAX_BUNDLE_SIZE - 1
+    return [range(i, min(i + size, count)) for i in range(0, count, size)]
+
+
+def tip_transaction(payer: Keypair, blockhash: Hash, lamports: int = int(JITO_TIP_SOL * LAMPORTS_PER_SOL)) -> VersionedTransaction:
+    """Signed transfer of ``lamports`` to a random Jito tip account"""
+    instruction = transfer(TransferParams(
+        from_pubkey=payer.pubkey(),
+        to_pubkey=random.choice(JITO_TIP_ACCOUNTS),
+        lamports=lamports
+    ))
+    return VersionedTransaction(MessageV0.try_compile(payer.pubkey(), [instruction], [], blockhash), [payer])
+
+
+def _consume_result(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+class JitoClient:
+    """Races ``sendBundle`` across regional block engines and follows bundles until they land.
+
+    The first engine to accept a bundle wins; the other submissions are left
+    to finish, since extra copies only help the bundle spread. ``land``
+    polls the winning engine's ``getInflightBundleStatuses``. When the bundle
+    fails, or stays unknown past ``invalid_grace``, it rebuilds the bundle
+    with fresh transactions and blockhash and submits it again, until
+    ``deadline`` runs out.
+    """
+
+    def __init__(
+        self,
+        engines: Sequence[str] = JITO_ENGINES,
+        transport: Optional[HttpTransport] = None,
+        status_interval: float = JITO_STATUS_INTERVAL,
+        deadline: float = JITO_LAND_DEADLINE,
+        invalid_grace: float = JITO_INVALID_GRACE
+    ):
+        self.engines = list(engines)
+        self.transport = transport or default_transport
+        self.status_interval = status_interval
+        self.deadline = deadline
+        self.invalid_grace = invalid_grace
+
+    async def _rpc(self, url: str, method: str, params: List[Any]) -> Any:
+        response = await self.transport.post_json(
+            url,
+            headers={"Content-Type": "application/json"},
+            json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        )
+        if "result" not in response:
+            raise Exception(f"{method} rejected by {url}: {response.get('error', response)}")
+        return response["result"]
+
+    async def send(self, transactions: List[str]) -> Tuple[str, str]:
+        """Submit to every engine at once; returns ``(bundle_id, engine)`` of the first acceptance"""
+        tasks = {
+            asyncio.ensure_future(self._rpc(
+                f"{engine}{BUNDLES_PATH}", "sendBundle", [transactions, {"encoding": "base64"}]
+            )): engine
+            for engine in self.engines
+        }
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    engine = tasks[task]
+                    BUNDLE_SUBMISSIONS_TOTAL.labels(engine).inc()
+                    return task.result(), engine
+        finally:
+            for task in pending:
+                task.add_done_callback(_consume_result)
+        raise last_error or Exception("No Jito block engines configured")
+
+    async def inflight_status(self, engine: str, bundle_id: str) -> Dict[str, Any]:
+        """``{"status": Invalid|Pending|Failed|Landed, "landed_slot": ...}`` for one bundle"""
+        result = await self._rpc(f"{engine}{INFLIGHT_PATH}", "getInflightBundleStatuses", [[bundle_id]])
+        statuses = result.get("value") or []
+        return statuses[0] if statuses else {"status": "Invalid", "landed_slot": None}
+
+    async def bundle_status(self, engine: str, bundle_id: str) -> Optional[Dict[str, Any]]:
+        """Confirmed-history status from ``getBundleStatuses``, or None if unknown"""
+        result = await self._rpc(f"{engine}{BUNDLES_PATH}", "getBundleStatuses", [[bundle_id]])
+        statuses = result.get("value") or []
+        return statuses[0] if statuses else None
+
+    async def land(self, build: BundleBuilder, first: Optional[SignedBundle] = None) -> Dict[str, Any]:
+        """Submit a bundle and resubmit refreshed copies until it lands or the deadline passes.
+
+        ``first`` is used for the initial attempt when already built;
+        ``build`` makes every later one. Returns ``status`` (landed, failed
+        or expired), ``bundle_id``, ``bundle`` (the last SignedBundle sent),
+        ``slot``, ``attempts`` and ``error``.
+        """
+        started = time.monotonic()
+        deadline = started + self.deadline
+        bundle = first
+        sent: Optional[SignedBundle] = None
+        bundle_id = None
+        attempts = 0
+        error = None
+
+        while time.monotonic() < deadline:
+            try:
+                if bundle is None:
+                    bundle = await build()
+                bundle_id, engine = await self.send(bundle.transactions)
+            except Exception as e:
+                error = str(e)
+                logger.warning(f"Bundle submission failed: {e}")
+                await asyncio.sleep(self.status_interval)
+                continue
+            sent = bundle
+            attempts += 1
+            logger.info(f"Bundle {bundle_id} accepted by {engine} (attempt {attempts})")
+
+            landed_slot = await self._follow(engine, bundle_id, deadline)
+            if landed_slot is not False:
+                BUNDLE_LANDING_SECONDS.labels().observe(time.monotonic() - started)
+                BUNDLE_OUTCOMES_TOTAL.labels("landed").inc()
+                return {
+                    "status": "landed", "bundle_id": bundle_id, "bundle": sent,
+                    "slot": landed_slot, "attempts": attempts, "error": None
+                }
+            error = f"Bundle {bundle_id} was dropped"
+            if time.monotonic() < deadline:
+                logger.warning(f"{error}, resubmitting a refreshed bundle")
+            # Transactions may have expired; always rebuild before resubmitting
+            bundle = None
+
+        status = "expired" if attempts else "failed"
+        BUNDLE_OUTCOMES_TOTAL.labels(status).inc()
+        return {
+            "status": status, "bundle_id": bundle_id, "bundle": sent,
+            "slot": None, "attempts": attempts, "error": error or "Deadline passed before the bundle landed"
+        }
+
+    async def _follow(self, engine: str, bundle_id: str, deadline: float) -> Any:
+        """Poll until the bundle lands (its slot) or is dropped or times out (False)"""
+        submitted = time.monotonic()
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.status_interval)
+            try:
+                status = await self.inflight_status(engine, bundle_id)
+                state = status.get("status")
+                if state == "Landed":
+                    return status.get("landed_slot")
+                if state == "Failed":
+                    return False
+                if state == "Invalid" and time.monotonic() - submitted > self.invalid_grace:
+                    # Inflight statuses only cover recent bundles; check the history too
+                    history = await self.bundle_status(engine, bundle_id)
+                    if history is not None and history.get("err") == {"Ok": None}:
+                        return history.get("slot")
+                    return False
+            except Exception as e:
+                logger.warning(f"Bundle status check failed for {bundle_id}: {e}")
+        return False
+
+
+# Process-wide client racing JITO_ENGINES
+jito = JitoClient()
@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages/s per bot and 1 message/s per chat
+OUTBOX_GLOBAL_RATE = float(os.getenv('OUTBOX_GLOBAL_RATE', 30))
+OUTBOX_CHAT_RATE = float(os.getenv('OUTBOX_CHAT_RATE', 1))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+# Telegram rejects message texts longer than this
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0, or the seconds to wait when none is left"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Chat:
+    __slots__ = ("chat_id", "pending", "ready_at", "busy")
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.pending: Deque[Tuple[str, int]] = deque()  # (text, attempts)
+        self.ready_at = 0.0
+        self.busy = False  # queued in the heap or being sent
+
+
+class Outbox:
+    """Rate-limited outbound notifications with per-chat coalescing.
+
+    ``send`` only enqueues. A single pacing task releases at most
+    ``global_rate`` messages per second overall and one message per
+    ``1 / chat_rate`` seconds to each chat. Whatever has piled up for a chat
+    by the time its turn comes is merged into one digest message (up to
+    Telegram's length limit). A ``RetryAfter`` answer puts the messages back
+    and pauses that chat for the time Telegram asks.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = OUTBOX_GLOBAL_RATE,
+        chat_rate: float = OUTBOX_CHAT_RATE,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS
+    ):
+        self.bot = bot
+        self.bucket = TokenBucket(global_rate)
+        self.chat_interval = 1 / chat_rate
+        self.max_attempts = max_attempts
+        self._chats: Dict[int, _Chat] = {}
+        self._heap: List[Tuple[float, int, int]] = []  # (ready_at, seq, chat_id)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+        self.queued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def send(self, chat_id: int, text: str) -> None:
+        """Queue ``text`` for ``chat_id``; delivery happens in the background"""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(chat_id)
+        chat.pending.append((text, 0))
+        self.queued += 1
+        if not chat.busy:
+            self._schedule(chat)
+
+    def _schedule(self, chat: _Chat) -> None:
+        chat.busy = True
+        heapq.heappush(self._heap, (chat.ready_at, next(self._seq), chat.chat_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _take_digest(self, chat: _Chat) -> List[Tuple[str, int]]:
+        parts = [chat.pending.popleft()]
+        length = len(parts[0][0])
+        while chat.pending:
+            length += len(DIGEST_SEPARATOR) + len(chat.pending[0][0])
+            if length > MAX_MESSAGE_LENGTH:
+                break
+            parts.append(chat.pending.popleft())
+        return parts
+
+    async def _deliver(self, chat: _Chat, parts: List[Tuple[str, int]]) -> None:
+        text = DIGEST_SEPARATOR.join(part for part, _ in parts)
+        try:
+            await self.bot.send_message(chat_id=chat.chat_id, text=text)
+            self.sent += 1
+            self.coalesced += len(parts) - 1
+            chat.ready_at = time.monotonic() + self.chat_interval
+        except TelegramRetryAfter as e:
+            self.retries += 1
+            logger.warning(f"Telegram asked to retry chat {chat.chat_id} after {e.retry_after}s")
+            chat.pending.extendleft(reversed(parts))
+            chat.ready_at = time.monotonic() + e.retry_after
+        except Exception as e:
+            retry = [(part, attempts + 1) for part, attempts in parts if attempts + 1 < self.max_attempts]
+            self.dropped += len(parts) - len(retry)
+            logger.error(f"Notification to chat {chat.chat_id} failed: {e}")
+            chat.pending.extendleft(reversed(retry))
+            chat.ready_at = time.monotonic() + self.chat_interval
+
+        if chat.pending:
+            self._schedule(chat)
+        else:
+            chat.busy = False
+            # Keep the chat's pacing state until its interval has passed
+            asyncio.get_running_loop().call_later(self.chat_interval, self._forget, chat)
+
+    def _forget(self, chat: _Chat) -> None:
+        if not chat.busy and self._chats.get(chat.chat_id) is chat:
+            del self._chats[chat.chat_id]
+
+    async def _sleep(self, delay: float) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _pace_loop(self) -> None:
+        while True:
+            if not self._heap:
+                await self._sleep(None)
+                continue
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+            wait = self.bucket.take()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._heap)
+            chat = self._chats[chat_id]
+            task = asyncio.create_task(self._deliver(chat, self._take_digest(chat)))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._pace_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._deliveries, return_exceptions=True)
+            self._task = None
+        unsent = sum(len(chat.pending) for chat in self._chats.values())
+        if unsent:
+            logger.warning(f"Outbox stopped with {unsent} unsent notifications")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": sum(len(chat.pending) for chat in self._chats.values()),
+            "chats": len(self._chats),
+            "queued": self.queued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import struct
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from solders.pubkey import Pubkey
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+
+logger = logging.getLogger(__name__)
+
+PUMP_PROGRAM = Pubkey.from_string("6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ14M5uBEwF6P")
+# How long a "still on the bonding curve" answer is trusted before re-checking
+POOL_CACHE_TTL = float(os.getenv('POOL_CACHE_TTL', 30))
+POOL_CACHE_SIZE = int(os.getenv('POOL_CACHE_SIZE', 10000))
+# getMultipleAccounts accepts at most 100 accounts per call
+MAX_ACCOUNTS_PER_REQUEST = 100
+
+# 8-byte discriminator followed by five u64 fields and the ``complete`` flag
+_BONDING_CURVE_LAYOUT = struct.Struct("<8xQQQQQ?")
+BONDING_CURVE_SIZE = _BONDING_CURVE_LAYOUT.size
+
+
+class BondingCurveState(NamedTuple):
+    virtual_token_reserves: int
+    virtual_sol_reserves: int
+    real_token_reserves: int
+    real_sol_reserves: int
+    token_total_supply: int
+    complete: bool
+
+
+def parse_bonding_curve(data: bytes) -> BondingCurveState:
+    return BondingCurveState(*_BONDING_CURVE_LAYOUT.unpack_from(data))
+
+
+def bonding_curve_creator(data: bytes) -> Optional[str]:
+    """Creator pubkey stored after the curve fields, or None on curves that predate it"""
+    end = _BONDING_CURVE_LAYOUT.size + 32
+    if len(data) < end:
+        return None
+    return str(Pubkey.from_bytes(data[_BONDING_CURVE_LAYOUT.size:end]))
+
+
+@lru_cache(maxsize=POOL_CACHE_SIZE)
+def bonding_curve_address(mint: str) -> str:
+    """PDA of the pump.fun bonding curve account for ``mint``"""
+    address, _ = Pubkey.find_program_address(
+        [b"bonding-curve", bytes(Pubkey.from_string(mint))], PUMP_PROGRAM
+    )
+    return str(address)
+
+
+async def get_multiple_accounts(rpc_pool: RpcPool, addresses: Sequence[str]) -> List[Optional[bytes]]:
+    """Fetch raw account data for ``addresses`` in chunks of 100 (None if missing)"""
+    async def fetch(chunk: Sequence[str]) -> List[Optional[bytes]]:
+        response = await rpc_pool.call(json.dumps({
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getMultipleAccounts",
+            "params": [list(chunk), {"encoding": "base64"}]
+        }))
+        if "result" not in response:
+            raise Exception(f"Invalid RPC response: {response}")
+        return [
+            base64.b64decode(account["data"][0]) if account else None
+            for account in response["result"]["value"]
+        ]
+
+    chunks = await asyncio.gather(*(
+        fetch(addresses[i:i + MAX_ACCOUNTS_PER_REQUEST])
+        for i in range(0, len(addresses), MAX_ACCOUNTS_PER_REQUEST)
+    ))
+    return [data for chunk in chunks for data in chunk]
+
+
+class PoolResolver:
+    """Works out whether a mint trades on the pump.fun curve or on Raydium.
+
+    A mint with a bonding curve that is not ``complete`` is ``pump``; a
+    completed curve or no curve at all means ``raydium``. Graduation is one
+    way, so ``raydium`` answers are cached for good while ``pump`` answers
+    expire after ``POOL_CACHE_TTL`` to pick up graduations. Concurrent
+    lookups of the same mint share one RPC request. Listeners added with
+    ``add_listener`` get every fetched ``(mint, curve account data)`` pair.
+    """
+
+    def __init__(self, rpc_pool: Optional[RpcPool] = None, ttl: float = POOL_CACHE_TTL, max_size: int = POOL_CACHE_SIZE):
+        self.rpc_pool = rpc_pool or default_rpc_pool
+        self.ttl = ttl
+        self.max_size = max_size
+        self._cache: Dict[str, Tuple[str, float]] = {}  # mint -> (pool, expires_at)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._listeners: List[Callable[[str, Optional[bytes]], None]] = []
+
+    def add_listener(self, listener: Callable[[str, Optional[bytes]], None]) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, mint: str, data: Optional[bytes]) -> None:
+        for listener in self._listeners:
+            listener(mint, data)
+
+    def cached(self, mint: str) -> Optional[str]:
+        entry = self._cache.get(mint)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def _store(self, mint: str, pool: str) -> None:
+        if len(self._cache) >= self.max_size:
+            now = time.monotonic()
+            self._cache = {m: e for m, e in self._cache.items() if e[1] > now}
+            if len(self._cache) >= self.max_size:
+                self._cache.pop(next(iter(self._cache)))
+        expires_at = float("inf") if pool == "raydium" else time.monotonic() + self.ttl
+        self._cache[mint] = (pool, expires_at)
+
+    def invalidate(self, mint: str) -> None:
+        self._cache.pop(mint, None)
+
+    @staticmethod
+    def _pool_for(data: Optional[bytes]) -> str:
+        if data is None or len(data) < _BONDING_CURVE_LAYOUT.size:
+            return "raydium"
+        return "raydium" if parse_bonding_curve(data).complete else "pump"
+
+    async def _lookup(self, mint: str) -> str:
+        [data] = await get_multiple_accounts(self.rpc_pool, [bonding_curve_address(mint)])
+        self._notify(mint, data)
+        pool = self._pool_for(data)
+        self._store(mint, pool)
+        return pool
+
+    async def resolve(self, mint: str) -> str:
+        pool = self.cached(mint)
+        if pool is not None:
+            return pool
+
+        future = self._inflight.get(mint)
+        if future is None:
+            future = self._inflight[mint] = asyncio.ensure_future(self._lookup(mint))
+            future.add_done_callback(lambda _: self._inflight.pop(mint, None))
+        return await asyncio.shield(future)
+
+    async def refresh(self, mints: Sequence[str]) -> Dict[str, str]:
+        """Re-check many mints with batched getMultipleAccounts calls"""
+        mints = list(dict.fromkeys(mints))
+        accounts = await get_multiple_accounts(self.rpc_pool, [bonding_curve_address(m) for m in mints])
+        pools = {}
+        for mint, data in zip(mints, accounts):
+            self._notify(mint, data)
+            pools[mint] = self._pool_for(data)
+            self._store(mint, pools[mint])
+        return pools
+
+
+# Process-wide resolver shared by /buy and the DCA scheduler
+pool_resolver = PoolResolver()
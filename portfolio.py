@@ -0,0 +1,368 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+from pools import MAX_ACCOUNTS_PER_REQUEST, bonding_curve_address, get_multiple_accounts
+from positions import curve_price
+
+logger = logging.getLogger(__name__)
+
+# How long fetched balances and prices are served without asking the RPC again
+PORTFOLIO_CACHE_TTL = float(os.getenv('PORTFOLIO_CACHE_TTL', 20))
+PORTFOLIO_CACHE_SIZE = int(os.getenv('PORTFOLIO_CACHE_SIZE', 10000))
+# SOL a buy needs on top of its amount for network fees and token account rent
+BALANCE_FEE_RESERVE = float(os.getenv('BALANCE_FEE_RESERVE', 0.003))
+# Seconds after a fill before the wallet is re-read, so the transaction has landed
+BALANCE_REFRESH_DELAY = float(os.getenv('BALANCE_REFRESH_DELAY', 5))
+
+# SPL Token and Token-2022
+TOKEN_PROGRAMS = ("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA", "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb")
+LAMPORTS_PER_SOL = 1_000_000_000
+
+
+class InsufficientFunds(Exception):
+    """The cached wallet balance cannot cover the trade"""
+
+
+class NothingToSell(InsufficientFunds):
+    """The wallet holds none of the token being sold"""
+
+
+class WalletBalances:
+    """SOL and token balances of one wallet as fetched, plus our own fills since.
+
+    ``pending`` holds mints whose token balance changed by an amount we
+    could not work out locally; their figures are refreshed on the next
+    fetch.
+    """
+
+    __slots__ = ("owner", "sol", "tokens", "fetched_at", "pending")
+
+    def __init__(self, owner: str, sol: float, tokens: Dict[str, float], fetched_at: float):
+        self.owner = owner
+        self.sol = sol
+        self.tokens = tokens
+        self.fetched_at = fetched_at
+        self.pending: Set[str] = set()
+
+
+class BalanceCache:
+    """Short-lived, process-wide cache of wallet balances and token prices.
+
+    A fetch reads the SOL balance of every requested wallet with one
+    batched ``getMultipleAccounts``, token holdings with one
+    ``getTokenAccountsByOwner`` per wallet, and prices with one batched
+    ``getMultipleAccounts`` over the bonding curves. Concurrent requests
+    for the same wallet share a fetch, and answers within ``ttl`` cost no
+    RPC at all. Our own fills are applied to the cached figures as they
+    happen, so back-to-back trades are checked against what is left.
+    Wallets are warmed when they are added and re-read ``refresh_delay``
+    seconds after each fill, so trading wallets stay cached.
+    """
+
+    def __init__(
+        self,
+        rpc_pool: Optional[RpcPool] = None,
+        ttl: float = PORTFOLIO_CACHE_TTL,
+        max_size: int = PORTFOLIO_CACHE_SIZE,
+        fee_reserve: float = BALANCE_FEE_RESERVE,
+        refresh_delay: float = BALANCE_REFRESH_DELAY
+    ):
+        self.rpc_pool = rpc_pool or default_rpc_pool
+        self.ttl = ttl
+        self.max_size = max_size
+        self.fee_reserve = fee_reserve
+        self.refresh_delay = refresh_delay
+        self._wallets: "OrderedDict[str, WalletBalances]" = OrderedDict()
+        self._prices: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Wallets that traded while a fetch for them was in flight
+        self._stale_fetches: Set[str] = set()
+        self._refreshes: Dict[str, asyncio.TimerHandle] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.rejected = 0
+        self.cold_checks = 0
+
+    def cached(self, owner: str) -> Optional[WalletBalances]:
+        """The wallet's balances if fetched within ``ttl``"""
+        entry = self._wallets.get(owner)
+        if entry is None or time.monotonic() - entry.fetched_at > self.ttl:
+            return None
+        self._wallets.move_to_end(owner)
+        return entry
+
+    def _store(self, entry: WalletBalances) -> None:
+        self._wallets[entry.owner] = entry
+        self._wallets.move_to_end(entry.owner)
+        while len(self._wallets) > self.max_size:
+            self._wallets.popitem(last=False)
+
+    def invalidate(self, owner: str) -> None:
+        self._wallets.pop(owner, None)
+
+    async def balances(self, owners: Sequence[str], refresh: bool = False) -> List[WalletBalances]:
+        """Balances of ``owners`` in order, fetching only those not cached"""
+        owners = list(owners)
+        found: Dict[str, WalletBalances] = {}
+        futures = []
+        missing = []
+        for owner in dict.fromkeys(owners):
+            entry = None if refresh else self.cached(owner)
+            if entry is not None:
+                self.hits += 1
+                found[owner] = entry
+            elif owner in self._inflight:
+                futures.append(self._inflight[owner])
+            else:
+                self.misses += 1
+                missing.append(owner)
+
+        if missing:
+            future = asyncio.ensure_future(self._fetch(missing))
+            for owner in missing:
+                self._inflight[owner] = future
+            future.add_done_callback(lambda _: self._clear_inflight(missing, future))
+            futures.append(future)
+        for fetched in await asyncio.gather(*(asyncio.shield(future) for future in dict.fromkeys(futures))):
+            for owner in owners:
+                if owner not in found and owner in fetched:
+                    found[owner] = fetched[owner]
+        return [found[owner] for owner in owners]
+
+    def warm(self, owners: Sequence[str], refresh: bool = False) -> None:
+        """Fetch ``owners`` in the background so the next check finds them cached"""
+        task = asyncio.ensure_future(self._warm(list(owners), refresh))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _warm(self, owners: List[str], refresh: bool) -> None:
+        try:
+            await self.balances(owners, refresh=refresh)
+        except Exception as e:
+            logger.warning(f"Background balance fetch for {len(owners)} wallet(s) failed: {e}")
+
+    def _schedule_refresh(self, owner: str) -> None:
+        """Re-read ``owner`` once its fill has landed; fills in between share the refresh"""
+        if owner in self._refreshes:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refreshes[owner] = loop.call_later(self.refresh_delay, self._refresh_due, owner)
+
+    def _refresh_due(self, owner: str) -> None:
+        del self._refreshes[owner]
+        self.warm([owner], refresh=True)
+
+    def _clear_inflight(self, owners: List[str], future: asyncio.Future) -> None:
+        for owner in owners:
+            if self._inflight.get(owner) is future:
+                del self._inflight[owner]
+
+    async def _fetch(self, owners: List[str]) -> Dict[str, WalletBalances]:
+        self.fetches += 1
+        self._stale_fetches.difference_update(owners)
+        lamports, holdings = await asyncio.gather(
+            self._lamports(owners),
+            asyncio.gather(*(self._token_balances(owner) for owner in owners))
+        )
+        now = time.monotonic()
+        fetched = {}
+        for owner, balance, tokens in zip(owners, lamports, holdings):
+            entry = fetched[owner] = WalletBalances(owner, balance / LAMPORTS_PER_SOL, tokens, now)
+            # A fill during the fetch may or may not be in these figures
+            if owner in self._stale_fetches:
+                self._stale_fetches.discard(owner)
+                self.invalidate(owner)
+            else:
+                self._store(entry)
+        return fetched
+
+    async def _lamports(self, owners: List[str]) -> List[int]:
+        async def fetch(chunk: List[str]) -> List[int]:
+            response = await self.rpc_pool.call(json.dumps({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "getMultipleAccounts",
+                "params": [chunk, {"encoding": "base64", "dataSlice": {"offset": 0, "length": 0}}]
+            }))
+            if "result" not in response:
+                raise Exception(f"Invalid RPC response: {response}")
+            return [account["lamports"] if account else 0 for account in response["result"]["value"]]
+
+        chunks = await asyncio.gather(*(
+            fetch(owners[i:i + MAX_ACCOUNTS_PER_REQUEST])
+            for i in range(0, len(owners), MAX_ACCOUNTS_PER_REQUEST)
+        ))
+        return [lamports for chunk in chunks for lamports in chunk]
+
+    async def _token_balances(self, owner: str) -> Dict[str, float]:
+        responses = await asyncio.gather(*(
+            self.rpc_pool.call(json.dumps({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "getTokenAccountsByOwner",
+                "params": [owner, {"programId": program}, {"encoding": "jsonParsed"}]
+            }))
+            for program in TOKEN_PROGRAMS
+        ))
+        tokens: Dict[str, float] = {}
+        for response in responses:
+            if "result" not in response:
+                raise Exception(f"Invalid RPC response: {response}")
+            for account in response["result"]["value"]:
+                info = account["account"]["data"]["parsed"]["info"]
+                amount = info["tokenAmount"]["uiAmount"] or 0.0
+                if amount > 0:
+                    tokens[info["mint"]] = tokens.get(info["mint"], 0.0) + amount
+        return tokens
+
+    def observe_curve(self, mint: str, data: Optional[bytes]) -> None:
+        """Cache the price from a bonding curve someone else already fetched"""
+        self._store_price(mint, curve_price(data), time.monotonic())
+
+    def _store_price(self, mint: str, price: float, now: float) -> None:
+        self._prices[mint] = (price, now)
+        self._prices.move_to_end(mint)
+        while len(self._prices) > self.max_size:
+            self._prices.popitem(last=False)
+
+    async def prices(self, mints: Sequence[str]) -> Dict[str, float]:
+        """SOL per token on each mint's bonding curve; NaN once it has migrated"""
+        now = time.monotonic()
+        stale = [
+            mint for mint in dict.fromkeys(mints)
+            if mint not in self._prices or now - self._prices[mint][1] > self.ttl
+        ]
+        if stale:
+            accounts = await get_multiple_accounts(self.rpc_pool, [bonding_curve_address(mint) for mint in stale])
+            for mint, data in zip(stale, accounts):
+                self._store_price(mint, curve_price(data), now)
+        return {mint: self._prices[mint][0] for mint in mints}
+
+    def apply_fill(
+        self,
+        owner: str,
+        action: str,
+        mint: str,
+        amount: Union[float, str],
+        denominated_in_sol: bool,
+        priority_fee: float = 0.0
+    ) -> None:
+        """Move the cached balances by a trade we just sent"""
+        if owner in self._inflight:
+            self._stale_fetches.add(owner)
+        self._schedule_refresh(owner)
+        entry = self._wallets.get(owner)
+        if entry is None:
+            return
+        entry.sol -= priority_fee
+        percent = isinstance(amount, str) and amount.endswith("%")
+        if action == "buy":
+            if denominated_in_sol:
+                entry.sol -= float(amount)
+            entry.pending.add(mint)
+            return
+
+        held = entry.tokens.get(mint, 0.0)
+        if percent:
+            entry.tokens[mint] = held * (1 - min(100.0, float(amount[:-1])) / 100)
+        elif not denominated_in_sol:
+            entry.tokens[mint] = max(0.0, held - float(amount))
+        else:
+            entry.sol += float(amount)
+            entry.pending.add(mint)
+        # Proceeds of token-denominated sells show up at the next fetch
+
+    def shortfall(
+        self,
+        entry: WalletBalances,
+        action: str,
+        mint: str,
+        amount: Union[float, str],
+        denominated_in_sol: bool,
+        priority_fee: float = 0.0
+    ) -> Optional[InsufficientFunds]:
+        """The error the trade would hit with ``entry``, or None if it can go ahead or we cannot tell"""
+        fees = priority_fee + self.fee_reserve
+        if action == "buy":
+            needed = fees + (float(amount) if denominated_in_sol and not isinstance(amount, str) else 0.0)
+            if entry.sol < needed:
+                return InsufficientFunds(f"Insufficient SOL: {entry.sol:.4f} available, {needed:.4f} needed")
+            return None
+
+        if mint in entry.pending:
+            return None
+        held = entry.tokens.get(mint, 0.0)
+        if held <= 0:
+            return NothingToSell(f"No {mint} tokens to sell")
+        if not denominated_in_sol and not isinstance(amount, str) and float(amount) > held * 1.000001:
+            return InsufficientFunds(f"Insufficient tokens: {held:g} available, {float(amount):g} requested")
+        if entry.sol < priority_fee:
+            return InsufficientFunds(f"Insufficient SOL for fees: {entry.sol:.4f} available")
+        return None
+
+    async def _fetch_one(self, owner: str, refresh: bool) -> Optional[WalletBalances]:
+        try:
+            return (await self.balances([owner], refresh=refresh))[0]
+        except Exception as e:
+            logger.warning(f"Balance fetch for {owner} failed, letting the trade through: {e}")
+            return None
+
+    async def check(
+        self,
+        owner: str,
+        action: str,
+        mint: str,
+        amount: Union[float, str],
+        denominated_in_sol: bool,
+        priority_fee: float = 0.0
+    ) -> None:
+        """Raise ``InsufficientFunds`` when the wallet obviously cannot cover the trade.
+
+        Fresh cached balances are used as they are. A wallet not cached
+        within ``ttl`` is fetched, so callers should run the check alongside
+        building the transaction. A cached shortfall is confirmed with a
+        fresh fetch before the trade is rejected, in case the wallet was
+        topped up since.
+        """
+        entry = self.cached(owner)
+        fetched = entry is None
+        if fetched:
+            self.cold_checks += 1
+            entry = await self._fetch_one(owner, refresh=False)
+            if entry is None:
+                return
+        if self.shortfall(entry, action, mint, amount, denominated_in_sol, priority_fee) is None:
+            return
+        if not fetched:
+            entry = await self._fetch_one(owner, refresh=True)
+            if entry is None:
+                return
+        error = self.shortfall(entry, action, mint, amount, denominated_in_sol, priority_fee)
+        if error is not None:
+            self.rejected += 1
+            raise error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "wallets": len(self._wallets),
+            "prices": len(self._prices),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "rejected": self.rejected,
+            "cold_checks": self.cold_checks,
+            "refreshes_pending": len(self._refreshes),
+        }
+
+
+balance_cache = BalanceCache()
@@ -0,0 +1,386 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+from pools import BONDING_CURVE_SIZE, bonding_curve_address, get_multiple_accounts, parse_bonding_curve
+
+logger = logging.getLogger(__name__)
+
+POSITION_POLL_INTERVAL = float(os.getenv('POSITION_POLL_INTERVAL', 2))
+# Wait this long before re-firing an exit whose sell failed
+POSITION_RETRY_DELAY = float(os.getenv('POSITION_RETRY_DELAY', 30))
+# Failed exit sells before the position is given up on
+POSITION_MAX_EXIT_ATTEMPTS = int(os.getenv('POSITION_MAX_EXIT_ATTEMPTS', 5))
+# Default rules for new positions, in percent (empty disables)
+POSITION_TAKE_PROFIT = os.getenv('POSITION_TAKE_PROFIT', '')
+POSITION_STOP_LOSS = os.getenv('POSITION_STOP_LOSS', '')
+POSITION_TRAILING_STOP = os.getenv('POSITION_TRAILING_STOP', '')
+
+EXIT_REASONS = ("take_profit", "stop_loss", "trailing_stop")
+
+
+def _fraction(percent: str) -> float:
+    return float(percent) / 100 if percent else math.nan
+
+
+def curve_price(data: Optional[bytes]) -> float:
+    """SOL per token on a live bonding curve, NaN when there is none or it completed"""
+    if data is None or len(data) < BONDING_CURVE_SIZE:
+        return math.nan
+    state = parse_bonding_curve(data)
+    if state.complete or not state.virtual_token_reserves:
+        return math.nan
+    # lamports per raw unit -> SOL per token (9 vs 6 decimals)
+    return state.virtual_sol_reserves / state.virtual_token_reserves / 1000
+
+
+class Position(NamedTuple):
+    user_id: int
+    chat_id: int
+    mint: str
+    cost: float                 # SOL spent, 0 when unknown (e.g. launch buys sized in tokens)
+    entry_price: Optional[float]
+    peak_price: Optional[float]
+    last_price: Optional[float]
+    take_profit: Optional[float]  # fractions, 0.5 = +50%
+    stop_loss: Optional[float]
+    trailing_stop: Optional[float]
+    opened_at: float = 0.0      # wall clock; tells a re-opened position apart from the old one
+
+    @property
+    def key(self) -> str:
+        return f"{self.user_id}_{self.mint}"
+
+
+ExitHandler = Callable[[Position, str], Awaitable[bool]]
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else float(value)
+
+
+class PositionBook:
+    """Open positions per (user, mint) with take-profit, stop-loss and trailing-stop exits.
+
+    Position data lives in parallel numpy arrays, one slot per position, and
+    every distinct mint gets an index into a price array. One evaluator task
+    fetches the bonding curves of all watched mints with batched
+    getMultipleAccounts calls each ``interval``. It then checks every rule in
+    a single vectorized pass, so the cost grows with distinct mints rather
+    than positions. Fills are priced at the next pass: the entry becomes the
+    SOL-weighted average of fill prices. Triggered positions are handed to
+    ``on_exit(position, reason)`` concurrently and are closed when it returns
+    True, or retried after ``retry_delay``. After ``max_attempts`` failed
+    exits the position is closed and ``on_abandon(position, reason)`` is
+    called once. Graduated mints have no curve price and their rules stay
+    idle until sold by hand.
+    """
+
+    _FIELDS = {
+        "_active": (False, bool),
+        "_mint": (0, np.int64),
+        "_cost": (0.0, np.float64),
+        "_pending_cost": (0.0, np.float64),
+        "_pending": (False, bool),
+        "_entry": (np.nan, np.float64),
+        "_peak": (np.nan, np.float64),
+        "_last": (np.nan, np.float64),
+        "_take_profit": (np.nan, np.float64),
+        "_stop_loss": (np.nan, np.float64),
+        "_trailing": (np.nan, np.float64),
+        "_retry_at": (0.0, np.float64),
+        "_attempts": (0, np.int64),
+        "_opened_at": (0.0, np.float64),
+    }
+
+    def __init__(
+        self,
+        on_exit: ExitHandler,
+        rpc_pool: Optional[RpcPool] = None,
+        interval: float = POSITION_POLL_INTERVAL,
+        retry_delay: float = POSITION_RETRY_DELAY,
+        on_save: Optional[Callable[[Position], None]] = None,
+        on_delete: Optional[Callable[[str], None]] = None,
+        capacity: int = 256,
+        max_attempts: int = POSITION_MAX_EXIT_ATTEMPTS,
+        on_abandon: Optional[Callable[[Position, str], Awaitable[None]]] = None
+    ):
+        self.on_exit = on_exit
+        self.max_attempts = max_attempts
+        self._on_abandon = on_abandon
+        self.rpc_pool = rpc_pool or default_rpc_pool
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self._on_save = on_save
+        self._on_delete = on_delete
+        self.defaults = (
+            _fraction(POSITION_TAKE_PROFIT), _fraction(POSITION_STOP_LOSS), _fraction(POSITION_TRAILING_STOP)
+        )
+
+        self._slots: Dict[str, int] = {}      # position key -> slot
+        self._free: List[int] = []
+        self._owners: List[Optional[Tuple[int, int, str]]] = []  # slot -> (user_id, chat_id, mint)
+        self._mint_ids: Dict[str, int] = {}
+        self._mints: List[str] = []
+        self._size = 0
+        self._allocate(capacity)
+
+        self._tasks = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self.exits = 0
+
+    def _allocate(self, capacity: int) -> None:
+        """Create or grow the per-slot arrays to ``capacity``"""
+        for name, (fill, dtype) in self._FIELDS.items():
+            grown = np.full(capacity, fill, dtype=dtype)
+            current = getattr(self, name, None)
+            if current is not None:
+                grown[:len(current)] = current
+            setattr(self, name, grown)
+        self._owners.extend([None] * (capacity - len(self._owners)))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot_for(self, user_id: int, chat_id: int, mint: str) -> int:
+        key = f"{user_id}_{mint}"
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self._active):
+                self._allocate(len(self._active) * 2)
+            slot = self._size
+            self._size += 1
+        mint_id = self._mint_ids.get(mint)
+        if mint_id is None:
+            mint_id = self._mint_ids[mint] = len(self._mints)
+            self._mints.append(mint)
+
+        self._slots[key] = slot
+        self._owners[slot] = (user_id, chat_id, mint)
+        self._mint[slot] = mint_id
+        self._active[slot] = True
+        self._cost[slot] = self._pending_cost[slot] = 0.0
+        self._pending[slot] = False
+        self._entry[slot] = self._peak[slot] = self._last[slot] = np.nan
+        self._take_profit[slot], self._stop_loss[slot], self._trailing[slot] = self.defaults
+        self._retry_at[slot] = 0.0
+        self._attempts[slot] = 0
+        self._opened_at[slot] = time.time()
+        return slot
+
+    def _position(self, slot: int) -> Position:
+        user_id, chat_id, mint = self._owners[slot]
+        return Position(
+            user_id, chat_id, mint, float(self._cost[slot] + self._pending_cost[slot]),
+            _optional(self._entry[slot]), _optional(self._peak[slot]), _optional(self._last[slot]),
+            _optional(self._take_profit[slot]), _optional(self._stop_loss[slot]), _optional(self._trailing[slot]),
+            float(self._opened_at[slot])
+        )
+
+    def _save(self, slot: int) -> None:
+        if self._on_save is not None:
+            try:
+                self._on_save(self._position(slot))
+            except Exception as e:
+                logger.error(f"Saving position failed: {e}")
+
+    def record_fill(self, user_id: int, chat_id: int, mint: str, sol: float = 0.0) -> Position:
+        """Add a buy to the user's position in ``mint``, opening it if needed"""
+        slot = self._slot_for(user_id, chat_id, mint)
+        self._pending_cost[slot] += sol
+        self._pending[slot] = True
+        self._save(slot)
+        return self._position(slot)
+
+    def set_rules(
+        self,
+        user_id: int,
+        mint: str,
+        take_profit: Optional[float] = None,
+        stop_loss: Optional[float] = None,
+        trailing_stop: Optional[float] = None
+    ) -> Optional[Position]:
+        """Update the exit rules of a position (fractions; 0 disables, None keeps)"""
+        slot = self._slots.get(f"{user_id}_{mint}")
+        if slot is None:
+            return None
+        for array, value in ((self._take_profit, take_profit), (self._stop_loss, stop_loss),
+                             (self._trailing, trailing_stop)):
+            if value is not None:
+                array[slot] = value if value > 0 else np.nan
+        self._retry_at[slot] = 0.0
+        self._attempts[slot] = 0
+        self._save(slot)
+        return self._position(slot)
+
+    def get(self, user_id: int, mint: str) -> Optional[Position]:
+        slot = self._slots.get(f"{user_id}_{mint}")
+        return None if slot is None else self._position(slot)
+
+    def for_user(self, user_id: int) -> List[Position]:
+        return [
+            self._position(slot) for slot in self._slots.values()
+            if self._owners[slot][0] == user_id
+        ]
+
+    def record_sale(self, user_id: int, mint: str, percent: float) -> Optional[Position]:
+        """Shrink the position by a sell of ``percent`` of it, closing it at 100"""
+        slot = self._slots.get(f"{user_id}_{mint}")
+        if slot is None:
+            return None
+        if percent >= 100:
+            self.close(user_id, mint)
+            return None
+        kept = 1 - max(0.0, percent) / 100
+        self._cost[slot] *= kept
+        self._pending_cost[slot] *= kept
+        self._save(slot)
+        return self._position(slot)
+
+    def close(self, user_id: int, mint: str) -> bool:
+        key = f"{user_id}_{mint}"
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return False
+        self._active[slot] = False
+        self._owners[slot] = None
+        self._free.append(slot)
+        if self._on_delete is not None:
+            try:
+                self._on_delete(key)
+            except Exception as e:
+                logger.error(f"Deleting position {key} failed: {e}")
+        return True
+
+    def restore(self, positions: Iterable[Position]) -> int:
+        """Load persisted positions without saving them again"""
+        restored = 0
+        for position in positions:
+            slot = self._slot_for(position.user_id, position.chat_id, position.mint)
+            self._cost[slot] = position.cost
+            for array, value in ((self._entry, position.entry_price), (self._peak, position.peak_price),
+                                 (self._take_profit, position.take_profit), (self._stop_loss, position.stop_loss),
+                                 (self._trailing, position.trailing_stop)):
+                array[slot] = np.nan if value is None else value
+            # No entry yet means the fills were never priced
+            self._pending[slot] = position.entry_price is None
+            restored += 1
+        return restored
+
+    async def evaluate(self) -> List[Tuple[Position, str]]:
+        """One pass: price every watched mint, apply fills, fire triggered exits"""
+        n = self._size
+        watched = np.unique(self._mint[:n][self._active[:n]])
+        if not len(watched):
+            return []
+        mints = [self._mints[mint_id] for mint_id in watched]
+        accounts = await get_multiple_accounts(self.rpc_pool, [bonding_curve_address(mint) for mint in mints])
+        mint_prices = np.full(len(self._mints), np.nan)
+        mint_prices[watched] = [curve_price(data) for data in accounts]
+
+        # Arrays may have grown during the fetch; only slots that existed before count
+        active = self._active[:n]
+        price = mint_prices[self._mint[:n]]
+        priced = active & ~np.isnan(price)
+        self._last[:n] = np.where(priced, price, self._last[:n])
+
+        # Price pending fills: SOL-weighted average entry, unknown sizes take the fill price
+        fills = priced & self._pending[:n]
+        if fills.any():
+            entry, cost, pending_cost = self._entry[:n], self._cost[:n], self._pending_cost[:n]
+            total = cost + pending_cost
+            weighted = (np.nan_to_num(entry) * cost + price * pending_cost) / np.where(total > 0, total, 1)
+            blended = np.where(np.isnan(entry) | (total <= 0), price, weighted)
+            self._entry[:n] = np.where(fills, blended, entry)
+            self._cost[:n] = np.where(fills, total, cost)
+            self._pending_cost[:n] = np.where(fills, 0.0, pending_cost)
+            self._pending[:n] &= ~fills
+
+        self._peak[:n] = np.where(priced, np.fmax(self._peak[:n], price), self._peak[:n])
+        entry, peak = self._entry[:n], self._peak[:n]
+        # NaN rules or prices compare False, so disabled rules never fire
+        with np.errstate(invalid="ignore"):
+            hits = np.stack([
+                price >= entry * (1 + self._take_profit[:n]),
+                price <= entry * (1 - self._stop_loss[:n]),
+                price <= peak * (1 - self._trailing[:n]),
+            ])
+        ready = priced & ~self._pending[:n] & (self._retry_at[:n] <= time.monotonic())
+        triggered = ready & hits.any(axis=0)
+        fired = []
+        for slot in np.flatnonzero(triggered):
+            reason = EXIT_REASONS[int(np.argmax(hits[:, slot]))]
+            # Inactive until the sell settles, so the next pass cannot fire it twice
+            self._active[slot] = False
+            position = self._position(slot)
+            fired.append((position, reason))
+            task = asyncio.create_task(self._exit(slot, position, reason))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        for slot in np.flatnonzero(fills):
+            self._save(slot)
+        return fired
+
+    async def _exit(self, slot: int, position: Position, reason: str) -> None:
+        try:
+            sold = await self.on_exit(position, reason)
+        except Exception as e:
+            logger.error(f"Exit of {position.key} failed: {e}")
+            sold = False
+        # Closed by the handler, or closed and re-opened while the sell ran
+        if self._slots.get(position.key) != slot or self._opened_at[slot] != position.opened_at:
+            return
+        if sold:
+            self.exits += 1
+            self.close(position.user_id, position.mint)
+            return
+        self._attempts[slot] += 1
+        if self._attempts[slot] < self.max_attempts:
+            self._retry_at[slot] = time.monotonic() + self.retry_delay
+            self._active[slot] = True
+            return
+        logger.warning(f"Giving up on the {reason} exit of {position.key} after {self._attempts[slot]} attempts")
+        self.close(position.user_id, position.mint)
+        if self._on_abandon is not None:
+            try:
+                await self._on_abandon(position, reason)
+            except Exception as e:
+                logger.error(f"Abandon hook failed for {position.key}: {e}")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.evaluate()
+            except Exception as e:
+                logger.warning(f"Position evaluation failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, *self._tasks, return_exceptions=True)
+            self._loop_task = None
+        # Keep trailing-stop peaks across restarts
+        for slot in self._slots.values():
+            self._save(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        n = self._size
+        return {
+            "positions": len(self._slots),
+            "watched_mints": int(len(np.unique(self._mint[:n][self._active[:n]]))),
+            "exits": self.exits,
+            "exiting": len(self._tasks),
+        }
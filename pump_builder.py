@@ -0,0 +1,446 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.system_program import ID as SYSTEM_PROGRAM
+from solders.transaction import VersionedTransaction
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+from pools import (
+    BONDING_CURVE_SIZE, PUMP_PROGRAM, BondingCurveState, bonding_curve_address, bonding_curve_creator,
+    get_multiple_accounts, parse_bonding_curve
+)
+
+logger = logging.getLogger(__name__)
+
+# Build pump.fun curve trades locally instead of through pumpportal trade-local
+LOCAL_TX_BUILDER = os.getenv('LOCAL_TX_BUILDER', '').lower() in ('1', 'true', 'yes')
+BLOCKHASH_REFRESH_INTERVAL = float(os.getenv('BLOCKHASH_REFRESH_INTERVAL', 5))
+# Blockhashes expire after ~60s; an older cached one is refetched before use
+BLOCKHASH_MAX_AGE = float(os.getenv('BLOCKHASH_MAX_AGE', 30))
+CURVE_REFRESH_INTERVAL = float(os.getenv('CURVE_REFRESH_INTERVAL', 1))
+# Reserves older than this are refetched before building
+CURVE_MAX_AGE = float(os.getenv('CURVE_MAX_AGE', 10))
+# Curves nobody traded for this long drop out of the background refresh
+CURVE_WATCH_TTL = float(os.getenv('CURVE_WATCH_TTL', 300))
+PUMP_FEE_BPS = int(os.getenv('PUMP_FEE_BPS', 100))
+PUMP_COMPUTE_UNITS = int(os.getenv('PUMP_COMPUTE_UNITS', 120000))
+PUMP_FEE_RECIPIENT = Pubkey.from_string(os.getenv('PUMP_FEE_RECIPIENT', "CebN5WGQ4jvEPvsVU4EoHEpgzq1VV7AbicfhtW4xC9iM"))
+PUMP_TOKEN_DECIMALS = 6
+# How often each action's local build is compared with trade-local's, in seconds
+LOCAL_TX_VERIFY_INTERVAL = float(os.getenv('LOCAL_TX_VERIFY_INTERVAL', 3600))
+
+TOKEN_PROGRAM = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+ASSOCIATED_TOKEN_PROGRAM = Pubkey.from_string("ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL")
+PUMP_GLOBAL = Pubkey.find_program_address([b"global"], PUMP_PROGRAM)[0]
+PUMP_EVENT_AUTHORITY = Pubkey.find_program_address([b"__event_authority"], PUMP_PROGRAM)[0]
+BUY_DISCRIMINATOR = bytes([102, 6, 61, 18, 1, 218, 235, 234])
+SELL_DISCRIMINATOR = bytes([51, 230, 133, 164, 1, 127, 131, 173])
+_AMOUNTS = struct.Struct("<QQ")
+LAMPORTS_PER_SOL = 1_000_000_000
+
+
+class UnsupportedTrade(Exception):
+    """The trade cannot be built locally; use pumpportal instead"""
+
+
+class AccountLayoutMismatch(UnsupportedTrade):
+    """Locally built instructions no longer match what pumpportal builds"""
+
+
+class Quote(NamedTuple):
+    token_amount: int  # raw token units bought or sold
+    sol_amount: int    # expected lamports paid (buy) or received (sell), fees included
+    sol_limit: int     # max_sol_cost (buy) or min_sol_output (sell) after slippage
+
+
+class CurveEntry(NamedTuple):
+    state: BondingCurveState
+    creator: Optional[str]
+    fetched_at: float
+
+
+@lru_cache(maxsize=4096)
+def associated_token_address(owner: str, mint: str) -> Pubkey:
+    address, _ = Pubkey.find_program_address(
+        [bytes(Pubkey.from_string(owner)), bytes(TOKEN_PROGRAM), bytes(Pubkey.from_string(mint))],
+        ASSOCIATED_TOKEN_PROGRAM
+    )
+    return address
+
+
+@lru_cache(maxsize=4096)
+def creator_vault_address(creator: str) -> Pubkey:
+    address, _ = Pubkey.find_program_address([b"creator-vault", bytes(Pubkey.from_string(creator))], PUMP_PROGRAM)
+    return address
+
+
+def _is_writable(message: Any, index: int) -> bool:
+    header = message.header
+    signers = header.num_required_signatures
+    if index < signers:
+        return index < signers - header.num_readonly_signed_accounts
+    return index < len(message.account_keys) - header.num_readonly_unsigned_accounts
+
+
+def pump_instruction(tx: VersionedTransaction) -> Tuple[bytes, List[Tuple[str, bool, bool]]]:
+    """Discriminator and ``(pubkey, signer, writable)`` accounts of the pump.fun instruction in ``tx``"""
+    message = tx.message
+    if getattr(message, "address_table_lookups", None):
+        raise UnsupportedTrade("Transaction loads accounts from lookup tables")
+    keys = message.account_keys
+    for instruction in message.instructions:
+        if keys[instruction.program_id_index] == PUMP_PROGRAM:
+            return bytes(instruction.data[:8]), [
+                (str(keys[index]), message.is_signer(index), _is_writable(message, index))
+                for index in instruction.accounts
+            ]
+    raise UnsupportedTrade("Transaction has no pump.fun instruction")
+
+
+def compare_pump_instructions(local: VersionedTransaction, reference: VersionedTransaction) -> List[str]:
+    """Differences between the pump.fun instructions of two transactions for the same trade"""
+    try:
+        local_data, local_accounts = pump_instruction(local)
+        reference_data, reference_accounts = pump_instruction(reference)
+    except UnsupportedTrade as e:
+        return [str(e)]
+    differences = []
+    if local_data != reference_data:
+        differences.append(f"discriminator {local_data.hex()} != {reference_data.hex()}")
+    if len(local_accounts) != len(reference_accounts):
+        differences.append(f"{len(local_accounts)} accounts != {len(reference_accounts)}")
+    for index, (ours, theirs) in enumerate(zip(local_accounts, reference_accounts)):
+        if ours != theirs:
+            differences.append(f"account {index}: {ours} != {theirs}")
+    return differences
+
+
+def _with_slippage(lamports: int, slippage: float) -> int:
+    return int(lamports * (100 + slippage) / 100)
+
+
+def quote_buy(state: BondingCurveState, lamports_in: int, slippage: float, fee_bps: int = PUMP_FEE_BPS) -> Quote:
+    """Tokens ``lamports_in`` (fee included) buys on the curve"""
+    spendable = lamports_in * 10_000 // (10_000 + fee_bps)
+    tokens = state.virtual_token_reserves * spendable // (state.virtual_sol_reserves + spendable)
+    tokens = min(tokens, state.real_token_reserves)
+    if tokens <= 0:
+        raise UnsupportedTrade("Buy amount too small for the curve")
+    return Quote(tokens, lamports_in, _with_slippage(lamports_in, slippage))
+
+
+def quote_buy_tokens(state: BondingCurveState, tokens: int, slippage: float, fee_bps: int = PUMP_FEE_BPS) -> Quote:
+    """Lamports needed to buy exactly ``tokens`` raw units"""
+    if not 0 < tokens < state.real_token_reserves:
+        raise UnsupportedTrade("Token amount exceeds what is left on the curve")
+    cost = state.virtual_sol_reserves * tokens // (state.virtual_token_reserves - tokens) + 1
+    cost += cost * fee_bps // 10_000
+    return Quote(tokens, cost, _with_slippage(cost, slippage))
+
+
+def quote_sell(state: BondingCurveState, tokens: int, slippage: float, fee_bps: int = PUMP_FEE_BPS) -> Quote:
+    """Lamports received for selling ``tokens`` raw units, after fees"""
+    if tokens <= 0:
+        raise UnsupportedTrade("Sell amount must be positive")
+    proceeds = state.virtual_sol_reserves * tokens // (state.virtual_token_reserves + tokens)
+    proceeds -= proceeds * fee_bps // 10_000
+    return Quote(tokens, proceeds, int(proceeds * max(0.0, 100 - slippage) / 100))
+
+
+class PumpTransactionBuilder:
+    """Builds and signs pump.fun bonding-curve buys and sells locally.
+
+    The recent blockhash and the reserves of every curve traded in the last
+    ``watch_ttl`` seconds are refreshed in the background (curves with one
+    batched getMultipleAccounts per tick), and PDAs and token accounts are
+    derived once per (user, mint). A warm trade needs no network call before
+    sendTransaction. ``build`` raises ``UnsupportedTrade`` for anything it
+    does not cover, like percentage sells, sells sized in SOL, curves
+    without a creator or Token-2022 mints, and callers fall back to
+    pumpportal. The token program owning each mint is looked up once.
+
+    The pump.fun account list is hard-coded, so ``verify`` compares a local
+    build account by account with trade-local's transaction for the same
+    trade, once per action every ``verify_interval`` seconds. After a
+    mismatch, e.g. following a program upgrade, every build raises
+    ``AccountLayoutMismatch`` until restart.
+    """
+
+    def __init__(
+        self,
+        rpc_pool: Optional[RpcPool] = None,
+        blockhash_interval: float = BLOCKHASH_REFRESH_INTERVAL,
+        blockhash_max_age: float = BLOCKHASH_MAX_AGE,
+        curve_interval: float = CURVE_REFRESH_INTERVAL,
+        curve_max_age: float = CURVE_MAX_AGE,
+        watch_ttl: float = CURVE_WATCH_TTL,
+        fee_bps: int = PUMP_FEE_BPS,
+        compute_units: int = PUMP_COMPUTE_UNITS,
+        verify_interval: float = LOCAL_TX_VERIFY_INTERVAL
+    ):
+        self.rpc_pool = rpc_pool or default_rpc_pool
+        self.blockhash_interval = blockhash_interval
+        self.blockhash_max_age = blockhash_max_age
+        self.curve_interval = curve_interval
+        self.curve_max_age = curve_max_age
+        self.watch_ttl = watch_ttl
+        self.fee_bps = fee_bps
+        self.compute_units = compute_units
+        self.verify_interval = verify_interval
+        self._verified_at: Dict[str, float] = {}
+        self._verifying: Dict[str, asyncio.Future] = {}
+        # Set once a local build disagrees with trade-local; local builds stop until restart
+        self.mismatch: Optional[str] = None
+        self._blockhash: Optional[Hash] = None
+        self._blockhash_at = 0.0
+        self._curves: Dict[str, CurveEntry] = {}
+        self._token_programs: Dict[str, str] = {}  # mint -> owning token program
+        self._last_used: Dict[str, float] = {}  # mint -> last trade time
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.built = 0
+
+    async def blockhash(self) -> Hash:
+        if self._blockhash is None or time.monotonic() - self._blockhash_at > self.blockhash_max_age:
+            await self.refresh_blockhash()
+        return self._blockhash
+
+    async def refresh_blockhash(self) -> None:
+        self._blockhash = await self.rpc_pool.latest_blockhash()
+        self._blockhash_at = time.monotonic()
+
+    async def refresh_curves(self, mints: Sequence[str]) -> None:
+        mints = list(dict.fromkeys(mints))
+        accounts = await get_multiple_accounts(self.rpc_pool, [bonding_curve_address(mint) for mint in mints])
+        for mint, data in zip(mints, accounts):
+            self.observe_curve(mint, data)
+
+    def observe_curve(self, mint: str, data: Optional[bytes]) -> None:
+        """Cache curve account data fetched elsewhere, e.g. by the pool resolver"""
+        if data is None or len(data) < BONDING_CURVE_SIZE:
+            self._curves.pop(mint, None)
+            return
+        self._curves[mint] = CurveEntry(parse_bonding_curve(data), bonding_curve_creator(data), time.monotonic())
+
+    async def curve(self, mint: str) -> CurveEntry:
+        self._last_used[mint] = time.monotonic()
+        entry = self._curves.get(mint)
+        if entry is None or time.monotonic() - entry.fetched_at > self.curve_max_age:
+            future = self._inflight.get(mint)
+            if future is None:
+                future = self._inflight[mint] = asyncio.ensure_future(self.refresh_curves([mint]))
+                future.add_done_callback(lambda _: self._inflight.pop(mint, None))
+            await asyncio.shield(future)
+            entry = self._curves.get(mint)
+        if entry is None:
+            raise UnsupportedTrade(f"No pump.fun bonding curve for {mint}")
+        if entry.state.complete:
+            raise UnsupportedTrade(f"Bonding curve of {mint} is complete")
+        return entry
+
+    async def token_program(self, mint: str) -> str:
+        """Program that owns ``mint``; it never changes, so it is fetched once"""
+        program = self._token_programs.get(mint)
+        if program is None:
+            response = await self.rpc_pool.call(json.dumps({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "getAccountInfo",
+                "params": [mint, {"encoding": "base64", "dataSlice": {"offset": 0, "length": 0}}]
+            }))
+            if "result" not in response:
+                raise Exception(f"Invalid RPC response: {response}")
+            account = response["result"]["value"]
+            if account is None:
+                raise UnsupportedTrade(f"Mint account {mint} not found")
+            program = self._token_programs[mint] = account["owner"]
+        return program
+
+    def quote(
+        self,
+        state: BondingCurveState,
+        action: str,
+        amount: Any,
+        denominated_in_sol: bool,
+        slippage: float
+    ) -> Quote:
+        if isinstance(amount, str) or isinstance(amount, bool):
+            raise UnsupportedTrade(f"Amount {amount!r} is not a plain number")
+        if action == "buy" and denominated_in_sol:
+            return quote_buy(state, int(amount * LAMPORTS_PER_SOL), slippage, self.fee_bps)
+        tokens = int(amount * 10 ** PUMP_TOKEN_DECIMALS)
+        if action == "buy":
+            return quote_buy_tokens(state, tokens, slippage, self.fee_bps)
+        if action == "sell" and not denominated_in_sol:
+            return quote_sell(state, tokens, slippage, self.fee_bps)
+        raise UnsupportedTrade(f"Cannot build {action} denominated in {'SOL' if denominated_in_sol else 'tokens'}")
+
+    def _instructions(
+        self,
+        user: Pubkey,
+        action: str,
+        mint: str,
+        creator: str,
+        quote: Quote,
+        priority_fee: float
+    ) -> List[Instruction]:
+        mint_key = Pubkey.from_string(mint)
+        curve = Pubkey.from_string(bonding_curve_address(mint))
+        curve_tokens = associated_token_address(str(curve), mint)
+        user_tokens = associated_token_address(str(user), mint)
+        creator_vault = creator_vault_address(creator)
+        micro_lamports = int(priority_fee * LAMPORTS_PER_SOL * 1_000_000 / self.compute_units)
+
+        instructions = [
+            set_compute_unit_limit(self.compute_units),
+            set_compute_unit_price(micro_lamports),
+        ]
+        head = [
+            AccountMeta(PUMP_GLOBAL, False, False),
+            AccountMeta(PUMP_FEE_RECIPIENT, False, True),
+            AccountMeta(mint_key, False, False),
+            AccountMeta(curve, False, True),
+            AccountMeta(curve_tokens, False, True),
+            AccountMeta(user_tokens, False, True),
+            AccountMeta(user, True, True),
+            AccountMeta(SYSTEM_PROGRAM, False, False),
+        ]
+        tail = [AccountMeta(PUMP_EVENT_AUTHORITY, False, False), AccountMeta(PUMP_PROGRAM, False, False)]
+        if action == "buy":
+            # Idempotent create of the user's token account
+            instructions.append(Instruction(ASSOCIATED_TOKEN_PROGRAM, bytes([1]), [
+                AccountMeta(user, True, True),
+                AccountMeta(user_tokens, False, True),
+                AccountMeta(user, False, False),
+                AccountMeta(mint_key, False, False),
+                AccountMeta(SYSTEM_PROGRAM, False, False),
+                AccountMeta(TOKEN_PROGRAM, False, False),
+            ]))
+            accounts = head + [AccountMeta(TOKEN_PROGRAM, False, False), AccountMeta(creator_vault, False, True)] + tail
+            data = BUY_DISCRIMINATOR + _AMOUNTS.pack(quote.token_amount, quote.sol_limit)
+        else:
+            accounts = head + [AccountMeta(creator_vault, False, True), AccountMeta(TOKEN_PROGRAM, False, False)] + tail
+            data = SELL_DISCRIMINATOR + _AMOUNTS.pack(quote.token_amount, quote.sol_limit)
+        instructions.append(Instruction(PUMP_PROGRAM, data, accounts))
+        return instructions
+
+    async def build(
+        self,
+        keypair: Keypair,
+        action: str,
+        mint: str,
+        amount: Any,
+        denominated_in_sol: bool,
+        slippage: float,
+        priority_fee: float
+    ) -> VersionedTransaction:
+        """Signed buy or sell on the curve of ``mint``, with the same arguments as trade-local"""
+        if self.mismatch is not None:
+            raise AccountLayoutMismatch(self.mismatch)
+        if action not in ("buy", "sell"):
+            raise UnsupportedTrade(f"Cannot build {action!r} locally")
+        blockhash, entry, token_program = await asyncio.gather(
+            self.blockhash(), self.curve(mint), self.token_program(mint)
+        )
+        # Token-2022 mints need other token accounts; only trade-local builds those
+        if token_program != str(TOKEN_PROGRAM):
+            raise UnsupportedTrade(f"{mint} is owned by {token_program}, not the SPL Token program")
+        if entry.creator is None:
+            raise UnsupportedTrade(f"Bonding curve of {mint} has no creator field")
+        quote = self.quote(entry.state, action, amount, denominated_in_sol, slippage)
+        user = keypair.pubkey()
+        message = MessageV0.try_compile(
+            user, self._instructions(user, action, mint, entry.creator, quote, priority_fee), [], blockhash
+        )
+        self.built += 1
+        logger.info(
+            f"Built {action} of {quote.token_amount} units on {mint} locally "
+            f"(expected {quote.sol_amount} lamports, limit {quote.sol_limit})"
+        )
+        return VersionedTransaction(message, [keypair])
+
+    async def verify(self, action: str, tx: VersionedTransaction, reference: Callable[[], Awaitable[bytes]]) -> None:
+        """Check a local build ``tx`` against trade-local unless ``action`` was verified recently.
+
+        ``reference`` fetches trade-local's unsigned transaction for the same
+        trade. Concurrent trades share one check; a failed fetch leaves the
+        action unverified so the next trade tries again.
+        """
+        if self.mismatch is not None:
+            raise AccountLayoutMismatch(self.mismatch)
+        verified_at = self._verified_at.get(action)
+        if verified_at is not None and time.monotonic() - verified_at < self.verify_interval:
+            return
+        future = self._verifying.get(action)
+        if future is None:
+            future = self._verifying[action] = asyncio.ensure_future(self._verify(action, tx, reference))
+            future.add_done_callback(lambda _: self._verifying.pop(action, None))
+        await asyncio.shield(future)
+
+    async def _verify(self, action: str, tx: VersionedTransaction, reference: Callable[[], Awaitable[bytes]]) -> None:
+        differences = compare_pump_instructions(tx, VersionedTransaction.from_bytes(await reference()))
+        if differences:
+            self.mismatch = f"Local {action} differs from trade-local: {'; '.join(differences)}"
+            logger.error(f"{self.mismatch}; building through pumpportal until restart")
+            raise AccountLayoutMismatch(self.mismatch)
+        self._verified_at[action] = time.monotonic()
+        logger.info(f"Local {action} layout matches trade-local")
+
+    async def _blockhash_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh_blockhash()
+            except Exception as e:
+                logger.warning(f"Blockhash refresh failed: {e}")
+            await asyncio.sleep(self.blockhash_interval)
+
+    async def _curve_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.curve_interval)
+            cutoff = time.monotonic() - self.watch_ttl
+            for mint in [mint for mint, used in self._last_used.items() if used < cutoff]:
+                del self._last_used[mint]
+                self._curves.pop(mint, None)
+                self._token_programs.pop(mint, None)
+            if not self._last_used:
+                continue
+            try:
+                await self.refresh_curves(list(self._last_used))
+            except Exception as e:
+                logger.warning(f"Bonding curve refresh failed: {e}")
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._blockhash_loop()),
+                asyncio.create_task(self._curve_loop()),
+            ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "built": self.built,
+            "verified": sorted(self._verified_at),
+            "mismatch": self.mismatch,
+            "watched_curves": len(self._last_used),
+            "blockhash_age_s": round(time.monotonic() - self._blockhash_at, 3) if self._blockhash else None,
+        }
+
+
+# Process-wide builder, only started when LOCAL_TX_BUILDER is set
+pump_builder = PumpTransactionBuilder()
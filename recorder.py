@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Append every webhook update to this file (line-delimited JSON) when set
+UPDATE_RECORD_PATH = os.getenv('UPDATE_RECORD_PATH')
+SCRUBBED = "<scrubbed>"
+
+# Base58 64-byte secret keys are 86-88 characters long
+_BASE58_SECRET = re.compile(r"[1-9A-HJ-NP-Za-km-z]{80,90}")
+# solana-keygen JSON keypairs: an array of 64 byte values
+_JSON_SECRET = re.compile(r"\[\s*\d{1,3}(?:\s*,\s*\d{1,3}){63}\s*\]")
+# Fields that carry free text typed by the user
+_TEXT_FIELDS = ("text", "caption", "data", "query")
+
+
+# Commands whose whole argument is a private key
+_KEY_COMMANDS = ("/setkey", "/addwallet")
+
+
+def scrub_text(text: str) -> str:
+    for command in _KEY_COMMANDS:
+        if text.startswith(command):
+            return f"{command} {SCRUBBED}" if text.strip() != command else text
+    return _JSON_SECRET.sub(SCRUBBED, _BASE58_SECRET.sub(SCRUBBED, text))
+
+
+def scrub_update(payload: Any) -> Any:
+    """Copy of an update payload with anything that looks like a private key removed"""
+    if isinstance(payload, dict):
+        return {
+            key: scrub_text(value) if key in _TEXT_FIELDS and isinstance(value, str) else scrub_update(value)
+            for key, value in payload.items()
+        }
+    if isinstance(payload, list):
+        return [scrub_update(item) for item in payload]
+    return payload
+
+
+class UpdateRecorder:
+    """Appends scrubbed webhook updates to a line-delimited JSON file.
+
+    Each line is ``{"t": seconds since recording started, "u": update}`` in
+    compact JSON. Writes go through a buffered file and are flushed every
+    ``flush_every`` updates and on ``close``.
+    """
+
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self.recorded = 0
+        self._started = time.monotonic()
+        self._file = open(path, "a", buffering=1 << 16, encoding="utf-8")
+
+    def record(self, payload: Dict[str, Any]) -> None:
+        try:
+            line = json.dumps(
+                {"t": round(time.monotonic() - self._started, 3), "u": scrub_update(payload)},
+                separators=(",", ":"), ensure_ascii=False
+            )
+            self._file.write(line + "\n")
+        except Exception as e:
+            logger.error(f"Update recording failed: {e}")
+            return
+        self.recorded += 1
+        if self.recorded % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Yield ``(offset_seconds, update)`` pairs from a recording"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry["t"], entry["u"]
+
+
+def open_recorder(path: Optional[str] = UPDATE_RECORD_PATH) -> Optional[UpdateRecorder]:
+    if not path:
+        return None
+    logger.info(f"Recording webhook updates to {path}")
+    return UpdateRecorder(path)
@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+
+from http_client import HTTP_TIMEOUT
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Resilience configuration for the pumpportal and pump.fun APIs (override via environment)
+API_RETRY_ATTEMPTS = int(os.getenv('API_RETRY_ATTEMPTS', 4))
+API_RETRY_BASE_DELAY = float(os.getenv('API_RETRY_BASE_DELAY', 0.25))
+API_RETRY_MAX_DELAY = float(os.getenv('API_RETRY_MAX_DELAY', 4))
+# Retries allowed per request on average, so failures cannot multiply the load
+API_RETRY_RATIO = float(os.getenv('API_RETRY_RATIO', 0.2))
+API_RETRY_RESERVE = float(os.getenv('API_RETRY_RESERVE', 10))
+API_BREAKER_THRESHOLD = int(os.getenv('API_BREAKER_THRESHOLD', 5))
+API_BREAKER_COOLDOWN = float(os.getenv('API_BREAKER_COOLDOWN', 15))
+# Requests per second across every guarded endpoint, halved on each 429
+API_RATE_LIMIT = float(os.getenv('API_RATE_LIMIT', 50))
+API_RATE_BURST = float(os.getenv('API_RATE_BURST', 100))
+# Deadline for calls whose caller does not pass one, in seconds
+API_DEADLINE = float(os.getenv('API_DEADLINE', 20))
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+API_RETRIES_TOTAL = Counter(
+    "api_retries_total", "Retried pumpportal/pump.fun calls by endpoint and reason", ["endpoint", "reason"]
+)
+API_REJECTED_TOTAL = Counter(
+    "api_rejected_total", "pumpportal/pump.fun calls given up without a response by endpoint and reason",
+    ["endpoint", "reason"]
+)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """The endpoint's breaker is open; the call was not attempted"""
+
+
+class DeadlineExceeded(Exception):
+    """The call could not be made or retried before its deadline"""
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one endpoint.
+
+    ``threshold`` consecutive failures open the breaker for ``cooldown``
+    seconds. After that a single probe goes through; its outcome closes the
+    breaker or opens it again.
+    """
+
+    def __init__(self, endpoint: str, threshold: int = API_BREAKER_THRESHOLD, cooldown: float = API_BREAKER_COOLDOWN):
+        self.endpoint = endpoint
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.open_until = 0.0
+        self.opened = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() >= self.open_until:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Give up a probe that ended without an outcome, e.g. cancelled"""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"API circuit closed for {self.endpoint}")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.opened += 1
+                logger.warning(f"API circuit open for {self.endpoint} ({self.failures} failures)")
+            self.state = "open"
+            self.open_until = time.monotonic() + self.cooldown
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "retry_in": round(max(0.0, self.open_until - time.monotonic()), 1) if self.state == "open" else 0,
+        }
+
+
+class RetryBudget:
+    """Token bucket of retries: every request earns ``ratio`` of one, up to ``reserve``"""
+
+    def __init__(self, ratio: float = API_RETRY_RATIO, reserve: float = API_RETRY_RESERVE):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+
+    def deposit(self) -> None:
+        self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RateLimiter:
+    """Process-wide token bucket with additive increase, multiplicative decrease.
+
+    Callers reserve a slot up front and sleep until it comes round, so
+    waiters are served in arrival order. ``throttle`` halves the rate after
+    a 429; each success then wins back a fiftieth of ``max_rate``.
+    """
+
+    def __init__(self, rate: float = API_RATE_LIMIT, burst: float = API_RATE_BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if now + wait > deadline:
+            raise DeadlineExceeded("Rate limit wait runs past the deadline")
+        self.tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self) -> None:
+        self._refill(time.monotonic())
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def recover(self) -> None:
+        if self.rate < self.max_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+
+def _retry_reason(error: Exception) -> Optional[str]:
+    """Why ``error`` is worth retrying, or None if it is not"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return str(error.status) if error.status in RETRYABLE_STATUSES else None
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return "connection"
+    return None
+
+
+def _retry_after(error: Exception) -> float:
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ApiGuard:
+    """Circuit breakers, retries and rate limiting shared by every pumpportal/pump.fun call.
+
+    ``call(endpoint, request, deadline)`` runs ``request(timeout)`` for one
+    endpoint URL. A 429, 5xx, timeout or dropped connection is retried
+    after a full-jitter exponential backoff (or the server's Retry-After),
+    but only while the retry budget allows and only if the next attempt can
+    start before ``deadline``. Each attempt's timeout is cut to the time
+    left. ``deadline`` is a ``time.monotonic()`` timestamp and defaults to
+    ``API_DEADLINE`` seconds from now. Only requests that are safe to repeat
+    are retried: trade-local only builds transactions, it never sends them.
+    Calls with side effects, like wallet creation or uploads, pass
+    ``idempotent=False`` and get one attempt behind the same breaker and
+    rate limit.
+    """
+
+    def __init__(
+        self,
+        attempts: int = API_RETRY_ATTEMPTS,
+        base_delay: float = API_RETRY_BASE_DELAY,
+        max_delay: float = API_RETRY_MAX_DELAY,
+        limiter: Optional[RateLimiter] = None,
+        budget: Optional[RetryBudget] = None,
+        breaker_threshold: int = API_BREAKER_THRESHOLD,
+        breaker_cooldown: float = API_BREAKER_COOLDOWN,
+        attempt_timeout: float = HTTP_TIMEOUT
+    ):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter or RateLimiter()
+        self.budget = budget or RetryBudget()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.attempt_timeout = attempt_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(
+                endpoint, self.breaker_threshold, self.breaker_cooldown
+            )
+        return breaker
+
+    def open_breakers(self) -> int:
+        return sum(1 for breaker in self._breakers.values() if breaker.state == "open")
+
+    def _reject(self, endpoint: str, reason: str, error: Exception) -> Exception:
+        API_REJECTED_TOTAL.labels(endpoint, reason).inc()
+        return error
+
+    async def call(
+        self,
+        endpoint: str,
+        request: Callable[[float], Awaitable[T]],
+        deadline: Optional[float] = None,
+        idempotent: bool = True
+    ) -> T:
+        if deadline is None:
+            deadline = time.monotonic() + API_DEADLINE
+        breaker = self.breaker(endpoint)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise self._reject(endpoint, "circuit_open", CircuitOpenError(
+                    f"{endpoint} is failing, retry in {breaker.stats()['retry_in']}s"
+                ))
+            try:
+                await self.limiter.acquire(deadline)
+            except DeadlineExceeded as e:
+                breaker.release()
+                raise self._reject(endpoint, "deadline", e)
+
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+            try:
+                result = await request(max(0.001, timeout))
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                reason = _retry_reason(e)
+                if reason is None:
+                    # The endpoint answered; the request itself was wrong
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if reason == "429":
+                    self.limiter.throttle()
+
+                attempt += 1
+                delay = max(
+                    random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)),
+                    _retry_after(e)
+                )
+                if not idempotent:
+                    raise self._reject(endpoint, "not_idempotent", e)
+                if attempt >= self.attempts:
+                    raise self._reject(endpoint, "attempts", e)
+                if breaker.state == "open":
+                    raise self._reject(endpoint, "circuit_open", e)
+                if time.monotonic() + delay >= deadline:
+                    raise self._reject(endpoint, "deadline", e)
+                if not self.budget.withdraw():
+                    raise self._reject(endpoint, "budget", e)
+                self.retries += 1
+                API_RETRIES_TOTAL.labels(endpoint, reason).inc()
+                logger.warning(f"{endpoint} failed ({reason}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            self.limiter.recover()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breakers": {endpoint: breaker.stats() for endpoint, breaker in self._breakers.items()},
+            "retries": self.retries,
+            "retry_tokens": round(self.budget.tokens, 2),
+            "rate_limit": round(self.limiter.rate, 2),
+        }
+
+
+# Process-wide guard shared by trades, token launches and wallet creation
+api_guard = ApiGuard()
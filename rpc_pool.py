@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from solders.hash import Hash
+from http_client import HttpTransport, transport as default_transport
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated list of Solana RPC endpoints
+RPC_ENDPOINTS = [
+    url.strip()
+    for url in os.getenv('RPC_ENDPOINTS', 'https://api.mainnet-beta.solana.com').split(',')
+    if url.strip()
+]
+# Number of fastest healthy nodes each sendTransaction is fanned out to
+RPC_FANOUT = int(os.getenv('RPC_FANOUT', 1))
+RPC_PROBE_INTERVAL = float(os.getenv('RPC_PROBE_INTERVAL', 15))
+RPC_TIMEOUT = float(os.getenv('RPC_TIMEOUT', 10))
+# Consecutive failures before a node is taken out of rotation, and for how long
+RPC_BREAKER_THRESHOLD = int(os.getenv('RPC_BREAKER_THRESHOLD', 3))
+RPC_BREAKER_COOLDOWN = float(os.getenv('RPC_BREAKER_COOLDOWN', 30))
+
+HEADERS = {"Content-Type": "application/json"}
+
+
+def _consume_result(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+class RpcEndpoint:
+    """Health and latency bookkeeping for one RPC node"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None  # EWMA, seconds
+        self.failures = 0
+        self.open_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.open_until <= now
+
+    def record_success(self, latency: float) -> None:
+        self.latency = latency if self.latency is None else 0.7 * self.latency + 0.3 * latency
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self, threshold: int, cooldown: float) -> None:
+        self.failures += 1
+        if self.failures >= threshold:
+            now = time.monotonic()
+            if self.available(now):
+                logger.warning(f"RPC circuit open for {self.url} ({self.failures} failures)")
+            self.open_until = now + cooldown
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "failures": self.failures,
+            "open": not self.available(time.monotonic()),
+        }
+
+
+class RpcPool:
+    """Latency-aware pool of Solana RPC nodes with failover and circuit breakers.
+
+    ``call`` tries nodes fastest-first until one answers. ``send_transaction``
+    fans the request out to the ``fanout`` fastest available nodes at once and
+    returns the first response carrying a ``result``. Nodes whose breaker is
+    open are only used when nothing else is left. A background task probes
+    every node with ``getHealth`` to keep the latency ranking fresh.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str] = RPC_ENDPOINTS,
+        transport: Optional[HttpTransport] = None,
+        fanout: int = RPC_FANOUT,
+        probe_interval: float = RPC_PROBE_INTERVAL,
+        timeout: float = RPC_TIMEOUT,
+        breaker_threshold: int = RPC_BREAKER_THRESHOLD,
+        breaker_cooldown: float = RPC_BREAKER_COOLDOWN
+    ):
+        if not urls:
+            raise ValueError("RpcPool needs at least one endpoint")
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+        self.transport = transport or default_transport
+        self.fanout = max(1, fanout)
+        self.probe_interval = probe_interval
+        self.timeout = timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def ranked(self) -> List[RpcEndpoint]:
+        """Available nodes by latency, followed by nodes with an open breaker"""
+        now = time.monotonic()
+        by_latency = sorted(
+            self.endpoints,
+            key=lambda e: e.latency if e.latency is not None else float("inf")
+        )
+        return (
+            [e for e in by_latency if e.available(now)]
+            + sorted((e for e in by_latency if not e.available(now)), key=lambda e: e.open_until)
+        )
+
+    async def _post(self, endpoint: RpcEndpoint, payload: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            response = await self.transport.post_json(
+                endpoint.url, data=payload, headers=HEADERS, timeout=self.timeout
+            )
+        except Exception:
+            endpoint.record_failure(self.breaker_threshold, self.breaker_cooldown)
+            raise
+        endpoint.record_success(time.perf_counter() - started)
+        return response
+
+    async def call(self, payload: str) -> Dict[str, Any]:
+        """Send a JSON-RPC request, failing over to the next node on errors"""
+        last_error: Optional[Exception] = None
+        for endpoint in self.ranked():
+            try:
+                return await self._post(endpoint, payload)
+            except Exception as e:
+                logger.warning(f"RPC {endpoint.url} failed: {e}")
+                last_error = e
+        raise last_error
+
+    async def latest_blockhash(self) -> Hash:
+        response = await self.call(json.dumps({
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getLatestBlockhash",
+            "params": [{"commitment": "confirmed"}]
+        }))
+        if "result" not in response:
+            raise Exception(f"Invalid RPC response: {response}")
+        return Hash.from_string(response["result"]["value"]["blockhash"])
+
+    async def send_transaction(self, payload: str) -> Dict[str, Any]:
+        """Fan a sendTransaction out to the fastest nodes; first success wins"""
+        ranked = self.ranked()
+        now = time.monotonic()
+        targets = [e for e in ranked if e.available(now)][:self.fanout] or ranked[:1]
+        if len(targets) == 1:
+            return await self.call(payload)
+
+        pending = {
+            asyncio.ensure_future(self._post(endpoint, payload))
+            for endpoint in targets
+        }
+        first_response: Optional[Dict[str, Any]] = None
+        last_error: Optional[Exception] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    response = task.result()
+                    if "result" in response:
+                        return response
+                    first_response = first_response or response
+        finally:
+            # Losers keep running: the extra copies help the transaction
+            # propagate and their latency still feeds the ranking
+            for task in pending:
+                task.add_done_callback(_consume_result)
+
+        if first_response is not None:
+            return first_response
+        # Every fanned-out node failed; fall back to the rest of the pool
+        for endpoint in ranked[len(targets):]:
+            try:
+                return await self._post(endpoint, payload)
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    async def probe(self) -> None:
+        payload = '{"jsonrpc":"2.0","id":1,"method":"getHealth"}'
+
+        async def probe_one(endpoint: RpcEndpoint):
+            try:
+                await self._post(endpoint, payload)
+            except Exception as e:
+                logger.debug(f"RPC probe {endpoint.url} failed: {e}")
+
+        await asyncio.gather(*(probe_one(e) for e in self.endpoints))
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self) -> None:
+        """Start background health probes (no-op for a single endpoint)"""
+        if self._probe_task is None and len(self.endpoints) > 1:
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+# Process-wide pool built from RPC_ENDPOINTS
+rpc_pool = RpcPool()
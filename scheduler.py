@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scheduler configuration (override via environment)
+DCA_INTERVAL = float(os.getenv('DCA_INTERVAL', 3600))
+DCA_JITTER = float(os.getenv('DCA_JITTER', 30))
+DCA_WORKERS = int(os.getenv('DCA_WORKERS', 16))
+DCA_RETRY_DELAY = float(os.getenv('DCA_RETRY_DELAY', 60))
+# What to do with runs missed while the bot was down: "once" runs a single
+# catch-up buy immediately, "skip" waits for the next regular slot
+DCA_CATCHUP = os.getenv('DCA_CATCHUP', 'once')
+
+
+class Schedule:
+    """One recurring buy. ``next_run`` is a wall-clock timestamp."""
+
+    __slots__ = (
+        "user_id", "chat_id", "token_address", "amount", "pool",
+        "interval", "jitter", "anchor", "next_run", "cancelled"
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        chat_id: int,
+        token_address: str,
+        amount: float,
+        pool: str,
+        interval: float = DCA_INTERVAL,
+        jitter: float = DCA_JITTER,
+        next_run: Optional[float] = None
+    ):
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.token_address = token_address
+        self.amount = amount
+        self.pool = pool
+        self.interval = interval
+        self.jitter = jitter
+        # ``anchor`` advances by exactly ``interval`` so jitter never accumulates
+        self.anchor = next_run if next_run is not None else time.time()
+        self.next_run = self.anchor
+        self.cancelled = False
+
+    @property
+    def key(self) -> str:
+        return f"{self.user_id}_{self.token_address}"
+
+    def advance(self, now: float) -> None:
+        """Move to the next slot after ``now``, skipping any that were missed"""
+        self.anchor += self.interval
+        if self.anchor <= now:
+            missed = int((now - self.anchor) // self.interval) + 1
+            self.anchor += missed * self.interval
+        self.next_run = self.anchor + random.uniform(0, self.jitter)
+
+    def catch_up(self, now: float, policy: str = DCA_CATCHUP) -> None:
+        """Apply the missed-run policy to a schedule restored after downtime"""
+        if self.next_run > now:
+            return
+        if policy == "skip":
+            self.advance(now)
+        else:
+            self.next_run = now
+
+
+class DcaScheduler:
+    """All DCA schedules in one min-heap, driven by a single timer task.
+
+    The timer sleeps until the earliest ``next_run`` (or until a new schedule
+    is added ahead of it), hands every due schedule to a bounded worker pool
+    and never runs the same schedule twice at once: a schedule is pushed back
+    onto the heap only after its run finishes. Removed or replaced schedules
+    are dropped lazily when they reach the top of the heap.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Schedule], Awaitable[bool]],
+        workers: int = DCA_WORKERS,
+        retry_delay: float = DCA_RETRY_DELAY,
+        on_reschedule: Optional[Callable[[Schedule], None]] = None
+    ):
+        self._run = run
+        self._on_reschedule = on_reschedule
+        self.worker_count = workers
+        self.retry_delay = retry_delay
+        self._schedules: Dict[str, Schedule] = {}
+        self._heap: List[Tuple[float, int, Schedule]] = []
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._schedules
+
+    def get(self, key: str) -> Optional[Schedule]:
+        return self._schedules.get(key)
+
+    def schedules(self) -> List[Schedule]:
+        return list(self._schedules.values())
+
+    def add(self, schedule: Schedule) -> None:
+        """Add a schedule, replacing any existing one for the same user and token"""
+        self.remove(schedule.key)
+        self._schedules[schedule.key] = schedule
+        self._push(schedule)
+
+    def remove(self, key: str) -> bool:
+        schedule = self._schedules.pop(key, None)
+        if schedule is None:
+            return False
+        schedule.cancelled = True
+        # Rebuild once stale entries dominate so churn cannot grow the heap
+        if len(self._heap) > 2 * len(self._schedules) + 64:
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+        return True
+
+    def _push(self, schedule: Schedule) -> None:
+        heapq.heappush(self._heap, (schedule.next_run, next(self._seq), schedule))
+        if self._wakeup is not None and self._heap[0][2] is schedule:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Start the timer and worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.worker_count * 4)
+        self._tasks.append(asyncio.create_task(self._timer()))
+        for _ in range(self.worker_count):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _timer(self) -> None:
+        while True:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, schedule = heapq.heappop(self._heap)
+            if not schedule.cancelled:
+                await self._queue.put(schedule)
+
+    async def _worker(self) -> None:
+        while True:
+            schedule = await self._queue.get()
+            try:
+                ok = await self._run(schedule)
+            except Exception as e:
+                logger.error(f"Schedule error for {schedule.key}: {e}")
+                ok = False
+            finally:
+                self._queue.task_done()
+
+            if schedule.cancelled:
+                continue
+            now = time.time()
+            # Spread retries so schedules that failed together do not retry together
+            delay = self.retry_delay * random.uniform(0.5, 1.5)
+            if ok or now + delay >= schedule.anchor + schedule.interval:
+                schedule.advance(now)
+            else:
+                schedule.next_run = now + delay
+            self._push(schedule)
+            if self._on_reschedule is not None:
+                try:
+                    self._on_reschedule(schedule)
+                except Exception as e:
+                    logger.error(f"Reschedule hook failed for {schedule.key}: {e}")
@@ -0,0 +1,336 @@
+import logging
+import os
+import sqlite3
+from typing import Dict, Iterator, List, MutableMapping, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from scheduler import Schedule
+from positions import Position
+from twap import ParentOrder
+
+logger = logging.getLogger(__name__)
+
+# SQLite file; point it at a persistent disk in production (render.yaml mounts one at /var/data)
+STORE_PATH = os.getenv('STORE_PATH', 'bot.db')
+# Fernet key used to encrypt private keys at rest (Fernet.generate_key())
+WALLET_ENCRYPTION_KEY = os.getenv('WALLET_ENCRYPTION_KEY')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallets (
+    user_id INTEGER PRIMARY KEY,
+    private_key BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fanout_wallets (
+    user_id INTEGER NOT NULL,
+    public_key TEXT NOT NULL,
+    private_key BLOB NOT NULL,
+    PRIMARY KEY (user_id, public_key)
+);
+CREATE TABLE IF NOT EXISTS positions (
+    key TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    mint TEXT NOT NULL,
+    cost REAL NOT NULL,
+    entry_price REAL,
+    peak_price REAL,
+    take_profit REAL,
+    stop_loss REAL,
+    trailing_stop REAL
+);
+CREATE TABLE IF NOT EXISTS twap_orders (
+    key TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    mint TEXT NOT NULL,
+    total REAL NOT NULL,
+    duration REAL NOT NULL,
+    slices INTEGER NOT NULL,
+    max_slippage REAL NOT NULL,
+    started_at REAL NOT NULL,
+    next_run REAL NOT NULL,
+    filled REAL NOT NULL,
+    tokens REAL NOT NULL,
+    children INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    arrival_price REAL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    key TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    token_address TEXT NOT NULL,
+    amount REAL NOT NULL,
+    pool TEXT NOT NULL,
+    interval REAL NOT NULL,
+    jitter REAL NOT NULL,
+    next_run REAL NOT NULL
+);
+"""
+
+
+class Store:
+    """SQLite (WAL) persistence for wallets, fan-out wallets, DCA schedules, positions and TWAP orders.
+
+    Private keys are encrypted with ``WALLET_ENCRYPTION_KEY``. Without it,
+    wallets are kept in memory only and a warning is logged. DCA schedules
+    and TWAP orders are then not persisted either, since they could not
+    trade after a restart.
+    """
+
+    def __init__(self, path: str = STORE_PATH, encryption_key: Optional[str] = WALLET_ENCRYPTION_KEY):
+        self.path = path
+        self.fernet = Fernet(encryption_key) if encryption_key else None
+        if self.fernet is None:
+            logger.warning("WALLET_ENCRYPTION_KEY is not set, private keys will not be persisted")
+
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def persists_wallets(self) -> bool:
+        return self.fernet is not None
+
+    def load_wallet(self, user_id: int) -> Optional[str]:
+        if self.fernet is None:
+            return None
+        row = self.conn.execute(
+            "SELECT private_key FROM wallets WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return self.fernet.decrypt(row[0]).decode()
+        except InvalidToken:
+            logger.error(f"Stored key for user {user_id} cannot be decrypted with the current key")
+            return None
+
+    def save_wallet(self, user_id: int, private_key: str) -> None:
+        if self.fernet is None:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO wallets (user_id, private_key) VALUES (?, ?)",
+            (user_id, self.fernet.encrypt(private_key.encode()))
+        )
+
+    def delete_wallet(self, user_id: int) -> None:
+        self.conn.execute("DELETE FROM wallets WHERE user_id = ?", (user_id,))
+
+    def load_fanout_wallets(self, user_id: int) -> List[str]:
+        if self.fernet is None:
+            return []
+        rows = self.conn.execute(
+            "SELECT public_key, private_key FROM fanout_wallets WHERE user_id = ? ORDER BY rowid", (user_id,)
+        ).fetchall()
+        private_keys = []
+        for public_key, encrypted in rows:
+            try:
+                private_keys.append(self.fernet.decrypt(encrypted).decode())
+            except InvalidToken:
+                logger.error(f"Stored fan-out wallet {public_key} of user {user_id} cannot be decrypted")
+        return private_keys
+
+    def add_fanout_wallet(self, user_id: int, public_key: str, private_key: str) -> None:
+        if self.fernet is None:
+            return
+        self.conn.execute(
+            "INSERT OR IGNORE INTO fanout_wallets (user_id, public_key, private_key) VALUES (?, ?, ?)",
+            (user_id, public_key, self.fernet.encrypt(private_key.encode()))
+        )
+
+    def delete_fanout_wallets(self, user_id: int) -> None:
+        self.conn.execute("DELETE FROM fanout_wallets WHERE user_id = ?", (user_id,))
+
+    def save_schedule(self, schedule: Schedule) -> None:
+        if self.fernet is None:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO schedules "
+            "(key, user_id, chat_id, token_address, amount, pool, interval, jitter, next_run) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                schedule.key, schedule.user_id, schedule.chat_id, schedule.token_address,
+                schedule.amount, schedule.pool, schedule.interval, schedule.jitter, schedule.next_run
+            )
+        )
+
+    def update_next_run(self, schedule: Schedule) -> None:
+        self.conn.execute(
+            "UPDATE schedules SET next_run = ? WHERE key = ?", (schedule.next_run, schedule.key)
+        )
+
+    def delete_schedule(self, key: str) -> bool:
+        return self.conn.execute("DELETE FROM schedules WHERE key = ?", (key,)).rowcount > 0
+
+    def iter_schedules(self, batch_size: int = 500) -> Iterator[List[Schedule]]:
+        """Stream stored schedules in batches ordered by next run"""
+        cursor = self.conn.execute(
+            "SELECT user_id, chat_id, token_address, amount, pool, interval, jitter, next_run "
+            "FROM schedules ORDER BY next_run"
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [
+                Schedule(
+                    user_id=user_id, chat_id=chat_id, token_address=token_address,
+                    amount=amount, pool=pool, interval=interval, jitter=jitter, next_run=next_run
+                )
+                for user_id, chat_id, token_address, amount, pool, interval, jitter, next_run in rows
+            ]
+
+    def save_position(self, position: Position) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO positions "
+            "(key, user_id, chat_id, mint, cost, entry_price, peak_price, take_profit, stop_loss, trailing_stop) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                position.key, position.user_id, position.chat_id, position.mint, position.cost,
+                position.entry_price, position.peak_price,
+                position.take_profit, position.stop_loss, position.trailing_stop
+            )
+        )
+
+    def delete_position(self, key: str) -> None:
+        self.conn.execute("DELETE FROM positions WHERE key = ?", (key,))
+
+    def iter_positions(self, batch_size: int = 500) -> Iterator[List[Position]]:
+        """Stream stored positions in batches"""
+        cursor = self.conn.execute(
+            "SELECT user_id, chat_id, mint, cost, entry_price, peak_price, take_profit, stop_loss, trailing_stop "
+            "FROM positions"
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [
+                Position(
+                    user_id=user_id, chat_id=chat_id, mint=mint, cost=cost,
+                    entry_price=entry_price, peak_price=peak_price, last_price=None,
+                    take_profit=take_profit, stop_loss=stop_loss, trailing_stop=trailing_stop
+                )
+                for user_id, chat_id, mint, cost, entry_price, peak_price, take_profit, stop_loss, trailing_stop in rows
+            ]
+
+    def save_twap_order(self, order: ParentOrder) -> None:
+        if self.fernet is None:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO twap_orders "
+            "(key, user_id, chat_id, mint, total, duration, slices, max_slippage, started_at, next_run, "
+            "filled, tokens, children, failures, arrival_price, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                order.key, order.user_id, order.chat_id, order.mint, order.total, order.duration,
+                order.slices, order.max_slippage, order.started_at, order.next_run, order.filled,
+                order.tokens, order.children, order.failures, order.arrival_price, order.status
+            )
+        )
+
+    def iter_twap_orders(self, batch_size: int = 500) -> Iterator[List[ParentOrder]]:
+        """Stream TWAP orders that were still running"""
+        cursor = self.conn.execute(
+            "SELECT user_id, chat_id, mint, total, duration, slices, max_slippage, started_at, next_run, "
+            "filled, tokens, children, failures, arrival_price FROM twap_orders WHERE status = 'active'"
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            orders = []
+            for (user_id, chat_id, mint, total, duration, slices, max_slippage, started_at, next_run,
+                 filled, tokens, children, failures, arrival_price) in rows:
+                order = ParentOrder(user_id, chat_id, mint, total, duration, slices, max_slippage, started_at)
+                order.next_run = next_run
+                order.filled, order.tokens = filled, tokens
+                order.children, order.failures = children, failures
+                order.arrival_price = arrival_price
+                orders.append(order)
+            yield orders
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class PersistentWallets(MutableMapping):
+    """``user_id -> private_key`` mapping that loads from the store on first use.
+
+    Nothing is read at startup; a user's key is decrypted the first time it is
+    looked up and writes go straight through to the store.
+    """
+
+    def __init__(self, store: Store):
+        self.store = store
+        self._cache = {}
+
+    def __getitem__(self, user_id: int) -> str:
+        if user_id in self._cache:
+            return self._cache[user_id]
+        private_key = self.store.load_wallet(user_id)
+        if private_key is None:
+            raise KeyError(user_id)
+        self._cache[user_id] = private_key
+        return private_key
+
+    def __contains__(self, user_id) -> bool:
+        try:
+            self[user_id]
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, user_id: int, private_key: str) -> None:
+        self.store.save_wallet(user_id, private_key)
+        self._cache[user_id] = private_key
+
+    def __delitem__(self, user_id: int) -> None:
+        if user_id not in self:
+            raise KeyError(user_id)
+        self.store.delete_wallet(user_id)
+        del self._cache[user_id]
+
+    def __iter__(self):
+        return iter(self._cache)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class FanoutWallets:
+    """Extra wallets per user that ``/buy ... all`` spreads a buy across.
+
+    Loaded from the store on first use like ``PersistentWallets``; keys are
+    kept in the order they were added.
+    """
+
+    def __init__(self, store: Store):
+        self.store = store
+        self._cache: Dict[int, List[str]] = {}
+
+    def get(self, user_id: int) -> List[str]:
+        private_keys = self._cache.get(user_id)
+        if private_keys is None:
+            private_keys = self._cache[user_id] = self.store.load_fanout_wallets(user_id)
+        return list(private_keys)
+
+    def add(self, user_id: int, public_key: str, private_key: str) -> bool:
+        """Add a wallet; False if the user already has it"""
+        private_keys = self._cache.get(user_id)
+        if private_keys is None:
+            private_keys = self._cache[user_id] = self.store.load_fanout_wallets(user_id)
+        if private_key in private_keys:
+            return False
+        self.store.add_fanout_wallet(user_id, public_key, private_key)
+        private_keys.append(private_key)
+        return True
+
+    def clear(self, user_id: int) -> int:
+        """Forget every fan-out wallet of the user, returning how many there were"""
+        removed = len(self.get(user_id))
+        self.store.delete_fanout_wallets(user_id)
+        self._cache.pop(user_id, None)
+        return removed
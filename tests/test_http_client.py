@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stubs import StubServer
+from http_client import HttpTransport
+
+
+@pytest.fixture
+def slow_api():
+    api = StubServer(latency=3.0).start_in_thread()
+    yield api
+    api.stop_thread()
+
+
+def test_call_without_timeout_uses_the_session_timeout(slow_api):
+    async def call():
+        transport = HttpTransport(timeout=0.5)
+        started = time.monotonic()
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await transport.post_json(f"{slow_api.base_url}/rpc", json={"method": "getHealth"})
+        finally:
+            await transport.close()
+        return time.monotonic() - started
+
+    assert asyncio.run(call()) < 2.0
+
+
+def test_explicit_timeout_overrides_the_session_timeout(slow_api):
+    async def call():
+        transport = HttpTransport(timeout=30)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await transport.post_bytes(f"{slow_api.base_url}/rpc", json={"method": "getHealth"}, timeout=0.3)
+        finally:
+            await transport.close()
+
+    asyncio.run(call())
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from solders.keypair import Keypair
+
+from benchmarks.stubs import StubServer
+from http_client import HttpTransport
+from portfolio import BalanceCache, InsufficientFunds
+from rpc_pool import RpcPool
+from trader import SolanaTrader, TradeConfig
+
+MINT = "So11111111111111111111111111111111111111112"
+
+
+@pytest.fixture
+def api():
+    api = StubServer(latency=0.01).start_in_thread()
+    yield api
+    api.stop_thread()
+
+
+def run_with_cache(api, test):
+    async def run():
+        transport = HttpTransport()
+        rpc_pool = RpcPool([f"{api.base_url}/rpc"], transport=transport)
+        try:
+            return await test(rpc_pool, BalanceCache(rpc_pool), transport)
+        finally:
+            await transport.close()
+
+    return asyncio.run(run())
+
+
+def test_cold_check_fetches_and_rejects_an_unfunded_wallet(api):
+    owner = str(Keypair().pubkey())
+    api.add_wallet(owner, 0.01)
+
+    async def test(rpc_pool, cache, transport):
+        assert cache.cached(owner) is None
+        with pytest.raises(InsufficientFunds):
+            await cache.check(owner, "buy", MINT, 0.5, True)
+        await cache.check(owner, "buy", MINT, 0.001, True)
+        return cache.stats()
+
+    stats = run_with_cache(api, test)
+    assert stats["cold_checks"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_cold_cache_trade_is_rejected_before_sending(api):
+    keypair = Keypair()
+    api.add_wallet(str(keypair.pubkey()), 0.01)
+
+    async def test(rpc_pool, cache, transport):
+        trader = SolanaTrader(
+            TradeConfig(str(keypair), api_endpoint=f"{api.base_url}/api/trade-local", rpc_pool=rpc_pool),
+            transport=transport,
+            balances=cache
+        )
+        return await trader.execute_trade("buy", MINT, amount=0.5, pool="pump")
+
+    result = run_with_cache(api, test)
+    assert not result["success"]
+    assert result["error_class"] == "InsufficientFunds"
+    assert not api.landed
+
+
+def test_cold_cache_trade_goes_through_for_a_funded_wallet(api):
+    keypair = Keypair()
+    api.add_wallet(str(keypair.pubkey()), 10)
+
+    async def test(rpc_pool, cache, transport):
+        trader = SolanaTrader(
+            TradeConfig(str(keypair), api_endpoint=f"{api.base_url}/api/trade-local", rpc_pool=rpc_pool),
+            transport=transport,
+            balances=cache
+        )
+        return await trader.execute_trade("buy", MINT, amount=0.5, pool="pump")
+
+    assert run_with_cache(api, test)["success"]
+    assert len(api.landed) == 1
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from solders.keypair import Keypair
+
+from benchmarks.stubs import StubServer
+from http_client import HttpTransport
+from portfolio import BalanceCache
+from pump_builder import TOKEN_PROGRAM, PumpTransactionBuilder, UnsupportedTrade, pump_instruction
+from rpc_pool import RpcPool
+from trader import SolanaTrader, TradeConfig
+
+TOKEN_2022_PROGRAM = "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb"
+
+
+@pytest.fixture
+def api():
+    api = StubServer(latency=0.01).start_in_thread()
+    yield api
+    api.stop_thread()
+
+
+def run_with_pool(api, test):
+    async def run():
+        transport = HttpTransport()
+        try:
+            return await test(RpcPool([f"{api.base_url}/rpc"], transport=transport), transport)
+        finally:
+            await transport.close()
+
+    return asyncio.run(run())
+
+
+def test_spl_token_mint_builds_locally(api):
+    mint = str(Keypair().pubkey())
+    api.add_bonding_curve(mint)
+
+    async def test(rpc_pool, transport):
+        return await PumpTransactionBuilder(rpc_pool).build(Keypair(), "buy", mint, 0.01, True, 10, 0.0001)
+
+    _, accounts = pump_instruction(run_with_pool(api, test))
+    assert (str(TOKEN_PROGRAM), False, False) in accounts
+
+
+def test_token_2022_mint_is_not_built_locally(api):
+    mint = str(Keypair().pubkey())
+    api.add_bonding_curve(mint, token_program=TOKEN_2022_PROGRAM)
+
+    async def test(rpc_pool, transport):
+        with pytest.raises(UnsupportedTrade):
+            await PumpTransactionBuilder(rpc_pool).build(Keypair(), "buy", mint, 0.01, True, 10, 0.0001)
+
+    run_with_pool(api, test)
+
+
+def test_token_2022_trade_falls_back_to_trade_local(api):
+    mint = str(Keypair().pubkey())
+    api.add_bonding_curve(mint, token_program=TOKEN_2022_PROGRAM)
+    keypair = Keypair()
+    api.add_wallet(str(keypair.pubkey()), 10)
+
+    async def test(rpc_pool, transport):
+        builder = PumpTransactionBuilder(rpc_pool)
+        trader = SolanaTrader(
+            TradeConfig(str(keypair), api_endpoint=f"{api.base_url}/api/trade-local", rpc_pool=rpc_pool),
+            transport=transport,
+            local_builder=builder,
+            balances=BalanceCache(rpc_pool)
+        )
+        result = await trader.execute_trade("buy", mint, amount=0.01, pool="pump")
+        return result, builder
+
+    result, builder = run_with_pool(api, test)
+    assert result["success"]
+    assert builder.built == 0
+    assert builder.mismatch is None
@@ -0,0 +1,34 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from resilience import ApiGuard, RetryBudget
+
+
+def unavailable():
+    calls = []
+
+    async def request(timeout: float):
+        calls.append(timeout)
+        raise aiohttp.ClientResponseError(None, (), status=503)
+
+    return request, calls
+
+
+def guard() -> ApiGuard:
+    return ApiGuard(attempts=4, base_delay=0.001, max_delay=0.001, budget=RetryBudget(reserve=10))
+
+
+def test_idempotent_calls_are_retried():
+    request, calls = unavailable()
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(guard().call("https://example/trade-local", request))
+    assert len(calls) == 4
+
+
+def test_non_idempotent_calls_are_attempted_once():
+    request, calls = unavailable()
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(guard().call("https://example/create-wallet", request, idempotent=False))
+    assert len(calls) == 1
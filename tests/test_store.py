@@ -0,0 +1,30 @@
+import os
+
+from cryptography.fernet import Fernet
+
+from scheduler import Schedule
+from store import Store
+from twap import ParentOrder
+
+
+def open_store(tmp_path, encryption_key=None):
+    return Store(os.path.join(str(tmp_path), "bot.db"), encryption_key=encryption_key)
+
+
+def test_schedules_and_twap_orders_round_trip_with_an_encryption_key(tmp_path):
+    store = open_store(tmp_path, Fernet.generate_key().decode())
+    store.save_wallet(1, "secret")
+    store.save_schedule(Schedule(1, 1, "Mint", 0.1, "pump"))
+    store.save_twap_order(ParentOrder(1, 1, "Mint", 1.0, 60))
+    assert [s.key for batch in store.iter_schedules() for s in batch] == [Schedule(1, 1, "Mint", 0.1, "pump").key]
+    assert len([o for batch in store.iter_twap_orders() for o in batch]) == 1
+    store.close()
+
+
+def test_schedules_and_twap_orders_are_not_saved_without_wallet_keys(tmp_path):
+    store = open_store(tmp_path)
+    store.save_schedule(Schedule(1, 1, "Mint", 0.1, "pump"))
+    store.save_twap_order(ParentOrder(1, 1, "Mint", 1.0, 60))
+    assert list(store.iter_schedules()) == []
+    assert list(store.iter_twap_orders()) == []
+    store.close()
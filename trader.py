@@ -0,0 +1,527 @@
+import asyncio
+import base58
+import base64
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from solders.hash import Hash
+from solders.transaction import VersionedTransaction
+from solders.keypair import Keypair
+from solders.commitment_config import CommitmentLevel
+from solders.rpc.requests import SendVersionedTransaction
+from solders.rpc.config import RpcSendTransactionConfig
+from http_client import HttpTransport, transport as default_transport
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+from fees import PriorityFeeEstimator, fee_estimator as default_fee_estimator
+from dedup import IdempotencyCache, trade_guard as default_trade_guard
+from pump_builder import LOCAL_TX_BUILDER, PumpTransactionBuilder, pump_builder as default_pump_builder
+from resilience import ApiGuard, api_guard as default_api_guard
+from portfolio import BalanceCache, balance_cache as default_balance_cache
+from jito import JitoClient, SignedBundle, bundle_chunks, jito as default_jito, tip_transaction
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of per-user traders kept decoded in memory
+TRADER_CACHE_SIZE = int(os.getenv('TRADER_CACHE_SIZE', 1024))
+TRADE_LOCAL_URL = os.getenv('TRADE_LOCAL_URL', "https://pumpportal.fun/api/trade-local")
+# Trades per batched trade-local request when not bundling
+TRADE_LOCAL_BATCH_SIZE = int(os.getenv('TRADE_LOCAL_BATCH_SIZE', 5))
+
+TRADE_STAGE_SECONDS = Histogram(
+    "trade_stage_seconds", "Time spent in each execute_trade stage", ["stage"]
+)
+_BUILD_STAGE = TRADE_STAGE_SECONDS.labels("build")
+_SIGN_STAGE = TRADE_STAGE_SECONDS.labels("sign")
+_SEND_STAGE = TRADE_STAGE_SECONDS.labels("send")
+TRADES_TOTAL = Counter(
+    "trades_total", "Executed trades by action, outcome and error class", ["action", "outcome", "error"]
+)
+TRADE_BUILDS_TOTAL = Counter(
+    "trade_builds_total", "Trade transactions by builder (local, pumpportal or fallback)", ["builder"]
+)
+
+
+class TradeConfig:
+    def __init__(
+        self,
+        private_key: str,
+        rpc_endpoint: Optional[str] = None,
+        api_endpoint: str = TRADE_LOCAL_URL,
+        rpc_pool: Optional[RpcPool] = None
+    ):
+        self.private_key = private_key
+        # A single rpc_endpoint gets its own pool; otherwise share RPC_ENDPOINTS
+        if rpc_pool is None:
+            rpc_pool = RpcPool([rpc_endpoint]) if rpc_endpoint else default_rpc_pool
+        self.rpc_pool = rpc_pool
+        self.rpc_endpoint = rpc_pool.endpoints[0].url
+        self.api_endpoint = api_endpoint
+        self.keypair = Keypair.from_base58_string(private_key)
+        self.public_key = str(self.keypair.pubkey())
+
+class SolanaTrader:
+    def __init__(
+        self,
+        config: TradeConfig,
+        transport: Optional[HttpTransport] = None,
+        fee_estimator: Optional[PriorityFeeEstimator] = None,
+        trade_guard: Optional[IdempotencyCache] = None,
+        local_builder: Optional[PumpTransactionBuilder] = None,
+        balances: Optional[BalanceCache] = None,
+        api_guard: Optional[ApiGuard] = None
+    ):
+        self.config = config
+        self.transport = transport or default_transport
+        self.fee_estimator = fee_estimator or default_fee_estimator
+        self.trade_guard = trade_guard or default_trade_guard
+        if local_builder is None and LOCAL_TX_BUILDER:
+            local_builder = default_pump_builder
+        self.local_builder = local_builder
+        self.balances = balances or default_balance_cache
+        self.api_guard = api_guard or default_api_guard
+
+    def trade_payload(
+        self,
+        action: str,
+        mint_address: str,
+        amount: float,
+        denominated_in_sol: bool,
+        slippage: int,
+        priority_fee: float,
+        pool: str
+    ) -> Dict[str, Any]:
+        """Build the pumpportal trade-local request body"""
+        return {
+            "publicKey": self.config.public_key,
+            "action": action,
+            "mint": mint_address,
+            "amount": amount,
+            "denominatedInSol": "true" if denominated_in_sol else "false",
+            "slippage": slippage,
+            "priorityFee": priority_fee,
+            "pool": pool
+        }
+
+    async def execute_trade(
+        self,
+        action: str,
+        mint_address: str,
+        amount: int = 0.001,
+        denominated_in_sol: bool = True,
+        slippage: int = 10,
+        priority_fee: float = 0.00001,
+        skip_pre_flight: bool = True,
+        pool: str = "raydium",
+        fee_tier: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Execute a trade with the given parameters.
+
+        ``fee_tier`` (p50/p75/p95) replaces ``priority_fee`` with the cached
+        estimate for that percentile of recent prioritization fees.
+
+        ``deadline`` (``time.monotonic()``) is when the trade stops being
+        worth building; pumpportal calls are not retried past it.
+
+        Trades the cached wallet balance obviously cannot cover fail with
+        ``InsufficientFunds`` before pumpportal is contacted.
+
+        The same trade from this wallet within ``TRADE_DEDUP_WINDOW`` seconds
+        is sent once; repeats get the first result with ``"duplicate": True``.
+        Callers that repeat a trade on purpose, like DCA ticks, pass a distinct
+        ``idempotency_key`` per intended trade.
+        """
+        if idempotency_key is None:
+            idempotency_key = f"{action}:{mint_address}:{amount}:{denominated_in_sol}"
+        return await self.trade_guard.run(
+            (self.config.public_key, idempotency_key),
+            lambda: self._execute_trade(
+                action, mint_address, amount, denominated_in_sol, slippage,
+                priority_fee, skip_pre_flight, pool, fee_tier, deadline
+            )
+        )
+
+    async def _request_trade_local(self, trade_payload: Dict[str, Any], deadline: Optional[float]) -> bytes:
+        """Unsigned transaction bytes from pumpportal trade-local"""
+        content = await self.api_guard.call(
+            self.config.api_endpoint,
+            lambda timeout: self.transport.post_bytes(
+                self.config.api_endpoint,
+                json=trade_payload,
+                headers={"Content-Type": "application/json"},
+                timeout=timeout
+            ),
+            deadline
+        )
+        if not content:
+            raise Exception("Empty response from API")
+        return content
+
+    async def _build_locally(self, trade_payload: Dict[str, Any]) -> Optional[VersionedTransaction]:
+        """Signed pump.fun curve trade from the local builder, or None to use pumpportal"""
+        if self.local_builder is None or trade_payload["pool"] != "pump":
+            TRADE_BUILDS_TOTAL.labels("pumpportal").inc()
+            return None
+        try:
+            tx = await self.local_builder.build(
+                self.config.keypair,
+                trade_payload["action"],
+                trade_payload["mint"],
+                trade_payload["amount"],
+                trade_payload["denominatedInSol"] == "true",
+                trade_payload["slippage"],
+                trade_payload["priorityFee"]
+            )
+            await self.local_builder.verify(
+                trade_payload["action"], tx, lambda: self._request_trade_local(trade_payload, None)
+            )
+        except Exception as e:
+            logger.warning(f"Local build failed, falling back to pumpportal: {e}")
+            TRADE_BUILDS_TOTAL.labels("fallback").inc()
+            return None
+        TRADE_BUILDS_TOTAL.labels("local").inc()
+        return tx
+
+    async def _execute_trade(
+        self,
+        action: str,
+        mint_address: str,
+        amount: float,
+        denominated_in_sol: bool,
+        slippage: int,
+        priority_fee: float,
+        skip_pre_flight: bool,
+        pool: str,
+        fee_tier: Optional[str],
+        deadline: Optional[float]
+    ) -> Dict[str, Any]:
+        try:
+            if fee_tier is not None:
+                priority_fee = self.fee_estimator.fee(fee_tier, fallback=priority_fee)
+            # A cold balance fetch overlaps the build instead of delaying it
+            balance_check = asyncio.ensure_future(self.balances.check(
+                self.config.public_key, action, mint_address, amount, denominated_in_sol, priority_fee
+            ))
+            try:
+                trade_payload = self.trade_payload(
+                    action, mint_address, amount, denominated_in_sol, slippage, priority_fee, pool
+                )
+
+                started = time.perf_counter()
+                # Local builds come back signed; pumpportal ones are signed below
+                tx = await self._build_locally(trade_payload)
+                built = time.perf_counter()
+                if tx is None:
+                    logger.info(f"Sending trade request: {trade_payload}")
+                    content = await self._request_trade_local(trade_payload, deadline)
+                    built = time.perf_counter()
+
+                    tx = VersionedTransaction(
+                        VersionedTransaction.from_bytes(content).message,
+                        [self.config.keypair]
+                    )
+                _BUILD_STAGE.observe(built - started)
+            except BaseException:
+                balance_check.cancel()
+                await asyncio.gather(balance_check, return_exceptions=True)
+                raise
+            await balance_check
+
+            commitment = CommitmentLevel.Confirmed
+            config = RpcSendTransactionConfig(
+                skip_preflight=skip_pre_flight,
+                preflight_commitment=commitment
+            )
+            tx_payload = SendVersionedTransaction(tx, config).to_json()
+            signed = time.perf_counter()
+            _SIGN_STAGE.observe(signed - built)
+
+            response_data = await self.config.rpc_pool.send_transaction(tx_payload)
+            _SEND_STAGE.observe(time.perf_counter() - signed)
+
+            if 'result' not in response_data:
+                raise Exception(f"Invalid RPC response: {response_data}")
+
+            tx_signature = response_data['result']
+            logger.info(f"Transaction sent: https://solscan.io/tx/{tx_signature}")
+            TRADES_TOTAL.labels(action, "success", "").inc()
+            self.balances.apply_fill(
+                self.config.public_key, action, mint_address, amount, denominated_in_sol, priority_fee
+            )
+
+            return {
+                "success": True,
+                "signature": tx_signature,
+                "solscan_url": f"https://solscan.io/tx/{tx_signature}"
+            }
+
+        except Exception as e:
+            logger.error(f"Trade execution failed: {str(e)}")
+            TRADES_TOTAL.labels(action, "failure", type(e).__name__).inc()
+            return {
+                "success": False,
+                "error": str(e),
+                "error_class": type(e).__name__
+            }
+
+
+class BatchTrader:
+    """Runs the same trade from several wallets at once.
+
+    Trade transactions are built with batched trade-local requests (a list
+    of trade bodies in, a list of base58 transactions out) and signed off
+    the event loop, one thread per batch. They are then either sent through
+    the RPC pool in parallel or, with ``bundle=True``, landed as Jito
+    bundles of up to four trades plus a tip paid by the batch's first
+    wallet. Each bundle is atomic, so a fan-out of four wallets or fewer
+    lands all-or-nothing.
+    """
+
+    def __init__(
+        self,
+        keypairs: Sequence[Keypair],
+        api_endpoint: str = TRADE_LOCAL_URL,
+        rpc_pool: Optional[RpcPool] = None,
+        transport: Optional[HttpTransport] = None,
+        fee_estimator: Optional[PriorityFeeEstimator] = None,
+        jito: Optional[JitoClient] = None,
+        trade_guard: Optional[IdempotencyCache] = None,
+        batch_size: int = TRADE_LOCAL_BATCH_SIZE,
+        balances: Optional[BalanceCache] = None,
+        api_guard: Optional[ApiGuard] = None
+    ):
+        if not keypairs:
+            raise ValueError("At least one wallet is required")
+        self.keypairs = list(keypairs)
+        self.public_keys = [str(keypair.pubkey()) for keypair in self.keypairs]
+        if len(set(self.public_keys)) != len(self.public_keys):
+            raise ValueError("Each wallet can only be used once per batch")
+        self.api_endpoint = api_endpoint
+        self.rpc_pool = rpc_pool or default_rpc_pool
+        self.transport = transport or default_transport
+        self.fee_estimator = fee_estimator or default_fee_estimator
+        self.jito = jito or default_jito
+        self.trade_guard = trade_guard or default_trade_guard
+        self.batch_size = batch_size
+        self.balances = balances or default_balance_cache
+        self.api_guard = api_guard or default_api_guard
+
+    async def execute_batch(
+        self,
+        action: str,
+        mint_address: str,
+        amounts: Sequence[float],
+        denominated_in_sol: bool = True,
+        slippage: int = 10,
+        priority_fee: float = 0.00001,
+        skip_pre_flight: bool = True,
+        pool: str = "pump",
+        fee_tier: Optional[str] = None,
+        bundle: bool = False,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Trade ``amounts[i]`` from wallet ``i``; every wallet gets its own result.
+
+        Returns ``success`` (True when at least one wallet's trade went
+        through) and ``results``, one dict per wallet in order with
+        ``wallet``, ``amount``, ``success`` and ``signature``/``solscan_url``
+        or ``error``. Bundled results also carry ``bundle_id``. Repeats of the
+        same batch, or of the same ``idempotency_key``, within
+        ``TRADE_DEDUP_WINDOW`` are sent once, like ``SolanaTrader.execute_trade``.
+        """
+        amounts = list(amounts)
+        if len(amounts) != len(self.keypairs):
+            raise ValueError(f"Got {len(amounts)} amounts for {len(self.keypairs)} wallets")
+        if idempotency_key is None:
+            idempotency_key = f"{action}:{mint_address}:{tuple(amounts)}:{denominated_in_sol}:{bundle}"
+        return await self.trade_guard.run(
+            ("batch", tuple(self.public_keys), idempotency_key),
+            lambda: self._execute_batch(
+                action, mint_address, amounts, denominated_in_sol, slippage,
+                priority_fee, skip_pre_flight, pool, fee_tier, bundle
+            )
+        )
+
+    async def _execute_batch(
+        self,
+        action: str,
+        mint_address: str,
+        amounts: List[float],
+        denominated_in_sol: bool,
+        slippage: int,
+        priority_fee: float,
+        skip_pre_flight: bool,
+        pool: str,
+        fee_tier: Optional[str],
+        bundle: bool
+    ) -> Dict[str, Any]:
+        if fee_tier is not None:
+            priority_fee = self.fee_estimator.fee(fee_tier, fallback=priority_fee)
+        payloads = [
+            {
+                "publicKey": public_key,
+                "action": action,
+                "mint": mint_address,
+                "amount": amount,
+                "denominatedInSol": "true" if denominated_in_sol else "false",
+                "slippage": slippage,
+                "priorityFee": priority_fee,
+                "pool": pool
+            }
+            for public_key, amount in zip(self.public_keys, amounts)
+        ]
+        logger.info(f"Sending batched {action} for {len(payloads)} wallets on {mint_address}")
+
+        if bundle:
+            chunks = bundle_chunks(len(payloads))
+            run_chunk = self._land_chunk
+        else:
+            chunks = [
+                range(i, min(i + self.batch_size, len(payloads)))
+                for i in range(0, len(payloads), self.batch_size)
+            ]
+            run_chunk = lambda chunk, payloads: self._send_chunk(chunk, payloads, skip_pre_flight)
+        chunk_results = await asyncio.gather(*(
+            run_chunk(chunk, payloads[chunk.start:chunk.stop]) for chunk in chunks
+        ))
+
+        results = []
+        for chunk_result in chunk_results:
+            results.extend(chunk_result)
+        for result, amount in zip(results, amounts):
+            result["amount"] = amount
+            if result["success"]:
+                result["solscan_url"] = f"https://solscan.io/tx/{result['signature']}"
+                TRADES_TOTAL.labels(action, "success", "").inc()
+                self.balances.apply_fill(
+                    result["wallet"], action, mint_address, amount, denominated_in_sol, priority_fee
+                )
+            else:
+                TRADES_TOTAL.labels(action, "failure", result.pop("error_class")).inc()
+        return {"success": any(result["success"] for result in results), "results": results}
+
+    async def _build(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        started = time.perf_counter()
+        encoded = await self.api_guard.call(
+            self.api_endpoint,
+            lambda timeout: self.transport.post_json(
+                self.api_endpoint,
+                json=payloads,
+                headers={"Content-Type": "application/json"},
+                timeout=timeout
+            )
+        )
+        _BUILD_STAGE.observe(time.perf_counter() - started)
+        if not isinstance(encoded, list) or len(encoded) != len(payloads):
+            raise Exception(f"Expected {len(payloads)} transactions, got {encoded!r}")
+        return encoded
+
+    @staticmethod
+    def _sign(encoded: List[str], keypairs: List[Keypair]) -> List[VersionedTransaction]:
+        return [
+            VersionedTransaction(VersionedTransaction.from_bytes(base58.b58decode(tx)).message, [keypair])
+            for tx, keypair in zip(encoded, keypairs)
+        ]
+
+    def _failed(self, chunk: range, error: Exception) -> List[Dict[str, Any]]:
+        logger.error(f"Batched trade failed for {len(chunk)} wallet(s): {error}")
+        return [
+            {"wallet": self.public_keys[index], "success": False,
+             "error": str(error), "error_class": type(error).__name__}
+            for index in chunk
+        ]
+
+    async def _send_chunk(
+        self,
+        chunk: range,
+        payloads: List[Dict[str, Any]],
+        skip_pre_flight: bool
+    ) -> List[Dict[str, Any]]:
+        """Build, sign and send one batch; each transaction goes to RPC on its own"""
+        try:
+            encoded = await self._build(payloads)
+            started = time.perf_counter()
+            transactions = await asyncio.to_thread(self._sign, encoded, self.keypairs[chunk.start:chunk.stop])
+            _SIGN_STAGE.observe(time.perf_counter() - started)
+        except Exception as e:
+            return self._failed(chunk, e)
+
+        config = RpcSendTransactionConfig(
+            skip_preflight=skip_pre_flight,
+            preflight_commitment=CommitmentLevel.Confirmed
+        )
+
+        async def send(index: int, tx: VersionedTransaction) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                response_data = await self.rpc_pool.send_transaction(SendVersionedTransaction(tx, config).to_json())
+                _SEND_STAGE.observe(time.perf_counter() - started)
+                if 'result' not in response_data:
+                    raise Exception(f"Invalid RPC response: {response_data}")
+            except Exception as e:
+                return self._failed(range(index, index + 1), e)[0]
+            logger.info(f"Transaction sent: https://solscan.io/tx/{response_data['result']}")
+            return {"wallet": self.public_keys[index], "success": True, "signature": response_data['result']}
+
+        return await asyncio.gather(*(send(index, tx) for index, tx in zip(chunk, transactions)))
+
+    async def _prepare_bundle(self, chunk: range, payloads: List[Dict[str, Any]]) -> SignedBundle:
+        blockhash, encoded = await asyncio.gather(self.rpc_pool.latest_blockhash(), self._build(payloads))
+        started = time.perf_counter()
+        bundle = await asyncio.to_thread(self._sign_bundle, encoded, self.keypairs[chunk.start:chunk.stop], blockhash)
+        _SIGN_STAGE.observe(time.perf_counter() - started)
+        return bundle
+
+    def _sign_bundle(self, encoded: List[str], keypairs: List[Keypair], blockhash: Hash) -> SignedBundle:
+        transactions = self._sign(encoded, keypairs)
+        # Tip last so it is only paid if the whole bundle lands
+        tip = tip_transaction(keypairs[0], blockhash)
+        return SignedBundle(
+            [base64.b64encode(bytes(tx)).decode() for tx in transactions + [tip]],
+            [str(tx.signatures[0]) for tx in transactions]
+        )
+
+    async def _land_chunk(self, chunk: range, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Land one batch as a Jito bundle, rebuilt with fresh transactions if dropped"""
+        outcome = await self.jito.land(lambda: self._prepare_bundle(chunk, payloads))
+        if outcome["status"] != "landed":
+            return self._failed(chunk, Exception(f"Bundle did not land: {outcome['error']}"))
+        return [
+            {"wallet": self.public_keys[index], "success": True,
+             "signature": signature, "bundle_id": outcome["bundle_id"]}
+            for index, signature in zip(chunk, outcome["bundle"].signatures)
+        ]
+
+
+class TraderCache:
+    """LRU cache of ready-to-use ``SolanaTrader`` objects per user.
+
+    Keeps the decoded ``Keypair`` and pubkey string alive between trades so
+    the hot path does no base58 decoding. Call ``invalidate`` whenever a
+    user's key changes.
+    """
+
+    def __init__(self, wallets: Mapping[int, str], max_size: int = TRADER_CACHE_SIZE):
+        self.wallets = wallets
+        self.max_size = max_size
+        self._traders: "OrderedDict[int, SolanaTrader]" = OrderedDict()
+
+    def get(self, user_id: int) -> SolanaTrader:
+        """Return the user's trader, raising ``KeyError`` if no key is set"""
+        trader = self._traders.get(user_id)
+        if trader is not None:
+            self._traders.move_to_end(user_id)
+            return trader
+
+        trader = SolanaTrader(TradeConfig(self.wallets[user_id]))
+        self._traders[user_id] = trader
+        if len(self._traders) > self.max_size:
+            self._traders.popitem(last=False)
+        return trader
+
+    def invalidate(self, user_id: int) -> None:
+        self._traders.pop(user_id, None)
@@ -0,0 +1,347 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from rpc_pool import RpcPool, rpc_pool as default_rpc_pool
+from pools import BONDING_CURVE_SIZE, BondingCurveState, bonding_curve_address, get_multiple_accounts, parse_bonding_curve
+
+logger = logging.getLogger(__name__)
+
+# Largest expected slippage of any child over the spot price, in percent
+TWAP_MAX_SLIPPAGE = float(os.getenv('TWAP_MAX_SLIPPAGE', 3))
+TWAP_MIN_SLICE_SOL = float(os.getenv('TWAP_MIN_SLICE_SOL', 0.001))
+TWAP_DEFAULT_SLICES = int(os.getenv('TWAP_DEFAULT_SLICES', 10))
+# Bounds on an order's duration and on the time between its slices, in seconds
+TWAP_MIN_DURATION = float(os.getenv('TWAP_MIN_DURATION', 10))
+TWAP_MAX_DURATION = float(os.getenv('TWAP_MAX_DURATION', 7 * 24 * 3600))
+TWAP_MIN_INTERVAL = float(os.getenv('TWAP_MIN_INTERVAL', 2))
+TWAP_WORKERS = int(os.getenv('TWAP_WORKERS', 16))
+# Weight of the newest observation in the price impact correction
+TWAP_IMPACT_SMOOTHING = float(os.getenv('TWAP_IMPACT_SMOOTHING', 0.3))
+
+LAMPORTS_PER_SOL = 1_000_000_000
+
+CurveSource = Callable[[Sequence[str]], Awaitable[List[Optional[BondingCurveState]]]]
+ChildExecutor = Callable[["ParentOrder", float], Awaitable[Dict[str, Any]]]
+
+
+class ParentOrder:
+    """A TWAP buy of ``total`` SOL over ``duration`` seconds and its progress.
+
+    ``next_run`` and ``started_at`` are wall-clock timestamps.
+    ``max_slippage`` caps each child's expected slippage, as a fraction.
+    ``slices`` is cut so slices are at least ``min_interval`` apart.
+    """
+
+    __slots__ = (
+        "user_id", "chat_id", "mint", "total", "duration", "slices", "max_slippage",
+        "started_at", "next_run", "filled", "tokens", "children", "failures",
+        "arrival_price", "impact_scale", "last_spot", "last_impact", "status", "cancelled"
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        chat_id: int,
+        mint: str,
+        total: float,
+        duration: float,
+        slices: int = TWAP_DEFAULT_SLICES,
+        max_slippage: float = TWAP_MAX_SLIPPAGE / 100,
+        started_at: Optional[float] = None,
+        min_interval: float = TWAP_MIN_INTERVAL
+    ):
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.mint = mint
+        self.total = total
+        self.duration = duration
+        self.slices = max_slices(duration, slices, min_interval)
+        self.max_slippage = max_slippage
+        self.started_at = started_at if started_at is not None else time.time()
+        self.next_run = self.started_at
+        self.filled = 0.0
+        self.tokens = 0.0           # estimated from the curve at each child
+        self.children = 0
+        self.failures = 0
+        self.arrival_price: Optional[float] = None
+        self.impact_scale = 1.0     # observed / modelled price impact of our own children
+        self.last_spot: Optional[float] = None
+        self.last_impact = 0.0      # modelled spot move of the last child, until observed
+        self.status = "active"
+        self.cancelled = False
+
+    @property
+    def key(self) -> str:
+        return f"{self.user_id}_{self.mint}"
+
+    @property
+    def interval(self) -> float:
+        return self.duration / self.slices
+
+    @property
+    def ends_at(self) -> float:
+        # One extra interval to catch up on skipped slices
+        return self.started_at + self.duration + self.interval
+
+    @property
+    def average_price(self) -> Optional[float]:
+        """SOL per token paid so far, from curve estimates"""
+        return self.filled / self.tokens if self.tokens else None
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "mint": self.mint,
+            "status": self.status,
+            "filled": round(self.filled, 9),
+            "total": self.total,
+            "children": self.children,
+            "failures": self.failures,
+            "average_price": self.average_price,
+            "arrival_price": self.arrival_price,
+            "slippage": self.average_price / self.arrival_price - 1
+            if self.average_price and self.arrival_price else None,
+        }
+
+
+def max_slices(duration: float, slices: int, min_interval: float = TWAP_MIN_INTERVAL) -> int:
+    """``slices``, cut so that none come closer than ``min_interval`` apart"""
+    if min_interval <= 0:
+        return max(1, slices)
+    return max(1, min(slices, int(duration // min_interval)))
+
+
+def spot_price(state: BondingCurveState) -> float:
+    """SOL per token before any trade"""
+    return state.virtual_sol_reserves / state.virtual_token_reserves / 1000
+
+
+def plan_child(order: ParentOrder, state: BondingCurveState, now: float, min_slice: float = TWAP_MIN_SLICE_SOL) -> float:
+    """SOL to buy now: catch up to the linear schedule, capped by the slippage budget.
+
+    Buying ``s`` on a constant-product curve pays ``s / virtual_sol`` over
+    spot on average. That impact is scaled by what our earlier children
+    actually moved the price and kept within ``max_slippage``. Thin curves
+    therefore get smaller children, and an order too large for its duration
+    ends partly filled rather than overpaying. Returns 0 to skip this tick.
+    """
+    remaining = order.total - order.filled
+    elapsed = now - order.started_at + order.interval
+    target = order.total * min(1.0, elapsed / order.duration)
+    size = min(remaining, max(0.0, target - order.filled))
+
+    reserves = state.virtual_sol_reserves / LAMPORTS_PER_SOL
+    budget = order.max_slippage * reserves / order.impact_scale
+    size = min(size, budget)
+    # Leftovers below the minimum go out with this child rather than never
+    if remaining - size < min_slice and remaining <= budget:
+        size = remaining
+    return size if size >= min(min_slice, remaining) and size > 0 else 0.0
+
+
+def observe_impact(order: ParentOrder, spot: float, smoothing: float = TWAP_IMPACT_SMOOTHING) -> None:
+    """Update the impact correction from how far the price moved since our last child"""
+    if order.last_spot is None or not order.last_impact:
+        return
+    observed = spot / order.last_spot - 1
+    ratio = min(4.0, max(0.5, observed / order.last_impact))
+    order.impact_scale = (1 - smoothing) * order.impact_scale + smoothing * ratio
+    order.last_impact = 0.0
+
+
+async def fetch_curves(rpc_pool: RpcPool, mints: Sequence[str]) -> List[Optional[BondingCurveState]]:
+    accounts = await get_multiple_accounts(rpc_pool, [bonding_curve_address(mint) for mint in mints])
+    states = []
+    for data in accounts:
+        state = parse_bonding_curve(data) if data is not None and len(data) >= BONDING_CURVE_SIZE else None
+        states.append(None if state is None or state.complete else state)
+    return states
+
+
+class TwapEngine:
+    """Runs every TWAP parent order from one min-heap and one timer task.
+
+    The timer wakes at the earliest ``next_run`` and collects every order
+    that is due. It prices their mints with one batched curve fetch and
+    launches one child per order, at most ``workers`` at a time. An order
+    goes back on the heap only after its child finishes, so an order never
+    has two children in flight. An order whose curve is gone (migrated off
+    pump.fun) ends with status ``migrated``. ``curves`` returns the curve state per mint
+    and defaults to getMultipleAccounts; simulations pass their own.
+    ``execute(order, sol)`` buys a child and returns the ``execute_trade``
+    result.
+    """
+
+    def __init__(
+        self,
+        execute: ChildExecutor,
+        curves: Optional[CurveSource] = None,
+        rpc_pool: Optional[RpcPool] = None,
+        workers: int = TWAP_WORKERS,
+        min_slice: float = TWAP_MIN_SLICE_SOL,
+        on_save: Optional[Callable[[ParentOrder], None]] = None,
+        on_done: Optional[Callable[[ParentOrder], Awaitable[None]]] = None
+    ):
+        self._execute = execute
+        rpc_pool = rpc_pool or default_rpc_pool
+        self._curves = curves or (lambda mints: fetch_curves(rpc_pool, mints))
+        self.min_slice = min_slice
+        self._on_save = on_save
+        self._on_done = on_done
+        self._orders: Dict[str, ParentOrder] = {}
+        self._heap: List[Tuple[float, int, ParentOrder]] = []
+        self._seq = itertools.count()
+        self.workers = workers
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def get(self, key: str) -> Optional[ParentOrder]:
+        return self._orders.get(key)
+
+    def orders(self) -> List[ParentOrder]:
+        return list(self._orders.values())
+
+    def add(self, order: ParentOrder) -> None:
+        """Start an order, replacing any active one for the same user and mint"""
+        self.cancel(order.key)
+        self._orders[order.key] = order
+        self._save(order)
+        self._push(order)
+
+    def cancel(self, key: str) -> Optional[ParentOrder]:
+        order = self._orders.pop(key, None)
+        if order is None:
+            return None
+        order.cancelled = True
+        order.status = "cancelled"
+        self._save(order)
+        return order
+
+    def _save(self, order: ParentOrder) -> None:
+        if self._on_save is not None:
+            try:
+                self._on_save(order)
+            except Exception as e:
+                logger.error(f"Saving TWAP order {order.key} failed: {e}")
+
+    def _push(self, order: ParentOrder) -> None:
+        heapq.heappush(self._heap, (order.next_run, next(self._seq), order))
+        if self._wakeup is not None and self._heap[0][2] is order:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._task = asyncio.create_task(self._timer())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._running, return_exceptions=True)
+            self._task = None
+
+    async def join(self) -> None:
+        """Wait until every order has finished"""
+        while self._orders or self._running:
+            await asyncio.sleep(0.05)
+
+    async def _timer(self) -> None:
+        while True:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                _, _, order = heapq.heappop(self._heap)
+                if not order.cancelled:
+                    due.append(order)
+            task = asyncio.create_task(self._run_batch(due))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, orders: List[ParentOrder]) -> None:
+        mints = list(dict.fromkeys(order.mint for order in orders))
+        try:
+            states = dict(zip(mints, await self._curves(mints)))
+            priced = True
+        except Exception as e:
+            logger.warning(f"TWAP curve fetch failed: {e}")
+            states, priced = {}, False
+        await asyncio.gather(*(self._step(order, states.get(order.mint), priced) for order in orders))
+
+    async def _step(self, order: ParentOrder, state: Optional[BondingCurveState], priced: bool = True) -> None:
+        # A fetch that answered without a live curve means the mint left pump.fun
+        migrated = priced and state is None
+        now = time.time()
+        if state is not None and not order.cancelled:
+            spot = spot_price(state)
+            if order.arrival_price is None:
+                order.arrival_price = spot
+            observe_impact(order, spot)
+            size = plan_child(order, state, now, self.min_slice)
+            if size > 0:
+                async with self._semaphore:
+                    result = await self._child(order, size)
+                if result.get("success"):
+                    impact = size * LAMPORTS_PER_SOL / state.virtual_sol_reserves
+                    order.filled += size
+                    # Tokens out of a constant-product buy of ``size``
+                    order.tokens += size / (spot * (1 + impact))
+                    order.children += 1
+                    order.last_spot = spot
+                    # Spot moves by (1 + s/vs)^2 - 1 after our own buy
+                    order.last_impact = (1 + impact) ** 2 - 1
+                else:
+                    order.failures += 1
+
+        if order.cancelled:
+            return
+        if order.total - order.filled < 1e-9 or migrated or time.time() >= order.ends_at:
+            if order.total - order.filled < 1e-9:
+                order.status = "done"
+            else:
+                order.status = "migrated" if migrated else "expired"
+            self._orders.pop(order.key, None)
+            self._save(order)
+            if self._on_done is not None:
+                try:
+                    await self._on_done(order)
+                except Exception as e:
+                    logger.error(f"TWAP completion hook failed for {order.key}: {e}")
+            return
+        order.next_run = max(now, order.next_run) + order.interval
+        self._save(order)
+        self._push(order)
+
+    async def _child(self, order: ParentOrder, size: float) -> Dict[str, Any]:
+        try:
+            return await self._execute(order, size)
+        except Exception as e:
+            logger.error(f"TWAP child of {order.key} failed: {e}")
+            return {"success": False, "error": str(e)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": len(self._orders), "running_batches": len(self._running)}
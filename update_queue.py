@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', 32))
+# Updates waiting across all users before new ones are refused
+UPDATE_QUEUE_MAX = int(os.getenv('UPDATE_QUEUE_MAX', 1000))
+
+
+class UpdateQueue:
+    """Bounded worker pool that keeps per-key (per-user) ordering.
+
+    Each key has its own mailbox. A key sits in the ready queue at most once,
+    so a user's updates run one at a time and in arrival order while other
+    users are served in parallel by the remaining workers. A busy user goes
+    to the back of the ready queue after each update, so nobody starves.
+    ``submit`` refuses work once ``max_depth`` updates are waiting.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        workers: int = UPDATE_WORKERS,
+        max_depth: int = UPDATE_QUEUE_MAX
+    ):
+        self._handler = handler
+        self.worker_count = workers
+        self.max_depth = max_depth
+        self._mailboxes: Dict[Hashable, Deque[Tuple[float, Any]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.depth = 0
+        self.processed = 0
+        self.shed = 0
+        self.failed = 0
+        self._wait_total = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, key: Hashable, item: Any) -> bool:
+        """Enqueue ``item`` behind earlier items for ``key``; False if shed"""
+        if self.depth >= self.max_depth:
+            self.shed += 1
+            return False
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self._mailboxes[key] = deque()
+            self._ready.put_nowait(key)
+        mailbox.append((time.monotonic(), item))
+        self.depth += 1
+        return True
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        for _ in range(self.worker_count):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self) -> None:
+        """Wait until every submitted item has been handled"""
+        while self.depth:
+            await asyncio.sleep(0.01)
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            mailbox = self._mailboxes[key]
+            enqueued_at, item = mailbox.popleft()
+
+            wait = time.monotonic() - enqueued_at
+            self._wait_total += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                await self._handler(item)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Update handling failed for {key}: {e}")
+            finally:
+                self.depth -= 1
+                self.processed += 1
+                if mailbox:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._mailboxes[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "active_keys": len(self._mailboxes),
+            "processed": self.processed,
+            "failed": self.failed,
+            "shed": self.shed,
+            "avg_wait_ms": round(self._wait_total / self.processed * 1000, 2) if self.processed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }